@@ -84,6 +84,7 @@ exports.criarDocumento = withTransaction(async (req, res, t) => {
             solucao: docData.solucao,
             embedding: docData.embedding,
             subcategoria_id: docData.subcategoria_id,
+            hashConteudo: docData.content_hash,
             
             // Adiciona os campos do arquivo original a CADA chunk salvo.
             // valores recebidos do frontend
@@ -154,6 +155,7 @@ exports.atualizarDocumento = withTransaction(async (req, res, t) => {
 
     // campo de embedding com o novo valor calculado pela IA
     dadosDocumento.embedding = documentoProcessado.embedding;
+    dadosDocumento.hashConteudo = documentoProcessado.content_hash;
 
     await documento.update(dadosDocumento, { transaction: t });
 
@@ -0,0 +1,18 @@
+'use strict';
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    // Hash do conteúdo enviado para embedding (calculado pelo serviço de IA), usado na re-ingestão incremental
+    await queryInterface.addColumn('documentos', 'hashConteudo', {
+      type: Sequelize.STRING(64),
+      allowNull: true,
+    });
+    await queryInterface.addIndex('documentos', ['urlArquivo'], {
+      name: 'documentos_url_arquivo_idx'
+    });
+  },
+  async down(queryInterface, Sequelize) {
+    await queryInterface.removeIndex('documentos', 'documentos_url_arquivo_idx');
+    await queryInterface.removeColumn('documentos', 'hashConteudo');
+  }
+};
@@ -0,0 +1,23 @@
+'use strict';
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    // Vetor de busca textual em português, mantido pelo próprio banco a partir dos campos do documento
+    // (título pesa mais que descrição, que pesa mais que solução). Usado pela busca híbrida do serviço de IA.
+    await queryInterface.sequelize.query(`
+      ALTER TABLE documentos ADD COLUMN "textoBusca" tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(titulo, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B') ||
+        setweight(to_tsvector('portuguese', coalesce(solucao, '')), 'C')
+      ) STORED
+    `);
+    await queryInterface.addIndex('documentos', ['textoBusca'], {
+      name: 'documentos_texto_busca_idx',
+      using: 'GIN'
+    });
+  },
+  async down(queryInterface, Sequelize) {
+    await queryInterface.removeIndex('documentos', 'documentos_texto_busca_idx');
+    await queryInterface.removeColumn('documentos', 'textoBusca');
+  }
+};
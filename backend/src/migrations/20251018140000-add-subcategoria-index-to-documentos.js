@@ -0,0 +1,13 @@
+'use strict';
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    // Usado pela busca vetorial exata do serviço de IA em subcategorias pequenas (filtro antes da ordenação)
+    await queryInterface.addIndex('documentos', ['subcategoria_id'], {
+      name: 'documentos_subcategoria_id_idx'
+    });
+  },
+  async down(queryInterface, Sequelize) {
+    await queryInterface.removeIndex('documentos', 'documentos_subcategoria_id_idx');
+  }
+};
@@ -27,6 +27,7 @@ module.exports = (sequelize, DataTypes) => {
     urlArquivo: DataTypes.STRING,
     caminhoArquivo: DataTypes.STRING,
     tipoArquivo: DataTypes.STRING,
+    hashConteudo: DataTypes.STRING(64),
     embedding: {
       type: DataTypes.VECTOR(768), 
       allowNull: true
@@ -1,15 +1,18 @@
 -- Habilita a extensão pgvector, essencial para o tipo 'vector' e suas funções.
 CREATE EXTENSION IF NOT EXISTS vector;
 
--- As tabelas (documentos, chat_consultas) precisam ser criadas
--- pelas migrações do backend ANTES de criar os índices.
--- Por isso, estes comandos de índice estão comentados por enquanto.
--- Executá-los manualmente APÓS rodar as migrações.
+-- As tabelas (documentos, chat_consultas) são criadas pelas migrações do backend.
+-- Os índices vetoriais (HNSW/IVFFlat) são verificados e criados pelo ai_service na
+-- inicialização (core/vector_index.py), com a classe de operadores que corresponde
+-- ao operador usado nas consultas (<=> -> vector_cosine_ops). Um índice com
+-- vector_l2_ops NÃO é usado por consultas ordenadas por distância de cosseno.
+--
+-- Para criá-los manualmente (ex: VECTOR_INDEX_AUTO_CREATE=false):
 
--- CREATE INDEX CONCURRENTLY IF NOT EXISTS documentos_embedding_idx
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS documentos_embedding_hnsw_cosine_idx
 -- ON public.documentos
--- USING hnsw (embedding vector_l2_ops);
+-- USING hnsw (embedding vector_cosine_ops);
 
--- CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_consultas_embedding_idx
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_consultas_embedding_hnsw_cosine_idx
 -- ON public.chat_consultas
--- USING hnsw (embedding vector_l2_ops);
+-- USING hnsw (embedding vector_cosine_ops);
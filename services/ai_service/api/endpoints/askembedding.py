@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from schemas.document import AskEmbeddingRequest
+from fastapi import APIRouter, HTTPException, Request
+from typing import Optional
+from schemas.document import AskEmbeddingRequest, AskEmbeddingBatchRequest
 from models.loader import embeddings_model
+from core.vector_codec import VectorDtype, encode_vector, negotiate_vector_format, render
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,20 +10,49 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/", summary="Gera um embedding para um texto")
-async def create_embedding(request: AskEmbeddingRequest):
+async def create_embedding(request: AskEmbeddingRequest, raw_request: Request, vector_dtype: Optional[VectorDtype] = None):
     """
     Recebe um texto e retorna sua representação vetorial (embedding).
+    Por padrão o vetor é uma lista JSON de floats. Com `vector_dtype` (float32/float16) ele
+    vira base64 dos bytes little-endian; com `Accept: application/msgpack` a resposta é
+    msgpack; com `Accept: application/octet-stream`, apenas os bytes crus do vetor.
     """
     logger.info(f"Gerando embedding para o texto: '{request.text[:50]}...'")
+    vector_format = negotiate_vector_format(raw_request.headers.get("accept"), vector_dtype, allow_octet=True)
 
     try:
-        embedding = embeddings_model.embed_query(request.text)
+        embedding = await embeddings_model.aembed_query(request.text)
 
         logger.debug("Embedding gerado com sucesso.")
-        return {"embedding": embedding}
+        if vector_format.container == "octet":
+            return render(encode_vector(embedding, vector_format.dtype), vector_format, len(embedding))
+        return render({"embedding": vector_format.convert()(embedding)}, vector_format, len(embedding))
     except Exception as e:
         logger.exception(f"Falha ao gerar embedding para o texto: '{request.text[:50]}...'")
         raise HTTPException(
             status_code=500,
             detail="Ocorreu um erro ao gerar o embedding."
-        )
\ No newline at end of file
+        )
+
+@router.post("/batch", summary="Gera embeddings para vários textos")
+async def create_embeddings_batch(request: AskEmbeddingBatchRequest, raw_request: Request, vector_dtype: Optional[VectorDtype] = None):
+    """
+    Recebe uma lista de textos e retorna os embeddings na mesma ordem,
+    usando chamadas de lote à API (e o cache de embeddings).
+    Aceita os mesmos formatos de vetor do endpoint unitário (exceto octet-stream).
+    """
+    logger.info(f"Gerando embeddings em lote para {len(request.texts)} texto(s).")
+    vector_format = negotiate_vector_format(raw_request.headers.get("accept"), vector_dtype)
+
+    try:
+        embeddings = await embeddings_model.aembed_queries(request.texts)
+
+        logger.debug("Embeddings em lote gerados com sucesso.")
+        convert = vector_format.convert()
+        return render({"embeddings": [convert(embedding) for embedding in embeddings]}, vector_format)
+    except Exception as e:
+        logger.exception(f"Falha ao gerar embeddings em lote para {len(request.texts)} texto(s).")
+        raise HTTPException(
+            status_code=500,
+            detail="Ocorreu um erro ao gerar os embeddings."
+        )
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from schemas.document import DocumentProcessRequest
-from core.document_analyzer import process_and_generate_chunks
+from core.document_analyzer import process_and_generate_chunks, iter_processed_documents, load_chunk_diff
+from core.vector_codec import VectorDtype, VectorFormat, negotiate_vector_format, render
+from core.jobs import job_backend, submit_job, SUCCEEDED, FAILED
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,28 +17,135 @@ router = APIRouter()
     summary="Processa e Prepara Documentos para Cadastro",
     tags=["Análise de Documentos"]
 )
-async def process_document_endpoint(request: DocumentProcessRequest):
+async def process_document_endpoint(request: DocumentProcessRequest, raw_request: Request, vector_dtype: Optional[VectorDtype] = None):
     """
     Ponto de entrada ÚNICO que o backend Node.js chama.
     Recebe os metadados e ou um texto de 'solucao' ou uma 'url_arquivo'.
     Retorna uma lista de documentos (chunks) com seus embeddings, prontos
     para serem salvos no banco de dados pelo Node.js.
+    Os embeddings podem vir em formato binário compacto (`vector_dtype` e/ou
+    `Accept: application/msgpack`); o padrão continua sendo listas JSON de floats.
+    Com `known_hashes` (ou `lookup_known_hashes`), só os chunks novos/alterados vão ao modelo
+    de embeddings (os inalterados trazem o embedding já salvo); cada chunk traz `content_hash`
+    e `status`, e `chunks` resume o que mudou.
     """
     logger.info(f"Iniciando processamento para o documento '{request.titulo}'")
+    vector_format = negotiate_vector_format(raw_request.headers.get("accept"), vector_dtype)
     try:
-        documents_to_save = await process_and_generate_chunks(request)
+        diff = await load_chunk_diff(request)
+        documents_to_save = await process_and_generate_chunks(request, diff)
         
         message = f"Processamento concluído. {len(documents_to_save)} documento(s) prontos para salvamento."
         logger.info(f"Sucesso no processamento do documento '{request.titulo}': {message}")
         
-        return {
+        convert = vector_format.convert()
+        for document in documents_to_save:
+            document["embedding"] = convert(document["embedding"])
+        return render({
             "message": message,
-            "data": documents_to_save
-        }
+            "data": documents_to_save,
+            "chunks": diff.summary()
+        }, vector_format)
         
     except ValueError as e:
         logger.warning(f"Erro de validação ao processar documento '{request.titulo}': {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception(f"Erro inesperado ao processar o documento '{request.titulo}'")
-        raise HTTPException(status_code=500, detail="Ocorreu um erro inesperado no processamento do documento.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Ocorreu um erro inesperado no processamento do documento.")
+
+
+@router.post(
+    "/stream",
+    summary="Processa Documentos em Streaming (NDJSON)",
+    tags=["Análise de Documentos"]
+)
+async def process_document_stream_endpoint(request: DocumentProcessRequest, vector_dtype: Optional[VectorDtype] = None):
+    """
+    Modo streaming para arquivos grandes: os chunks são enviados como NDJSON (uma linha JSON
+    por chunk, `{"type": "chunk", "data": {...}}`) à medida que seus embeddings ficam prontos,
+    terminando com `{"type": "summary", ...}` ou, em caso de falha, `{"type": "error", ...}`.
+    """
+    logger.info(f"Iniciando processamento em streaming para o documento '{request.titulo}'")
+    convert = VectorFormat("json", vector_dtype).convert()
+
+    async def ndjson_stream():
+        total = 0
+        try:
+            diff = await load_chunk_diff(request)
+            async for document in iter_processed_documents(request, diff):
+                document["embedding"] = convert(document["embedding"])
+                total += 1
+                yield json.dumps({"type": "chunk", "data": document}, ensure_ascii=False) + "\n"
+
+            message = f"Processamento concluído. {total} documento(s) prontos para salvamento."
+            logger.info(f"Sucesso no processamento em streaming do documento '{request.titulo}': {message}")
+            yield json.dumps({"type": "summary", "message": message, "total": total, "chunks": diff.summary()}, ensure_ascii=False) + "\n"
+
+        except ValueError as e:
+            logger.warning(f"Erro de validação ao processar documento '{request.titulo}': {e}")
+            yield json.dumps({"type": "error", "status_code": 400, "detail": str(e)}, ensure_ascii=False) + "\n"
+        except Exception:
+            logger.exception(f"Erro inesperado ao processar o documento '{request.titulo}' em streaming")
+            yield json.dumps({"type": "error", "status_code": 500, "detail": "Ocorreu um erro inesperado no processamento do documento."}) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/jobs",
+    summary="Enfileira o Processamento de um Documento",
+    tags=["Análise de Documentos"],
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def submit_document_job(request: DocumentProcessRequest, raw_request: Request):
+    """
+    Modo assíncrono: responde imediatamente com o ID do job; o processamento é feito por
+    um worker. Reenviar o mesmo documento enquanto ele está na fila ou rodando retorna o mesmo
+    job; depois de concluído, só entradas manuais reaproveitam o resultado (o arquivo em
+    `url_arquivo` pode ter mudado e é processado de novo).
+    """
+    try:
+        job = await submit_job(job_backend, request)
+    except Exception:
+        logger.exception(f"Falha ao enfileirar o documento '{request.titulo}'")
+        raise HTTPException(status_code=500, detail="Ocorreu um erro ao enfileirar o documento.")
+    return {
+        **job,
+        "status_url": str(raw_request.url_for("get_document_job", job_id=job["job_id"])),
+        "result_url": str(raw_request.url_for("get_document_job_result", job_id=job["job_id"]))
+    }
+
+
+@router.get("/jobs/{job_id}", summary="Status e Progresso de um Job", tags=["Análise de Documentos"])
+async def get_document_job(job_id: str):
+    job = await job_backend.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job
+
+
+@router.get("/jobs/{job_id}/result", summary="Resultado de um Job Concluído", tags=["Análise de Documentos"])
+async def get_document_job_result(job_id: str, raw_request: Request, vector_dtype: Optional[VectorDtype] = None):
+    """Mesmo formato de resposta do processamento síncrono (inclusive a negociação de formato dos vetores)."""
+    job = await job_backend.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=job.get("error_status_code", 500), detail=job["error"])
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído (status: {job['status']}).")
+
+    documents = await job_backend.get_result(job_id)
+    if documents is None:
+        raise HTTPException(status_code=410, detail="O resultado do job expirou.")
+
+    vector_format = negotiate_vector_format(raw_request.headers.get("accept"), vector_dtype)
+    convert = vector_format.convert()
+    for document in documents:
+        document["embedding"] = convert(document["embedding"])
+    return render({
+        "message": f"Processamento concluído. {len(documents)} documento(s) prontos para salvamento.",
+        "data": documents,
+        "chunks": job.get("chunks")
+    }, vector_format)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from models.loader import embeddings_model
+from core.partition_pool import partition_pool
+from core.context_packer import context_packer
+from core.reranker import reranker
+from core.filtered_search import filtered_search_planner
+from core.vector_replica import vector_replica
+from core.semantic_cache import semantic_cache
+from core.query_rewrite import rewrite_gate
+from core.categorizer import pendency_categorizer
+from core.pendencies import pendency_processor
+
+router = APIRouter()
+
+@router.get("/", summary="Métricas internas dos caches e otimizações do serviço")
+async def get_metrics():
+    """
+    Retorna os contadores em memória deste worker (hits/misses de cache, etc.).
+    Com vários workers do uvicorn, cada processo reporta apenas os seus números.
+    """
+    return {
+        "embedding_cache": embeddings_model.cache.stats() if embeddings_model.cache else None,
+        "embedding_batcher": embeddings_model.batcher.stats() if embeddings_model.batcher else None,
+        "embedding_api": embeddings_model.api_stats(),
+        "partition_pool": partition_pool.stats(),
+        "context_packer": context_packer.stats(),
+        "reranker": reranker.stats(),
+        "filtered_search": filtered_search_planner.stats(),
+        "vector_replica": vector_replica.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "rewrite_gate": rewrite_gate.stats(),
+        "pendency_categorizer": pendency_categorizer.stats(),
+        "pendency_queue": pendency_processor.stats()
+    }
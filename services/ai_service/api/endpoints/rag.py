@@ -1,35 +1,58 @@
+import json
 import logging
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import text, Connection
+import re
+import time
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableLambda
-from schemas.document import AskRequest, RespostaFormatada
-from models.loader import embeddings_model, llm_principal
-from config.database import engine
+from schemas.document import AskRequest, AnswerFeedbackRequest, RespostaFormatada
+from models.loader import embeddings_model, llm_principal, EmbeddingContext
+from config.database import async_engine
 from config.settings import settings
+from core.vector_index import apply_search_settings, query_vector
+from core.pipeline import StagedExecutor
+from core.context_packer import PackedContext, build_context
+from core.reranker import reranker
+from core.hybrid_search import build_search_query, search_params
+from core.filtered_search import EXACT_SCAN, filtered_search_planner
+from core.quantization import candidate_source, rescore_limit
+from core.vector_replica import vector_replica
+from core.semantic_cache import semantic_cache
+from core.query_rewrite import rewrite_gate
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def _search_semantic_cache(question: str, connection: Connection):
-    """Busca por uma pergunta similar no cache semântico."""
+async def _search_semantic_cache(question: str, subcategoria_id: int | None, embeddings: EmbeddingContext, connection: AsyncConnection | None = None):
+    """Busca por uma pergunta similar no cache semântico. Só o backend "history" usa a conexão."""
     logger.info(f"Buscando no cache semântico para a pergunta: '{question}'")
-    embedding = embeddings_model.embed_query(question)
-    query = text("""
+    embedding = await embeddings.aembed_query(question)
+    if settings.SEMANTIC_CACHE_BACKEND == "memory":
+        return semantic_cache.lookup(embedding, subcategoria_id)
+
+    quantization = settings.VECTOR_QUANTIZATION
+    source, where = candidate_source("chat_consultas", "c.embedding IS NOT NULL", quantization, alias="c")
+    query = text(f"""
         SELECT 
             cr.texto_resposta, 
             d.id AS source_document_id,
             d."urlArquivo" AS source_document_url,  -- CORREÇÃO: Buscando da tabela de documentos 'd'
             d.titulo AS source_document_title,
             (1 - (c.embedding <=> (:q_vector)::vector)) AS similarity
-        FROM chat_consultas c 
+        FROM {source}
         JOIN chat_respostas cr ON c.id = cr.consulta_id
         LEFT JOIN documentos d ON cr.documento_fonte = d.id
-        WHERE c.embedding IS NOT NULL ORDER BY c.embedding <=> (:q_vector)::vector LIMIT 1;
+        WHERE {where} ORDER BY c.embedding <=> (:q_vector)::vector LIMIT 1;
     """)
-    result = connection.execute(query, {"q_vector": embedding}).mappings().fetchone()
+    params = {"q_vector": query_vector(embedding)}
+    if quantization != "none":
+        params["rescore_limit"] = rescore_limit(1)
+    result = (await connection.execute(query, params)).mappings().fetchone()
     
     if result and result['similarity'] > settings.SIMILARITY_THRESHOLD_FOR_CACHE:
         logger.info(f"CACHE SEMÂNTICO HIT! Similaridade: {result['similarity']:.4f}")
@@ -38,13 +61,28 @@ def _search_semantic_cache(question: str, connection: Connection):
        logger.debug(f"CACHE SEMÂNTICO MISS. Similaridade mais próxima: {result['similarity']:.4f}")
     return None
 
-def _rewrite_question_with_history(request: AskRequest) -> str:
-    """Reescreve a pergunta usando o histórico, com uma função de limpeza para garantir robustez."""
+async def _rewrite_question_with_history(request: AskRequest) -> str:
+    """
+    Reescreve a pergunta usando o histórico, com uma função de limpeza para garantir robustez.
+    Perguntas autossuficientes e reescritas já feitas não chamam o LLM (core/query_rewrite.py).
+    """
     if not request.chat_history:
         return request.question
 
-    logger.info("Histórico recebido. Re-escrevendo a pergunta...")
+    # Pergunta autossuficiente: a reescrita devolveria a própria pergunta, sem a ida ao LLM
+    decision = rewrite_gate.decide(request.question, [turn.pergunta for turn in request.chat_history])
+    if not decision.rewrite:
+        logger.info(f"Histórico recebido, mas a pergunta é autossuficiente ({decision.reason}). Reescrita dispensada.")
+        return request.question
+
     history = "\n".join([f"Operador: {turn.pergunta}\nIA: {turn.texto_resposta}" for turn in request.chat_history])
+    cache_key = rewrite_gate.cache_key(history, request.question)
+    cached = rewrite_gate.get(cache_key)
+    if cached is not None:
+        logger.info(f"-> Pergunta Re-escrita (cache) para busca: '{cached}'")
+        return cached
+
+    logger.info(f"Histórico recebido. Re-escrevendo a pergunta ({decision.reason})...")
     
     # Usando o seu prompt original
     rewrite_prompt = ChatPromptTemplate.from_template(
@@ -71,132 +109,346 @@ def _rewrite_question_with_history(request: AskRequest) -> str:
         return lines[-1] if lines else text_output
 
     chain = rewrite_prompt | llm_principal | StrOutputParser() | RunnableLambda(clean_llm_output)
-    rewritten_question = chain.invoke({"chat_history": history, "question": request.question})
+    rewritten_question = await chain.ainvoke({"chat_history": history, "question": request.question})
+    rewrite_gate.put(cache_key, rewritten_question)
     
     logger.debug(f"-> Pergunta Original: '{request.question}'")
     logger.info(f"-> Pergunta Re-escrita para busca: '{rewritten_question}'")
     return rewritten_question
 
-def _perform_rag_retrieval(question: str, top_k: int, subcategoria_id: int | None, connection: Connection):
-    """Executa a busca RAG, sempre retornando os top_k melhores resultados, sem filtrar por score."""
-    logger.info(f"Prosseguindo com RAG para '{question}' (top_k={top_k}, subcategoria_id={subcategoria_id})")
-    embedding = embeddings_model.embed_query(question)
-    
-    params = {"q_vector": embedding, "top_k": top_k}
-    where_clauses = ["ativo = true"]
-    if subcategoria_id:
-        where_clauses.append("subcategoria_id = :sub_id")
-        params["sub_id"] = subcategoria_id
-
-    query_text = f"""
-        SELECT id, titulo, descricao, solucao, "urlArquivo", 
-               (1 - (embedding <=> (:q_vector)::vector)) AS similarity
-        FROM documentos
-        WHERE {' AND '.join(where_clauses)}
-        ORDER BY embedding <=> (:q_vector)::vector
-        LIMIT :top_k;
+async def _perform_rag_retrieval(question: str, top_k: int, subcategoria_id: int | None, embeddings: EmbeddingContext, connection: AsyncConnection):
     """
-    results = connection.execute(text(query_text), params).mappings().all()
+    Executa a busca RAG, sempre retornando os top_k melhores resultados, sem filtrar por score.
+    RETRIEVAL_MODE=hybrid combina a busca vetorial com a busca textual (ver core/hybrid_search.py).
+    Com VECTOR_REPLICA_ENABLED (e modo vetorial), a busca é feita na réplica em memória.
+    Com filtro de subcategoria, a estratégia da busca vetorial vem do core/filtered_search.py.
+    Com VECTOR_QUANTIZATION, o índice pré-seleciona candidatos pela cópia quantizada do embedding.
+    Com o re-ranking ativo, busca RERANK_CANDIDATES candidatos e re-ordena localmente (BM25/RRF).
+    """
+    logger.info(f"Prosseguindo com RAG para '{question}' (top_k={top_k}, subcategoria_id={subcategoria_id}, modo={settings.RETRIEVAL_MODE})")
+    embedding = await embeddings.aembed_query(question)
+    
+    limit = max(top_k, settings.RERANK_CANDIDATES) if settings.RERANK_ENABLED else top_k
+    mode = settings.RETRIEVAL_MODE
+    if settings.VECTOR_REPLICA_ENABLED and vector_replica.loaded and mode == "vector":
+        # Busca exata na réplica em memória, sem ida ao banco
+        results = vector_replica.search(embedding, limit, subcategoria_id)
+    else:
+        plan = await filtered_search_planner.prepare(connection, subcategoria_id)
+        # A varredura exata já compara todos os documentos da subcategoria: não há o que pré-selecionar
+        quantization = "none" if plan.strategy == EXACT_SCAN else settings.VECTOR_QUANTIZATION
+        # As palavras-chave só são necessárias para o re-ranking léxico
+        query_text = build_search_query(mode, filtered=bool(subcategoria_id), with_keywords=settings.RERANK_ENABLED,
+                                        inline_subcategory=plan.inline_subcategory, quantization=quantization)
+        params = search_params(mode, embedding, question, limit, None if plan.inline_subcategory else subcategoria_id,
+                               quantization)
+        results = (await connection.execute(text(query_text), params)).mappings().all()
 
     if not results:
         logger.warning(f"RAG não retornou documentos para a pergunta: '{question}'")
         return None
 
+    if settings.RERANK_ENABLED:
+        results = reranker.rerank(question, results, top_k)
+
     logger.debug("--- Documentos Encontrados pelo RAG (com Scores) ---")
     for doc in results:
         logger.debug(f"  - ID: {doc['id']:<4} | Score: {doc['similarity']:.4f} | Título: '{doc['titulo']}'")
     logger.debug("------------------------------------------------------")
     return results
 
-def _generate_final_answer(context: str, question: str) -> RespostaFormatada:
-    """Usa o LLM para analisar o contexto e gerar a resposta final estruturada."""
-    logger.info("Consolidando contexto para análise pelo LLM.")
-    structured_llm = llm_principal.with_structured_output(RespostaFormatada)
-    
-    generation_prompt = ChatPromptTemplate.from_template(
-    """Você é um assistente especialista e sua única função é extrair respostas literais dos 'Documentos de Referência' para responder à 'Pergunta do Operador'.
+_GENERATION_RULES = """Você é um assistente especialista e sua única função é extrair respostas literais dos 'Documentos de Referência' para responder à 'Pergunta do Operador'.
 
         REGRAS FUNDAMENTAIS:
         1.  **SEJA LITERAL:** Sua resposta deve ser baseada **exclusivamente** no texto fornecido. Não interprete, resuma ou adicione informações que não estejam escritas.
         2.  **SIGA A ORDEM:** Se um procedimento descrito no documento tem vários passos (ex: "primeiramente, faça X", "depois, faça Y"), sua resposta DEVE começar pelo primeiro passo. Não pule etapas.
         3.  **RESPOSTA DIRETA:** Encontre a seção do documento que responde diretamente à pergunta e use a informação de lá.
         4.  **CASO DE FALHA:** Se, e somente se, nenhum documento contiver a informação necessária, use a resposta padrão: "Não encontrei uma resposta para esta pergunta na base de conhecimento."
+"""
 
-        FORMATO DE SAÍDA OBRIGATÓRIO:
-        Sua resposta final DEVE usar a ferramenta `RespostaFormatada` com os seguintes campos:
-        - `resposta_texto`: O texto da resposta que você formulou, seguindo as regras acima.
-        - `id_fonte`: O ID do documento que você usou para a resposta. Se a regra 4 for aplicada, use o ID 0. **Este valor deve ser sempre um número inteiro (integer), nunca uma string com aspas.**
-
+_GENERATION_INPUTS = """
         ---
         Documentos de Referência:
         {context}
         ---
         Pergunta do Operador:
         {question}"""
+
+async def _generate_final_answer(context: str, question: str) -> RespostaFormatada:
+    """Usa o LLM para analisar o contexto e gerar a resposta final estruturada."""
+    logger.info("Consolidando contexto para análise pelo LLM.")
+    structured_llm = llm_principal.with_structured_output(RespostaFormatada)
+    
+    generation_prompt = ChatPromptTemplate.from_template(
+        _GENERATION_RULES + """
+        FORMATO DE SAÍDA OBRIGATÓRIO:
+        Sua resposta final DEVE usar a ferramenta `RespostaFormatada` com os seguintes campos:
+        - `resposta_texto`: O texto da resposta que você formulou, seguindo as regras acima.
+        - `id_fonte`: O ID do documento que você usou para a resposta. Se a regra 4 for aplicada, use o ID 0. **Este valor deve ser sempre um número inteiro (integer), nunca uma string com aspas.**
+""" + _GENERATION_INPUTS
     )
     chain = generation_prompt | structured_llm
-    return chain.invoke({"context": context, "question": question})
+    return await chain.ainvoke({"context": context, "question": question})
+
+_SOURCE_MARKER = "[[FONTE:"
+
+class _SourceMarkerParser:
+    """
+    Separa, durante o streaming, o texto da resposta do marcador final "[[FONTE: <id>]]".
+    Retém apenas o sufixo que ainda pode ser o início do marcador, liberando o resto imediatamente.
+    """
+    def __init__(self):
+        self._pending = ""
+        self._tail = None
+        self.text_parts = []
+
+    def feed(self, chunk: str) -> str:
+        if self._tail is not None:
+            self._tail += chunk
+            return ""
+        self._pending += chunk
+        marker_at = self._pending.find(_SOURCE_MARKER)
+        if marker_at >= 0:
+            ready, self._tail = self._pending[:marker_at], self._pending[marker_at:]
+            self._pending = ""
+        else:
+            keep = next((n for n in range(min(len(_SOURCE_MARKER) - 1, len(self._pending)), 0, -1)
+                         if _SOURCE_MARKER.startswith(self._pending[-n:])), 0)
+            ready = self._pending[:len(self._pending) - keep]
+            self._pending = self._pending[len(self._pending) - keep:]
+        self.text_parts.append(ready)
+        return ready
+
+    def finish(self) -> tuple[str, str, int]:
+        """Retorna (texto ainda não emitido, resposta completa, id da fonte)."""
+        rest = self._pending
+        self._pending = ""
+        self.text_parts.append(rest)
+        match = re.search(r'\[\[FONTE:\s*(\d+)\s*\]\]', self._tail or "")
+        return rest, "".join(self.text_parts).strip(), int(match.group(1)) if match else 0
 
+async def _stream_final_answer(context: str, question: str, parser: _SourceMarkerParser):
+    """Versão em streaming da geração: produz os trechos de texto à medida que o LLM os gera."""
+    logger.info("Consolidando contexto para análise pelo LLM (streaming).")
+    generation_prompt = ChatPromptTemplate.from_template(
+        _GENERATION_RULES + """
+        FORMATO DE SAÍDA OBRIGATÓRIO:
+        Escreva apenas o texto da resposta, seguindo as regras acima. Na última linha, escreva
+        `[[FONTE: <id>]]` com o ID do documento usado (um número inteiro). Se a regra 4 for aplicada, use `[[FONTE: 0]]`.
+""" + _GENERATION_INPUTS
+    )
+    chain = generation_prompt | llm_principal | StrOutputParser()
+    async for chunk in chain.astream({"context": context, "question": question}):
+        text_ready = parser.feed(chunk)
+        if text_ready:
+            yield text_ready
+
+def _format_cached_answer(cached_response) -> dict:
+    return {
+        "answer": cached_response['texto_resposta'],
+        "source_document_id": cached_response['source_document_id'],
+        "source_document_url": cached_response['source_document_url'],
+        "source_document_title": cached_response['source_document_title']
+    }
+
+_NO_DOCUMENTS_ANSWER = {"answer": "Desculpe, não encontrei nenhuma informação sobre isso.", "source_document_id": None, "source_document_url": None, "source_document_title": None}
+
+def _format_final_answer(answer_text: str, id_fonte: int, rag_results) -> dict:
+    """Monta a resposta final a partir do texto gerado e do ID da fonte escolhida pelo LLM."""
+    if id_fonte == 0:
+        logger.info("Resposta final gerada. Nenhuma fonte relevante encontrada pelo LLM.")
+        return {
+            "answer": answer_text,
+            "source_document_id": 0,
+            "source_document_url": None,
+            "source_document_title": "Nenhuma fonte encontrada"
+        }
+    
+
+    source_doc = next((doc for doc in rag_results if doc['id'] == id_fonte), rag_results[0])
+    
+    if not source_doc:
+        logger.warning(f"ALERTA: LLM retornou ID de fonte ({id_fonte}) que não foi encontrado nos resultados do RAG.")
+        # Retorna a resposta do LLM, mas sem link de fonte.
+        return {
+            "answer": answer_text,
+            "source_document_id": id_fonte,
+            "source_document_url": None,
+            "source_document_title": "Fonte não localizada"
+        }
+    
+    logger.info(f"Resposta final gerada. Fonte escolhida: ID {source_doc['id']}")
+    return {
+        "answer": answer_text,
+        "source_document_id": source_doc['id'],
+        "source_document_url": source_doc['urlArquivo'],
+        "source_document_title": source_doc['titulo']
+    }
+
+async def _store_in_semantic_cache(question: str, subcategoria_id: int | None, embeddings: EmbeddingContext, answer: dict, rag_results):
+    """
+    Guarda a resposta gerada no cache semântico, com a versão ("updatedAt") da fonte lida na
+    recuperação. Respostas sem fonte (ou com fonte fora dos resultados) não são guardadas.
+    A chave é a pergunta original, mesmo quando reescrita: é com ela que a busca no cache e as
+    invalidações por avaliação negativa (o embedding salvo em chat_consultas) encontram a entrada.
+    """
+    if settings.SEMANTIC_CACHE_BACKEND != "memory" or not answer["source_document_id"]:
+        return
+    source_doc = next((doc for doc in rag_results if doc['id'] == answer["source_document_id"]), None)
+    if source_doc is None:
+        return
+    # Embedding já calculado (e memoizado) para a busca RAG
+    embedding = await embeddings.aembed_query(question)
+    semantic_cache.store(embedding, subcategoria_id, {
+        "texto_resposta": answer["answer"],
+        "source_document_id": answer["source_document_id"],
+        "source_document_url": answer["source_document_url"],
+        "source_document_title": answer["source_document_title"]
+    }, source_version=source_doc["updatedAt"])
+
+def _pack_context(rag_results, question: str) -> PackedContext:
+    """Monta o contexto dentro do orçamento de tokens e registra quanto foi enviado ao LLM."""
+    packed = build_context(rag_results, question)
+    logger.info(f"Contexto para o LLM: {packed.report()}")
+    return packed
+
+async def _with_connection(stage, *args):
+    """Executa uma etapa com uma conexão própria do pool, pois etapas concorrentes não podem compartilhar conexão."""
+    async with async_engine.connect() as connection:
+        await apply_search_settings(connection)
+        return await stage(*args, connection)
+
+async def _run_retrieval_stages(request: AskRequest, embeddings: EmbeddingContext, executor: StagedExecutor):
+    """
+    Executa as etapas anteriores à geração e retorna (resposta_do_cache, pergunta_final, resultados_rag).
+    A busca no cache, a reescrita (se houver histórico) e, especulativamente, a recuperação RAG
+    da pergunta original rodam em paralelo. A recuperação especulativa é descartada se houver
+    cache hit ou se a reescrita alterar a pergunta.
+    """
+    if settings.SEMANTIC_CACHE_BACKEND == "memory":
+        # Busca em memória: sem checkout de conexão do pool nem ajustes de sessão
+        executor.start("cache", _search_semantic_cache(request.question, request.subcategoria_id, embeddings))
+    else:
+        executor.start("cache", _with_connection(_search_semantic_cache, request.question, request.subcategoria_id, embeddings))
+    if request.chat_history:
+        executor.start("rewrite", _rewrite_question_with_history(request))
+    if settings.SPECULATIVE_RETRIEVAL:
+        executor.start("retrieval_speculative", _with_connection(
+            _perform_rag_retrieval, request.question, request.top_k, request.subcategoria_id, embeddings
+        ))
+
+    # Etapa 1: Tentar responder com o cache
+    cached_response = await executor.result("cache")
+    if cached_response:
+        executor.cancel_pending()
+        return cached_response, request.question, None
+
+    # Etapa 2: Reescrever a pergunta com base no histórico
+    final_question = await executor.result("rewrite") if executor.has("rewrite") else request.question
+
+    # Etapa 3: Buscar documentos relevantes (RAG), reaproveitando a busca especulativa se a pergunta não mudou
+    if executor.has("retrieval_speculative") and final_question.strip() == request.question.strip():
+        rag_results = await executor.result("retrieval_speculative")
+    else:
+        executor.cancel("retrieval_speculative")
+        rag_results = await executor.run("retrieval", _with_connection(
+            _perform_rag_retrieval, final_question, request.top_k, request.subcategoria_id, embeddings
+        ))
+    return None, final_question, rag_results
 
 
 @router.post("/", summary="Responde a uma pergunta usando Cache, Memória, Reescrita e RAG")
-async def ask_question(request: AskRequest):
+async def ask_question(request: AskRequest, response: Response):
+    # Embeddings memoizados por requisição: a pergunta é vetorizada uma única vez
+    embeddings = embeddings_model.request_context()
+    executor = StagedExecutor()
     try:
-        with engine.begin() as connection:
-            # Etapa 1: Tentar responder com o cache
-            cached_response = _search_semantic_cache(request.question, connection)
+        async with executor:
+            cached_response, final_question, rag_results = await _run_retrieval_stages(request, embeddings, executor)
             if cached_response:
-                 logger.info(f"Retornando resposta do cache. Fonte original ID: {cached_response.get('source_document_id')}")
-                 return {
-                    "answer": cached_response['texto_resposta'],
-                    "source_document_id": cached_response['source_document_id'],
-                    "source_document_url": cached_response['source_document_url'],
-                    "source_document_title": cached_response['source_document_title']
-                }
-
-            # Etapa 2: Reescrever a pergunta com base no histórico
-            final_question = _rewrite_question_with_history(request)
-
-            # Etapa 3: Buscar documentos relevantes (RAG)
-            rag_results = _perform_rag_retrieval(final_question, request.top_k, request.subcategoria_id, connection)
+                logger.info(f"Retornando resposta do cache. Fonte original ID: {cached_response.get('source_document_id')}")
+                return _format_cached_answer(cached_response)
+
             if not rag_results:
-                return {"answer": "Desculpe, não encontrei nenhuma informação sobre isso.", "source_document_id": None, "source_document_url": None, "source_document_title": None}
+                return _NO_DOCUMENTS_ANSWER
 
             # Etapa 4: Gerar a resposta final com base nos documentos
-            context = "\n".join([f"Contexto (ID: {doc['id']}): Título: '{doc['titulo']}'. Solução: {doc['solucao']}" for doc in rag_results])
-            llm_output = _generate_final_answer(context, final_question)
-            
-            # Etapa 5: Formatar e retornar a resposta
-            if llm_output.id_fonte == 0:
-                logger.info("Resposta final gerada. Nenhuma fonte relevante encontrada pelo LLM.")
-                return {
-                    "answer": llm_output.resposta_texto,
-                    "source_document_id": 0,
-                    "source_document_url": None,
-                    "source_document_title": "Nenhuma fonte encontrada"
-                }
+            context = _pack_context(rag_results, final_question)
+            response.headers["X-Context-Tokens"] = str(context.tokens)
+            llm_output = await executor.run("generation", _generate_final_answer(context.text, final_question))
             
-
-            source_doc = next((doc for doc in rag_results if doc['id'] == llm_output.id_fonte), rag_results[0])
-            
-            if not source_doc:
-                logger.warning(f"ALERTA: LLM retornou ID de fonte ({llm_output.id_fonte}) que não foi encontrado nos resultados do RAG.")
-                # Retorna a resposta do LLM, mas sem link de fonte.
-                return {
-                    "answer": llm_output.resposta_texto,
-                    "source_document_id": llm_output.id_fonte,
-                    "source_document_url": None,
-                    "source_document_title": "Fonte não localizada"
-                }
-            
-            logger.info(f"Resposta final gerada. Fonte escolhida: ID {source_doc['id']}")
-            return {
-                "answer": llm_output.resposta_texto,
-                "source_document_id": source_doc['id'],
-                "source_document_url": source_doc['urlArquivo'],
-                "source_document_title": source_doc['titulo']
-            }
+            # Etapa 5: Formatar, guardar no cache semântico e retornar a resposta
+            answer = _format_final_answer(llm_output.resposta_texto, llm_output.id_fonte, rag_results)
+            await _store_in_semantic_cache(request.question, request.subcategoria_id, embeddings, answer, rag_results)
+            return answer
 
     except Exception as e:
         logger.exception("Ocorreu um erro inesperado ao processar a pergunta em /ask")
-        raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao processar sua pergunta.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao processar sua pergunta.")
+    finally:
+        response.headers["Server-Timing"] = executor.server_timing()
+        logger.info(f"Tempos por etapa do /ask: {executor.breakdown()}")
+        logger.debug(f"Embeddings da requisição: {embeddings.stats()}")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream", summary="Versão em streaming (Server-Sent Events) do /ask")
+async def ask_question_stream(request: AskRequest):
+    """
+    Mesmo pipeline do /ask, mas a resposta é enviada como Server-Sent Events:
+    - `token`: trechos do texto da resposta, à medida que o LLM os gera;
+    - `final`: o mesmo JSON retornado pelo /ask (resposta completa e metadados da fonte);
+    - `error`: em caso de falha.
+    No cache hit (ou sem documentos), a resposta inteira segue em um único `token`, seguido do `final`.
+    """
+    async def event_stream():
+        embeddings = embeddings_model.request_context()
+        executor = StagedExecutor()
+        try:
+            async with executor:
+                cached_response, final_question, rag_results = await _run_retrieval_stages(request, embeddings, executor)
+                if cached_response or not rag_results:
+                    payload = _format_cached_answer(cached_response) if cached_response else _NO_DOCUMENTS_ANSWER
+                    yield _sse_event("token", {"text": payload["answer"]})
+                    yield _sse_event("final", payload)
+                    return
+
+                parser = _SourceMarkerParser()
+                generation_start = time.perf_counter()
+                context = _pack_context(rag_results, final_question)
+                async for text_ready in _stream_final_answer(context.text, final_question, parser):
+                    if "first_token" not in executor.timings:
+                        executor.timings["first_token"] = (time.perf_counter() - generation_start) * 1000
+                    yield _sse_event("token", {"text": text_ready})
+                executor.timings["generation"] = (time.perf_counter() - generation_start) * 1000
+
+                rest, answer_text, id_fonte = parser.finish()
+                if rest:
+                    yield _sse_event("token", {"text": rest})
+                answer = _format_final_answer(answer_text, id_fonte, rag_results)
+                yield _sse_event("final", answer)
+                await _store_in_semantic_cache(request.question, request.subcategoria_id, embeddings, answer, rag_results)
+        except Exception:
+            logger.exception("Ocorreu um erro inesperado ao processar a pergunta em /ask/stream")
+            yield _sse_event("error", {"detail": "Ocorreu um erro interno ao processar sua pergunta."})
+        finally:
+            logger.info(f"Tempos por etapa do /ask/stream: {executor.breakdown()}")
+            logger.debug(f"Embeddings da requisição: {embeddings.stats()}")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Desativa buffering em proxies (ex: nginx) para que os tokens cheguem imediatamente
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/feedback", summary="Registra a avaliação de uma resposta; avaliações negativas a removem do cache semântico")
+async def answer_feedback(request: AnswerFeedbackRequest):
+    if request.util:
+        return {"invalidated": 0}
+    embedding = await embeddings_model.aembed_query(request.question)
+    invalidated = await semantic_cache.invalidate_everywhere(embedding, request.subcategoria_id)
+    logger.info(f"Avaliação negativa para '{request.question}': {invalidated} resposta(s) removida(s) do cache semântico.")
+    return {"invalidated": invalidated}
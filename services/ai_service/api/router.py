@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import document_process, rag, pendencies, askembedding 
+from .endpoints import document_process, rag, pendencies, askembedding, metrics
 
 # Cria o roteador principal da API que irá agregar os outros
 api_router = APIRouter()
@@ -27,4 +27,10 @@ api_router.include_router(
     askembedding.router,
     prefix="/askembedding", 
     tags=["Geração de embeddings para perguntas feitas no chat"]
+)
+
+api_router.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["Métricas"]
 )
\ No newline at end of file
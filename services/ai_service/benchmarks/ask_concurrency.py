@@ -0,0 +1,79 @@
+"""
+Benchmark de carga do /api/ask contra servidores stub locais de LLM e embeddings.
+
+Mede a vazão (req/s) e a latência em diferentes níveis de concorrência. Com o
+pipeline assíncrono, a vazão deve crescer com a concorrência em vez de ficar
+presa em ~1 / (latência de uma requisição), como acontecia com as chamadas bloqueantes.
+
+Requer o Postgres com pgvector do docker-compose (com as migrações do backend aplicadas)
+e o .env do serviço. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.ask_concurrency --requests 64 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import httpx
+from benchmarks.stubs import StubServer, create_stub_app
+
+
+async def _run_level(client: httpx.AsyncClient, total: int, concurrency: int, with_history: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        payload = {"question": f"Como resolver o problema número {i} no sistema?", "top_k": 3}
+        if with_history:
+            payload["chat_history"] = [{"pergunta": "Como acesso o sistema?", "texto_resposta": "Use seu login."}]
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/ask/", json=payload)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    }
+
+
+async def main(args):
+    # Importado somente depois de apontar as variáveis de ambiente para os stubs
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://ai-service", timeout=120) as client:
+        print(f"{'conc.':>6} | {'req/s':>8} | {'p50 (s)':>8} | {'p99 (s)':>8}")
+        baseline = None
+        for concurrency in args.concurrency:
+            result = await _run_level(client, args.requests, concurrency, not args.no_history)
+            baseline = baseline or result["throughput"]
+            print(f"{result['concurrency']:>6} | {result['throughput']:>8.2f} | {result['p50']:>8.3f} | {result['p99']:>8.3f}"
+                  f"  (x{result['throughput'] / baseline:.1f} vs. concorrência {args.concurrency[0]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--embedding-delay", type=float, default=0.05)
+    parser.add_argument("--llm-delay", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-history", action="store_true", help="Não envia histórico (pula a reescrita).")
+    args = parser.parse_args()
+
+    stub_app = create_stub_app(embedding_delay=args.embedding_delay, llm_delay=args.llm_delay)
+    with StubServer(stub_app, port=args.port) as stub:
+        os.environ["GOOGLE_API_BASE_URL"] = f"{stub.url}/v1beta"
+        os.environ["GROQ_API_BASE_URL"] = stub.url
+        asyncio.run(main(args))
+        print(f"Chamadas recebidas pelos stubs: embeddings={stub_app.state.embedding_calls}, llm={stub_app.state.llm_calls}")
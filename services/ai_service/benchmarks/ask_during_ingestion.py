@@ -0,0 +1,120 @@
+"""
+Benchmark de isolamento da ingestão: latência do /api/ask enquanto vários documentos
+são processados ao mesmo tempo pelo /api/documents/process.
+
+Para cada modo, mede a latência do /api/ask sem carga (linha de base) e durante a
+ingestão simultânea de `--documents` manuais sintéticos servidos pelo stub:
+- inline: particionamento executado direto no event loop (comportamento anterior);
+- thread: PARTITION_POOL_WORKERS=0 (thread do próprio processo, ainda disputa o GIL);
+- process: pool de processos com `--pool-workers` processos aquecidos.
+
+Com o pool de processos, o p50/p99 durante a ingestão deve ficar próximo da linha de base.
+
+Requer o Postgres com pgvector do docker-compose (com as migrações do backend aplicadas)
+e o .env do serviço. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.ask_during_ingestion --documents 4 --sections 3000 --modes inline process
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import httpx
+from benchmarks.stubs import StubServer, create_stub_app
+
+
+async def _ask_loop(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    """Envia perguntas sequenciais até `stop` e retorna as latências."""
+    latencies = []
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.post("/api/ask/", json={"question": f"Como resolver o problema número {i}?", "top_k": 3})
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        i += 1
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def _summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return f"n={len(latencies):>4} | p50={statistics.median(latencies):.3f}s | p99={p99:.3f}s | max={latencies[-1]:.3f}s"
+
+
+async def _run_mode(client: httpx.AsyncClient, args, stub_url: str) -> tuple:
+    # Linha de base: perguntas sem nenhuma ingestão em andamento
+    stop = asyncio.Event()
+    asker = asyncio.create_task(_ask_loop(client, stop, args.interval))
+    await asyncio.sleep(args.baseline_seconds)
+    stop.set()
+    baseline = await asker
+
+    async def ingest(i: int):
+        payload = {
+            "titulo": f"Manual {i}",
+            "descricao": "Manual sintético",
+            "url_arquivo": f"{stub_url}/files/manual-{args.sections + i}.txt",
+            "subcategoria_id": 1,
+            "palavras_chave": []
+        }
+        response = await client.post("/api/documents/process/", json=payload)
+        response.raise_for_status()
+
+    stop = asyncio.Event()
+    asker = asyncio.create_task(_ask_loop(client, stop, args.interval))
+    start = time.perf_counter()
+    await asyncio.gather(*(ingest(i) for i in range(args.documents)))
+    ingestion_seconds = time.perf_counter() - start
+    stop.set()
+    during = await asker
+    return baseline, during, ingestion_seconds
+
+
+async def main(args, stub_url: str):
+    # Importados somente depois de apontar as variáveis de ambiente para os stubs
+    from main import app
+    from core.partition_pool import partition_pool
+
+    async def run_inline(func, *func_args):
+        return func(*func_args)
+
+    pooled_run = partition_pool.run
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://ai-service", timeout=600) as client:
+        for mode in args.modes:
+            partition_pool.shutdown()
+            partition_pool.run = pooled_run
+            if mode == "inline":
+                partition_pool.run = run_inline
+            else:
+                partition_pool.workers = args.pool_workers if mode == "process" else 0
+                await partition_pool.start()
+
+            baseline, during, ingestion_seconds = await _run_mode(client, args, stub_url)
+            print(f"[{mode}] {args.documents} documento(s) ingeridos em {ingestion_seconds:.1f}s")
+            print(f"  /api/ask sem ingestão:      {_summary(baseline)}")
+            print(f"  /api/ask durante ingestão:  {_summary(during)}")
+        partition_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=4, help="Documentos ingeridos simultaneamente.")
+    parser.add_argument("--sections", type=int, default=3000, help="Seções (chunks) de cada manual sintético.")
+    parser.add_argument("--modes", nargs="+", choices=["inline", "thread", "process"], default=["inline", "process"])
+    parser.add_argument("--pool-workers", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=0.05, help="Pausa entre perguntas consecutivas (s).")
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    parser.add_argument("--embedding-delay", type=float, default=0.05)
+    parser.add_argument("--llm-delay", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub_app = create_stub_app(embedding_delay=args.embedding_delay, llm_delay=args.llm_delay)
+    with StubServer(stub_app, port=args.port) as stub:
+        os.environ["GOOGLE_API_BASE_URL"] = f"{stub.url}/v1beta"
+        os.environ["GROQ_API_BASE_URL"] = stub.url
+        asyncio.run(main(args, stub.url))
@@ -0,0 +1,137 @@
+"""
+Verificação e micro-benchmark do parser de chunks (core/chunk_parser.py).
+
+1. Corpus golden: cada arquivo .txt em benchmarks/golden/chunk_parser é um chunk; o
+   expected.json guarda a saída de `prepare_chunk` gerada pela implementação anterior
+   (quatro `re.search` independentes, reproduzida aqui em `_legacy_prepare_chunk`).
+   A nova implementação precisa produzir exatamente a mesma saída.
+2. Micro-benchmark: tempo de `prepare_chunk` (anterior x novo) sobre manuais sintéticos
+   com milhares de seções "#".
+
+Uso, a partir de services/ai_service:
+
+    python -m benchmarks.chunk_parser --sections 5000 --repeat 5
+    python -m benchmarks.chunk_parser --check-only
+    python -m benchmarks.chunk_parser --update-golden   # só ao mudar o corpus de entrada
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from benchmarks.corpus import synthetic_manual
+from core.text_extraction import iter_logical_blocks, prepare_chunk
+
+GOLDEN_DIR = Path(__file__).parent / "golden" / "chunk_parser"
+GOLDEN_EXPECTED = GOLDEN_DIR / "expected.json"
+
+# Metadados do "documento" usados como fallback nos casos golden
+GOLDEN_REQUEST = SimpleNamespace(
+    titulo="Manual padrão",
+    descricao="Descrição padrão do documento",
+    palavras_chave=["fallback", "padrão."]
+)
+
+
+def _legacy_prepare_chunk(request_data, clean_chunk: str):
+    """Implementação anterior de `prepare_chunk`, mantida como referência."""
+    titulo_final = request_data.titulo
+    descricao_final = request_data.descricao
+    solucao_final = clean_chunk.lstrip('#').strip()
+    palavras_chave_extraidas = ""
+
+    match_titulo = re.search(r'#\s*(.*?)(?:\n|Descrição:)', clean_chunk, re.IGNORECASE)
+    if match_titulo and match_titulo.group(1).strip():
+        titulo_final = match_titulo.group(1).strip()
+
+    match_descricao = re.search(r'Descrição:(.*?)(?=\s*Solução:|\s*Palavras-chave:|$)', clean_chunk, re.DOTALL | re.IGNORECASE)
+    if match_descricao and match_descricao.group(1).strip():
+        descricao_final = match_descricao.group(1).strip()
+
+    match_solucao = re.search(r'Solução:(.*?)(?=\s*Palavras-chave:|$)', clean_chunk, re.DOTALL | re.IGNORECASE)
+    if match_solucao and match_solucao.group(1).strip():
+        solucao_final = match_solucao.group(1).strip()
+
+    match_palavras_chave = re.search(r'Palavras-chave:(.*)', clean_chunk, re.DOTALL | re.IGNORECASE)
+    if match_palavras_chave and match_palavras_chave.group(1).strip():
+        palavras_chave_extraidas = match_palavras_chave.group(1).strip()
+
+    palavras_chave_finais = palavras_chave_extraidas if palavras_chave_extraidas else ", ".join(request_data.palavras_chave)
+
+    texto_para_embedding = f"Título: {titulo_final}\nDescrição: {descricao_final}\nSolução: {solucao_final}"
+    if palavras_chave_finais:
+        texto_para_embedding += f"\nPalavras-chave: {palavras_chave_finais.strip().rstrip('.')}"
+
+    chunk_data = {
+        "titulo": titulo_final,
+        "descricao": descricao_final,
+        "solucao": solucao_final,
+        "palavras_chave": [p.strip().rstrip('.') for p in palavras_chave_finais.split(',') if p.strip()]
+    }
+    return chunk_data, texto_para_embedding
+
+
+def _golden_cases() -> dict:
+    return {path.stem: path.read_text(encoding="utf-8").strip() for path in sorted(GOLDEN_DIR.glob("*.txt"))}
+
+
+def _as_golden(prepared) -> dict:
+    chunk_data, texto_para_embedding = prepared
+    return {**chunk_data, "texto_para_embedding": texto_para_embedding}
+
+
+def update_golden():
+    expected = {name: _as_golden(_legacy_prepare_chunk(GOLDEN_REQUEST, chunk)) for name, chunk in _golden_cases().items()}
+    GOLDEN_EXPECTED.write_text(json.dumps(expected, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"{len(expected)} casos gravados em {GOLDEN_EXPECTED}")
+
+
+def check_golden() -> bool:
+    expected = json.loads(GOLDEN_EXPECTED.read_text(encoding="utf-8"))
+    cases = _golden_cases()
+    failures = [name for name in sorted(set(cases) | set(expected))
+                if name not in cases or name not in expected or _as_golden(prepare_chunk(GOLDEN_REQUEST, cases[name])) != expected[name]]
+    for name in failures:
+        print(f"  FALHA: {name}")
+    print(f"Corpus golden: {len(cases) - len(failures)}/{len(cases)} casos idênticos à implementação anterior.")
+    return not failures
+
+
+def _time(function, chunks, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for chunk in chunks:
+            function(GOLDEN_REQUEST, chunk)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def benchmark(sections: int, repeat: int):
+    chunks = [block.strip() for block in iter_logical_blocks([synthetic_manual(sections)]) if block.strip()]
+    assert all(prepare_chunk(GOLDEN_REQUEST, c) == _legacy_prepare_chunk(GOLDEN_REQUEST, c) for c in chunks)
+
+    legacy = _time(_legacy_prepare_chunk, chunks, repeat)
+    current = _time(prepare_chunk, chunks, repeat)
+    print(f"{len(chunks)} chunks (mediana de {repeat} execuções):")
+    print(f"  anterior (4x re.search): {legacy * 1000:8.1f} ms  ({legacy / len(chunks) * 1e6:.2f} µs/chunk)")
+    print(f"  parser de passada única: {current * 1000:8.1f} ms  ({current / len(chunks) * 1e6:.2f} µs/chunk)  x{legacy / current:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=5000, help="Seções do manual sintético.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check-only", action="store_true", help="Apenas verifica o corpus golden.")
+    parser.add_argument("--update-golden", action="store_true", help="Regera o expected.json com a implementação anterior.")
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden()
+    if not check_golden():
+        sys.exit(1)
+    if not args.check_only:
+        benchmark(args.sections, args.repeat)
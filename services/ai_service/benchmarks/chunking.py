@@ -0,0 +1,169 @@
+"""
+Benchmark do chunking: um chunk por cabeçalho "#" (sem limite) x orçamento de tokens com sobreposição.
+
+Usa um corpus de exemplo com seções curtas, seções muito longas e um documento sem nenhum
+cabeçalho. Cada "fato" (código de erro e sua correção) aparece uma única vez no corpus e é
+procurado por uma pergunta. Para cada configuração, reporta:
+- quantidade de chunks e distribuição de tamanho (tokens estimados: p50, p95, máximo);
+- chunks acima do limite de entrada do modelo de embeddings (`--embed-limit`), que seriam truncados;
+- qualidade de recuperação: hit@1 / hit@3 (o fato está num dos k primeiros chunks, dentro da
+  parte efetivamente vista pelo modelo de embeddings) e tokens de contexto enviados ao LLM no top-3.
+
+Por padrão os embeddings são vetores léxicos locais (TF-IDF sobre os primeiros `--embed-limit`
+termos de cada chunk), que não exigem rede; `--gemini` usa o modelo de embeddings configurado no .env.
+
+Uso, a partir de services/ai_service:
+
+    python -m benchmarks.chunking --configs 0:0 256:32 512:64 1024:128
+"""
+import argparse
+import asyncio
+import math
+import random
+import re
+import statistics
+from collections import Counter
+from types import SimpleNamespace
+from core.text_extraction import iter_logical_blocks, iter_prepared_chunks
+from core.tokenization import estimate_tokens
+
+_VOCABULARY = [
+    "sistema", "acesso", "senha", "relatório", "cadastro", "tela", "usuário", "permissão", "servidor",
+    "rede", "impressora", "backup", "configuração", "navegador", "certificado", "módulo", "integração",
+    "perfil", "sessão", "atualização", "banco", "consulta", "painel", "arquivo", "processo"
+]
+_MODULES = ["financeiro", "estoque", "faturamento", "portal", "agenda", "fiscal", "compras", "RH"]
+_ACTIONS = [
+    "limpar o cache local e reiniciar o serviço", "reemitir o certificado digital",
+    "reindexar a base de consultas", "liberar a porta 8443 no firewall",
+    "recriar o perfil do usuário", "atualizar o driver da impressora"
+]
+
+
+def _filler(rng: random.Random, sentences: int) -> list:
+    return [" ".join(rng.choice(_VOCABULARY) for _ in range(rng.randint(8, 18))).capitalize() + "." for _ in range(sentences)]
+
+
+def build_corpus(seed: int = 7):
+    """Retorna (documentos, perguntas): cada pergunta aponta para o texto exato do fato que a responde."""
+    rng = random.Random(seed)
+    documents, questions = [], []
+
+    def fact(code: int) -> str:
+        text = f"O código de erro E{code:03d} indica falha no módulo {rng.choice(_MODULES)} e a correção é {rng.choice(_ACTIONS)}."
+        questions.append((f"O que indica o código de erro E{code:03d} e como corrigir?", text))
+        return text
+
+    code = 1
+    # Manual com cabeçalhos: seções curtas e seções muito longas
+    sections = []
+    for index in range(30):
+        length = rng.choice([6, 10, 20, 200, 600])
+        body = _filler(rng, length)
+        for _ in range(max(1, length // 150)):
+            body.insert(rng.randrange(len(body) + 1), fact(code))
+            code += 1
+        sections.append(f"# Procedimento {index}\nDescrição: {' '.join(_filler(rng, 1))}\nSolução: {' '.join(body)}")
+    documents.append(("Manual de procedimentos", "\n\n".join(sections)))
+
+    # Documento sem nenhum cabeçalho: vira um único bloco
+    body = _filler(rng, 1500)
+    for _ in range(12):
+        body.insert(rng.randrange(len(body) + 1), fact(code))
+        code += 1
+    documents.append(("Base de conhecimento legada", "\n".join(body)))
+    return documents, questions
+
+
+def _terms(text: str, limit: int) -> Counter:
+    return Counter(re.findall(r'\w+', text.lower())[:limit])
+
+
+def _tfidf_vectors(texts: list, idf: dict) -> list:
+    """Vetores TF-IDF esparsos (tf sublinear), normalizados."""
+    vectors = []
+    for counts in texts:
+        vector = {term: (1 + math.log(count)) * idf.get(term, 0.0) for term, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        vectors.append({term: value / norm for term, value in vector.items()})
+    return vectors
+
+
+def _cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(term, 0.0) for term, value in a.items())
+
+
+def _visible_text(text: str, limit: int) -> str:
+    """Parte do texto que cabe no limite de entrada do modelo de embeddings (aproximação por palavras)."""
+    return " ".join(text.split()[:limit])
+
+
+def build_chunks(documents, max_tokens: int, overlap_tokens: int) -> list:
+    chunks = []
+    for titulo, text in documents:
+        request = SimpleNamespace(titulo=titulo, descricao=titulo, palavras_chave=[])
+        chunks.extend(texto for _, texto in iter_prepared_chunks(request, iter_logical_blocks([text]), max_tokens, overlap_tokens))
+    return chunks
+
+
+async def _embed(chunks: list, questions: list, args):
+    if not args.gemini:
+        chunk_terms = [_terms(chunk, args.embed_limit) for chunk in chunks]
+        document_frequency = Counter(term for counts in chunk_terms for term in counts)
+        idf = {term: math.log(len(chunks) / frequency) + 1 for term, frequency in document_frequency.items()}
+        return (_tfidf_vectors(chunk_terms, idf),
+                _tfidf_vectors([_terms(question, args.embed_limit) for question, _ in questions], idf), _cosine)
+
+    from models.loader import embeddings_model
+    chunk_vectors = await embeddings_model.aembed_documents([_visible_text(chunk, args.embed_limit) for chunk in chunks])
+    question_vectors = await embeddings_model.aembed_queries([question for question, _ in questions])
+    return chunk_vectors, question_vectors, lambda a, b: sum(x * y for x, y in zip(a, b))
+
+
+async def evaluate(documents, questions, max_tokens: int, overlap_tokens: int, args) -> dict:
+    chunks = build_chunks(documents, max_tokens, overlap_tokens)
+    sizes = sorted(estimate_tokens(chunk) for chunk in chunks)
+    chunk_vectors, question_vectors, similarity = await _embed(chunks, questions, args)
+
+    hits_at_1 = hits_at_3 = 0
+    context_tokens = []
+    for (question, answer), question_vector in zip(questions, question_vectors):
+        ranked = sorted(range(len(chunks)), key=lambda i: similarity(question_vector, chunk_vectors[i]), reverse=True)[:3]
+        found = [answer in _visible_text(chunks[i], args.embed_limit) for i in ranked]
+        hits_at_1 += found[0]
+        hits_at_3 += any(found)
+        context_tokens.append(sum(estimate_tokens(chunks[i]) for i in ranked))
+
+    return {
+        "chunks": len(chunks),
+        "p50": statistics.median(sizes),
+        "p95": sizes[min(len(sizes) - 1, int(len(sizes) * 0.95))],
+        "max": sizes[-1],
+        "over_limit": sum(size > args.embed_limit for size in sizes),
+        "hit@1": hits_at_1 / len(questions),
+        "hit@3": hits_at_3 / len(questions),
+        "context": statistics.mean(context_tokens)
+    }
+
+
+async def main(args):
+    documents, questions = build_corpus()
+    print(f"Corpus: {len(documents)} documentos, {len(questions)} perguntas\n")
+    print(f"{'max:overlap':>12} | {'chunks':>6} | {'p50':>5} | {'p95':>6} | {'máx':>6} | {'>limite':>7} | {'hit@1':>5} | {'hit@3':>5} | {'ctx top-3':>9}")
+    for config in args.configs:
+        max_tokens, overlap_tokens = (int(value) for value in config.split(":"))
+        result = await evaluate(documents, questions, max_tokens, overlap_tokens, args)
+        label = config if max_tokens else "sem limite"
+        print(f"{label:>12} | {result['chunks']:>6} | {result['p50']:>5.0f} | {result['p95']:>6} | {result['max']:>6} | "
+              f"{result['over_limit']:>7} | {result['hit@1']:>5.2f} | {result['hit@3']:>5.2f} | {result['context']:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["0:0", "256:32", "512:64", "1024:128"],
+                        help="Pares max_tokens:overlap_tokens (0:0 = um chunk por cabeçalho, sem limite).")
+    parser.add_argument("--embed-limit", type=int, default=2048, help="Limite de entrada do modelo de embeddings (tokens).")
+    parser.add_argument("--gemini", action="store_true", help="Usa o modelo de embeddings real em vez do vetor léxico local.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+"""
+Benchmark da montagem do contexto do prompt de geração: passagens completas (anterior) x
+empacotamento com orçamento de tokens (core/context_packer.py).
+
+Gera conjuntos de resultados de busca sintéticos, com passagens de tamanhos variados (de
+poucas linhas a manuais inteiros) e duplicatas ocasionais, e mede:
+- tamanho do contexto em tokens estimados (p50, p95, máximo) e se o fato que responde à
+  pergunta continuou no contexto;
+- latência da etapa de geração (`_generate_final_answer`) contra o stub do LLM, cujo atraso
+  cresce com o tamanho do prompt (`--llm-delay-per-1k-tokens`).
+
+A geração é a única etapa do /api/ask afetada pelo tamanho do contexto; as demais não mudam.
+Uso, a partir de services/ai_service (requer o .env do serviço):
+
+    python -m benchmarks.context_packing --questions 40 --top-k 5 --budget 1500
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from benchmarks.stubs import StubServer, create_stub_app
+
+_VOCABULARY = [
+    "sistema", "acesso", "senha", "relatório", "cadastro", "tela", "usuário", "permissão", "servidor",
+    "rede", "impressora", "backup", "configuração", "navegador", "certificado", "módulo", "integração"
+]
+
+
+def _filler(rng: random.Random, sentences: int) -> str:
+    return " ".join(" ".join(rng.choice(_VOCABULARY) for _ in range(rng.randint(8, 18))).capitalize() + "." for _ in range(sentences))
+
+
+def build_cases(questions: int, top_k: int, seed: int = 11) -> list:
+    """Cada caso: (pergunta, fato esperado, resultados da busca com similaridade)."""
+    rng = random.Random(seed)
+    cases = []
+    for index in range(questions):
+        fact = f"Para corrigir o erro E{index:03d} é preciso reemitir o certificado do módulo fiscal."
+        results = []
+        for rank in range(top_k):
+            size = rng.choice([3, 8, 20, 60, 150])
+            solucao = _filler(rng, size)
+            if rank == 0:
+                sentences = solucao.split(". ")
+                sentences.insert(rng.randrange(len(sentences) + 1), fact.rstrip("."))
+                solucao = ". ".join(sentences)
+            results.append({"id": index * 100 + rank + 1, "titulo": f"Procedimento {rank}", "solucao": solucao,
+                            "urlArquivo": None, "similarity": 0.9 - rank * 0.05})
+        if rng.random() < 0.3:
+            # Mesmo documento cadastrado duas vezes
+            results.append({**results[0], "id": index * 100 + 99, "similarity": 0.88})
+        cases.append((f"Como corrigir o erro E{index:03d}?", fact, results))
+    return cases
+
+
+def _percentiles(values: list) -> str:
+    values = sorted(values)
+    return f"p50={statistics.median(values):>7.0f} | p95={values[min(len(values) - 1, int(len(values) * 0.95))]:>7.0f} | máx={values[-1]:>7.0f}"
+
+
+async def main(args):
+    # Importados somente depois de apontar as variáveis de ambiente para os stubs
+    from api.endpoints.rag import _generate_final_answer
+    from config.settings import settings
+    from core.context_packer import ContextPacker, build_context
+
+    cases = build_cases(args.questions, args.top_k)
+    packer = ContextPacker(args.budget, args.passage_max_tokens, settings.CONTEXT_DEDUP_THRESHOLD)
+
+    for label, packing in (("passagens completas", False), (f"orçamento de {args.budget} tokens", True)):
+        settings.CONTEXT_PACKING_ENABLED = packing
+        sizes, latencies, kept = [], [], 0
+        for question, fact, results in cases:
+            context = build_context(results, question, packer)
+            sizes.append(context.tokens)
+            kept += fact.split(" é ")[0] in context.text
+            start = time.perf_counter()
+            await _generate_final_answer(context.text, question)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        print(f"[{label}]")
+        print(f"  contexto (tokens):  {_percentiles(sizes)}")
+        print(f"  geração (ms):       {_percentiles(latencies)}")
+        print(f"  fato preservado no contexto: {kept}/{len(cases)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--passage-max-tokens", type=int, default=600)
+    parser.add_argument("--llm-delay", type=float, default=0.2)
+    parser.add_argument("--llm-delay-per-1k-tokens", type=float, default=0.15)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub_app = create_stub_app(llm_delay=args.llm_delay, llm_delay_per_1k_tokens=args.llm_delay_per_1k_tokens)
+    with StubServer(stub_app, port=args.port) as stub:
+        os.environ["GOOGLE_API_BASE_URL"] = f"{stub.url}/v1beta"
+        os.environ["GROQ_API_BASE_URL"] = stub.url
+        asyncio.run(main(args))
+        print(f"Tokens de prompt recebidos pelo stub do LLM: {stub_app.state.llm_prompt_tokens:.0f}")
@@ -0,0 +1,18 @@
+"""
+Textos sintéticos dos benchmarks. Sem dependências do servidor (uvicorn/FastAPI), para que
+as verificações offline (ex: `python -m benchmarks.chunk_parser --check-only`) rodem só com
+o código do serviço.
+"""
+import random
+
+
+def synthetic_manual(sections: int) -> str:
+    """Manual no formato esperado pelo chunking: um bloco "# Título / Descrição / Solução" por seção."""
+    rng = random.Random(sections)
+    words = ["sistema", "acesso", "senha", "relatório", "cadastro", "erro", "tela", "usuário", "permissão", "servidor"]
+    blocks = []
+    for i in range(sections):
+        descricao = " ".join(rng.choice(words) for _ in range(25))
+        solucao = " ".join(rng.choice(words) for _ in range(60))
+        blocks.append(f"# Procedimento {i}\nDescrição: {descricao}\nSolução: {solucao}\nPalavras-chave: {rng.choice(words)}, {rng.choice(words)}")
+    return "\n\n".join(blocks)
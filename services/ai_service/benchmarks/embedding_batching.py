@@ -0,0 +1,73 @@
+"""
+Benchmark do /api/askembedding com e sem o micro-batcher, contra um servidor stub de
+embeddings com latência fixa por chamada e limite de chamadas simultâneas (cota do provedor).
+
+Reporta requisições/s por nível de concorrência e quantas chamadas chegaram ao provedor.
+O cache de embeddings é desativado para que toda requisição dependa da API.
+Requer o .env do serviço. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.embedding_batching --requests 512 --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+import os
+import time
+import httpx
+from benchmarks.stubs import StubServer, create_stub_app
+
+
+async def _run_level(client: httpx.AsyncClient, total: int, concurrency: int, offset: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            response = await client.post("/api/askembedding/", json={"text": f"Pergunta de teste número {offset + i}"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args, stub_app):
+    # Importados somente depois de apontar as variáveis de ambiente para o stub
+    from main import app
+    from models.loader import embeddings_model, EmbeddingBatcher
+
+    embeddings_model.cache = None
+    batcher = embeddings_model.batcher or EmbeddingBatcher(
+        lambda texts: embeddings_model._remote_embed_batch(texts, task_type="RETRIEVAL_QUERY"),
+        max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://ai-service", timeout=120) as client:
+        print(f"{'modo':>12} | {'conc.':>6} | {'req/s':>9} | {'chamadas à API':>14}")
+        offset = 0
+        for label, active_batcher in (("sem batcher", None), ("com batcher", batcher)):
+            embeddings_model.batcher = active_batcher
+            for concurrency in args.concurrency:
+                calls_before = stub_app.state.embedding_calls
+                throughput = await _run_level(client, args.requests, concurrency, offset)
+                offset += args.requests
+                calls = stub_app.state.embedding_calls - calls_before
+                print(f"{label:>12} | {concurrency:>6} | {throughput:>9.1f} | {calls:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--embedding-delay", type=float, default=0.05)
+    parser.add_argument("--stub-max-concurrency", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub_app = create_stub_app(embedding_delay=args.embedding_delay, embedding_max_concurrency=args.stub_max_concurrency)
+    with StubServer(stub_app, port=args.port) as stub:
+        os.environ["GOOGLE_API_BASE_URL"] = f"{stub.url}/v1beta"
+        os.environ["EMBEDDING_BATCH_MAX_SIZE"] = str(args.max_batch_size)
+        os.environ["EMBEDDING_BATCH_MAX_WAIT_MS"] = str(args.max_wait_ms)
+        asyncio.run(main(args, stub_app))
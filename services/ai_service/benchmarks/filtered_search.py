@@ -0,0 +1,149 @@
+"""
+Benchmark da busca vetorial com filtro de subcategoria (core/filtered_search.py) em subcategorias
+de tamanhos bem diferentes, numa tabela de teste populada no Postgres/pgvector local.
+
+Para cada subcategoria e estratégia, reporta quantos resultados voltaram (média e mínimo, de top_k),
+recall@k contra a busca exata e latência p50/p99:
+- pos_filtro: índice HNSW global + WHERE (comportamento anterior; pode voltar menos que top_k);
+- exact_scan, iterative_scan, partial_index: cada estratégia forçada;
+- auto: a escolha do FilteredSearchPlanner a partir da contagem de documentos por subcategoria.
+
+A tabela 'bench_filtered_search' é recriada a cada execução. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.filtered_search --sizes 50 500 3000 15000 60000 --queries 50 --top-k 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import numpy as np
+from sqlalchemy import text
+from config.database import async_engine, engine
+from config.settings import settings
+from core.filtered_search import (
+    EXACT_SCAN, ITERATIVE_SCAN, PARTIAL_INDEX, FilteredSearchPlanner, apply_strategy,
+    partial_index_name, partial_index_predicate
+)
+from core.hybrid_search import build_search_query
+from core.vector_index import OPCLASS_BY_OPERATOR, DISTANCE_OPERATOR, build_index_ddl
+
+TABLE = "bench_filtered_search"
+DIMENSION = 768
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def seed(data: np.ndarray, subcategories: np.ndarray, partial_min_rows: int):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id integer PRIMARY KEY, titulo text, descricao text, solucao text, "urlArquivo" text,
+                ativo boolean DEFAULT true, subcategoria_id integer, embedding vector({DIMENSION}),
+                "updatedAt" timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+        batch = 1000
+        for start in range(0, len(data), batch):
+            connection.execute(
+                text(f"INSERT INTO {TABLE} (id, titulo, subcategoria_id, embedding) VALUES (:id, :titulo, :sub, (:v)::vector)"),
+                [{"id": i + 1, "titulo": f"Documento {i + 1}", "sub": int(subcategories[i]), "v": to_literal(data[i])}
+                 for i in range(start, min(start + batch, len(data)))]
+            )
+
+    opclass = OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"CREATE INDEX {TABLE}_subcategoria_idx ON {TABLE} (subcategoria_id)"))
+        start = time.perf_counter()
+        connection.execute(text(build_index_ddl(TABLE, "embedding", "hnsw", opclass, f"{TABLE}_embedding_idx")))
+        print(f"Índice HNSW global criado em {time.perf_counter() - start:.1f}s")
+        for subcategoria_id, rows in zip(*np.unique(subcategories, return_counts=True)):
+            if rows >= partial_min_rows:
+                start = time.perf_counter()
+                connection.execute(text(build_index_ddl(
+                    TABLE, "embedding", "hnsw", opclass, partial_index_name(TABLE, "hnsw", subcategoria_id),
+                    where=partial_index_predicate(subcategoria_id)
+                )))
+                print(f"Índice parcial da subcategoria {subcategoria_id} ({rows} linhas) criado em {time.perf_counter() - start:.1f}s")
+        connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+async def run_queries(strategy: str, queries: np.ndarray, subcategoria_id: int, top_k: int, planner: FilteredSearchPlanner) -> tuple:
+    latencies, results = [], []
+    for vector in queries:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(settings.HNSW_EF_SEARCH)})
+            inline = None
+            if strategy == "auto":
+                plan = await planner.prepare(connection, subcategoria_id)
+                inline = plan.inline_subcategory
+            elif strategy != "pos_filtro":
+                await apply_strategy(connection, strategy, planner.iterative_supported)
+                inline = subcategoria_id if strategy == PARTIAL_INDEX else None
+            query = text(build_search_query("vector", filtered=True, table=TABLE, inline_subcategory=inline))
+            params = {"q_vector": vector, "top_k": top_k} | ({} if inline else {"sub_id": subcategoria_id})
+
+            start = time.perf_counter()
+            ids = [row.id for row in (await connection.execute(query, params)).all()]
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(ids)
+    return latencies, results
+
+
+async def main(args):
+    rng = np.random.default_rng(42)
+    subcategories = np.repeat(np.arange(1, len(args.sizes) + 1), args.sizes)
+    centers = rng.normal(size=(args.clusters, DIMENSION))
+    data = centers[rng.integers(0, args.clusters, size=len(subcategories))] + rng.normal(scale=0.35, size=(len(subcategories), DIMENSION))
+    data = (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+
+    print(f"Populando {len(data)} linhas em '{TABLE}' (subcategorias: {args.sizes})...")
+    seed(data, subcategories, args.partial_min_rows)
+
+    planner = FilteredSearchPlanner(exact_max_rows=args.exact_max_rows, refresh_seconds=3600, table=TABLE)
+    async with async_engine.connect() as connection:
+        await planner.refresh(connection)
+
+    strategies = ["pos_filtro", EXACT_SCAN, ITERATIVE_SCAN, PARTIAL_INDEX, "auto"]
+    print(f"\n{'subcat':>6} | {'linhas':>6} | {'estratégia':<15} | {'retornados':>14} | {'recall':>6} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+    for subcategoria_id, rows in enumerate(args.sizes, start=1):
+        members = np.flatnonzero(subcategories == subcategoria_id)
+        queries = data[rng.choice(len(data), size=args.queries)] + rng.normal(scale=0.2, size=(args.queries, DIMENSION))
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+        # Verdade de referência: top-k exato dentro da subcategoria (ids começam em 1)
+        truth = [set(members[np.argsort(-(data[members] @ q))[:args.top_k]] + 1) for q in queries]
+
+        for strategy in strategies:
+            if strategy == PARTIAL_INDEX and subcategoria_id not in planner.partial_indexes:
+                continue
+            if strategy == ITERATIVE_SCAN and not planner.iterative_supported:
+                continue
+            latencies, results = await run_queries(strategy, queries, subcategoria_id, args.top_k, planner)
+            returned = [len(ids) for ids in results]
+            expected = min(args.top_k, rows)
+            recall = np.mean([len(set(ids) & t) / expected for ids, t in zip(results, truth)])
+            latencies.sort()
+            label = strategy if strategy != "auto" else f"auto ({planner.choose(subcategoria_id).strategy})"
+            print(f"{subcategoria_id:>6} | {rows:>6} | {label:<15} | {statistics.mean(returned):>5.1f} (mín {min(returned)}) | "
+                  f"{recall:>6.3f} | {statistics.median(latencies):>8.2f} | {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>8.2f}")
+
+    print(f"\nDecisões do planner: {planner.stats()['decisions']}")
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 3000, 15000, 60000],
+                        help="Número de documentos de cada subcategoria (distribuição assimétrica).")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--exact-max-rows", type=int, default=settings.FILTERED_EXACT_MAX_ROWS)
+    parser.add_argument("--partial-min-rows", type=int, default=settings.FILTERED_PARTIAL_INDEX_MIN_ROWS)
+    parser.add_argument("--keep", action="store_true", help="Mantém a tabela de teste ao final.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,151 @@
+"""
+Benchmark da recuperação só vetorial x híbrida (vetorial + texto completo, core/hybrid_search.py)
+em uma tabela de teste populada no Postgres/pgvector local.
+
+Cada documento tem um código de erro único (ex: E00042) no título e na solução, e um embedding
+agrupado por tema. As perguntas citam o código, mas o embedding da pergunta só captura o tema e
+parte do que distingue o documento (`--query-signal`), como acontece com códigos de produto e
+mensagens de erro exatas em embeddings reais. Para cada modo, reporta latência (p50/p99) e
+hit@1 / hit@k, com e sem o filtro de subcategoria.
+
+Usa as mesmas consultas do /api/ask e a mesma expressão da coluna "textoBusca" da migration do
+backend; a tabela 'bench_hybrid_search' é recriada a cada execução. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.hybrid_search --rows 20000 --queries 200 --top-k 5
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from sqlalchemy import text
+from config.database import engine
+from config.settings import settings
+from core.hybrid_search import TEXT_SEARCH_COLUMN, TEXT_SEARCH_CONFIG, build_search_query, search_params
+from core.vector_index import OPCLASS_BY_OPERATOR, DISTANCE_OPERATOR, build_index_ddl
+
+TABLE = "bench_hybrid_search"
+DIMENSION = 768
+
+_THEMES = ["impressora", "senha", "certificado", "backup", "vpn", "relatório", "cadastro", "estoque"]
+_MODULES = ["financeiro", "estoque", "faturamento", "portal", "agenda", "fiscal", "compras", "RH"]
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def build_dataset(rng: np.random.Generator, rows: int, clusters: int, subcategories: int):
+    centers = rng.normal(size=(clusters, DIMENSION))
+    assignment = rng.integers(0, clusters, size=rows)
+    own = rng.normal(scale=0.35, size=(rows, DIMENSION))
+    vectors = _normalize(centers[assignment] + own)
+    documents = []
+    for i in range(rows):
+        theme, module = _THEMES[assignment[i] % len(_THEMES)], _MODULES[rng.integers(len(_MODULES))]
+        code = f"E{i:05d}"
+        documents.append({
+            "id": i + 1,
+            "titulo": f"Erro {code} de {theme} no módulo {module}",
+            "descricao": f"Falha de {theme} ao acessar o módulo {module}.",
+            "solucao": f"Ao receber o erro {code}, verificar a configuração de {theme} e reiniciar o serviço do {module}.",
+            "subcategoria_id": int(rng.integers(1, subcategories + 1)),
+            "embedding": to_literal(vectors[i])
+        })
+    return documents, centers, assignment, own
+
+
+def seed(documents: list):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id integer PRIMARY KEY, titulo text, descricao text, solucao text, "urlArquivo" text,
+                ativo boolean DEFAULT true, subcategoria_id integer, embedding vector({DIMENSION}),
+                "updatedAt" timestamptz NOT NULL DEFAULT now(),
+                {TEXT_SEARCH_COLUMN} tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(titulo, '')), 'A') ||
+                    setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(descricao, '')), 'B') ||
+                    setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(solucao, '')), 'C')
+                ) STORED
+            )
+        """))
+        batch = 1000
+        for start in range(0, len(documents), batch):
+            connection.execute(text(f"""
+                INSERT INTO {TABLE} (id, titulo, descricao, solucao, subcategoria_id, embedding)
+                VALUES (:id, :titulo, :descricao, :solucao, :subcategoria_id, (:embedding)::vector)
+            """), documents[start:start + batch])
+
+    opclass = OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(build_index_ddl(TABLE, "embedding", "hnsw", opclass, f"{TABLE}_embedding_idx")))
+        connection.execute(text(f"CREATE INDEX {TABLE}_texto_busca_idx ON {TABLE} USING gin ({TEXT_SEARCH_COLUMN})"))
+        connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+def run_queries(mode: str, queries: list, top_k: int, filtered: bool) -> tuple[list, list]:
+    latencies, ranks = [], []
+    query = text(build_search_query(mode, filtered=filtered, table=TABLE))
+    with engine.connect() as connection:
+        connection.execute(text("SELECT set_config('hnsw.ef_search', :ef_search, false)"), {"ef_search": str(settings.HNSW_EF_SEARCH)})
+        for question, vector, target, subcategoria_id in queries:
+            params = search_params(mode, vector, question, top_k, subcategoria_id if filtered else None)
+            start = time.perf_counter()
+            ids = [row[0] for row in connection.execute(query, params)]
+            latencies.append((time.perf_counter() - start) * 1000)
+            ranks.append(ids.index(target) + 1 if target in ids else 0)
+    return latencies, ranks
+
+
+def report(label: str, latencies: list, ranks: list, top_k: int):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    hit_at_1 = sum(rank == 1 for rank in ranks) / len(ranks)
+    hit_at_k = sum(rank > 0 for rank in ranks) / len(ranks)
+    print(f"{label:<28} | p50 {statistics.median(latencies):8.2f} ms | p99 {p99:8.2f} ms | "
+          f"hit@1 {hit_at_1:.3f} | hit@{top_k} {hit_at_k:.3f}")
+
+
+def main(args):
+    rng = np.random.default_rng(42)
+    documents, centers, assignment, own = build_dataset(rng, args.rows, args.clusters, args.subcategories)
+
+    print(f"Populando {args.rows} linhas em '{TABLE}'...")
+    seed(documents)
+
+    # Embedding da pergunta: tema do documento + só uma fração do que o diferencia dos vizinhos
+    targets = rng.choice(args.rows, size=args.queries, replace=False)
+    noise = rng.normal(scale=0.35, size=(args.queries, DIMENSION))
+    vectors = _normalize(centers[assignment[targets]] + args.query_signal * own[targets] + noise)
+    queries = [
+        (f"Como resolver o erro E{i:05d}?", to_literal(vector), int(i) + 1, documents[i]["subcategoria_id"])
+        for i, vector in zip(targets, vectors)
+    ]
+
+    print(f"Pesos da busca híbrida: vetorial={settings.HYBRID_VECTOR_WEIGHT}, textual={settings.HYBRID_TEXT_WEIGHT}, "
+          f"rrf_k={settings.HYBRID_RRF_K}, candidatos={settings.HYBRID_CANDIDATES}")
+    for filtered in (False, True):
+        for mode in ("vector", "hybrid"):
+            latencies, ranks = run_queries(mode, queries, args.top_k, filtered)
+            report(f"{mode}{' + subcategoria' if filtered else ''}", latencies, ranks, args.top_k)
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--subcategories", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--query-signal", type=float, default=0.5,
+                        help="Fração da parte específica do documento presente no embedding da pergunta.")
+    parser.add_argument("--keep", action="store_true", help="Mantém a tabela de teste ao final.")
+    main(parser.parse_args())
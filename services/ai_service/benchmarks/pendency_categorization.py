@@ -0,0 +1,143 @@
+"""
+Benchmark da categorização de assuntos pendentes por vizinho mais próximo (core/categorizer.py)
+x a categorização pelo LLM (llm_categorizador), sem banco.
+
+1. Decisões, com embeddings sintéticos: categorias com subcategorias próximas entre si; parte das
+   perguntas são paráfrases de subcategorias existentes (ruído variável) e o restante são assuntos
+   novos dentro das mesmas categorias. Para cada limiar, reporta a fração de chamadas ao LLM
+   evitadas, a precisão das atribuições diretas (subcategoria certa) e quantos assuntos novos
+   foram atribuídos indevidamente a uma subcategoria existente.
+2. Latência dos dois caminhos contra os servidores stub locais (embeddings e LLM, com atraso
+   configurável): embedding da pergunta + vizinho mais próximo x embedding + chamada ao LLM.
+
+Uso, a partir de services/ai_service:
+
+    python -m benchmarks.pendency_categorization --categories 20 --subcategories 15 --questions 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import numpy as np
+from benchmarks.stubs import StubServer, create_stub_app
+
+DIMENSION = 768
+
+
+def synthetic_taxonomy(rng: np.random.Generator, categories: int, per_category: int, spread: float) -> tuple:
+    centers = rng.normal(size=(categories, DIMENSION))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    def sample(category: int) -> np.ndarray:
+        vector = centers[category] + rng.normal(scale=spread / np.sqrt(DIMENSION), size=DIMENSION)
+        return vector / np.linalg.norm(vector)
+
+    categorias = [{"id": c + 1, "nome": f"Categoria {c + 1}"} for c in range(categories)]
+    subcategorias, vectors = [], {}
+    for c in range(categories):
+        for s in range(per_category):
+            row = {"id": len(subcategorias) + 1, "categoria_id": c + 1, "nome": f"Subcategoria {c + 1}.{s + 1}", "descricao": None}
+            subcategorias.append(row)
+            vectors[f"Categoria {c + 1}: {row['nome']}"] = sample(c)
+    return categorias, subcategorias, vectors, sample
+
+
+def synthetic_questions(rng, subcategorias, vectors, sample, total: int, known: float, noise: tuple) -> list:
+    """(vetor, id da subcategoria certa ou None para assunto novo)."""
+    questions = []
+    labels = list(vectors.values())
+    for _ in range(total):
+        if rng.random() < known:
+            index = int(rng.integers(len(subcategorias)))
+            vector = labels[index] + rng.normal(scale=rng.uniform(*noise) / np.sqrt(DIMENSION), size=DIMENSION)
+            questions.append((vector, subcategorias[index]["id"]))
+        else:
+            questions.append((sample(int(rng.integers(len(set(s["categoria_id"] for s in subcategorias))))), None))
+    return questions
+
+
+async def decisions(args):
+    from core.categorizer import PendencyCategorizer
+
+    rng = np.random.default_rng(args.seed)
+    categorias, subcategorias, vectors, sample = synthetic_taxonomy(rng, args.categories, args.subcategories, args.spread)
+    questions = synthetic_questions(rng, subcategorias, vectors, sample, args.questions, args.known, (args.noise_min, args.noise_max))
+
+    async def embed_many(texts):
+        return [vectors[text] for text in texts]
+
+    print(f"{len(categorias)} categorias, {len(subcategorias)} subcategorias, {len(questions)} perguntas "
+          f"({args.known:.0%} de assuntos já existentes)\n")
+    print(f"{'limiar':>6} | {'LLM evitado':>11} | {'precisão':>8} | {'novos atribuídos':>16} | {'match p50 (µs)':>14}")
+    for threshold in args.thresholds:
+        categorizer = PendencyCategorizer(match_threshold=threshold, dedup_threshold=1.0)
+        await categorizer.update(categorias, subcategorias, embed_many)
+        correct = wrong_new = 0
+        timings = []
+        for vector, expected in questions:
+            start = time.perf_counter()
+            match = categorizer.match(vector)
+            timings.append((time.perf_counter() - start) * 1e6)
+            if match is not None:
+                correct += match.subcategoria_id == expected
+                wrong_new += expected is None
+        stats = categorizer.stats()
+        precision = correct / stats["llm_calls_avoided"] if stats["llm_calls_avoided"] else 1.0
+        print(f"{threshold:>6.2f} | {stats['avoided_rate']:>11.1%} | {precision:>8.3f} | {wrong_new:>16} | {statistics.median(timings):>14.1f}")
+    return categorias
+
+
+async def latency(args, categorias: list):
+    # Importados somente depois de apontar as variáveis de ambiente para os stubs
+    from core.pendencies import suggest_categories
+    from models.loader import embeddings_model
+
+    nomes = [row["nome"] for row in categorias]
+    paths = {"vizinho mais próximo": [], "LLM": []}
+    for i in range(args.latency_samples):
+        start = time.perf_counter()
+        await embeddings_model.aembed_query(f"Pergunta de teste {i} (vizinho)")
+        paths["vizinho mais próximo"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await embeddings_model.aembed_query(f"Pergunta de teste {i} (LLM)")
+        await suggest_categories([f"Pergunta de teste {i} (LLM)"], nomes)
+        paths["LLM"].append(time.perf_counter() - start)
+
+    print(f"\n{'caminho':<22} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+    for label, latencies in paths.items():
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{label:<22} | {statistics.median(latencies) * 1000:>8.1f} | {p99 * 1000:>8.1f}")
+    await embeddings_model.aclose()
+
+
+async def main(args):
+    categorias = await decisions(args)
+    await latency(args, categorias)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--subcategories", type=int, default=15, help="Subcategorias por categoria.")
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--known", type=float, default=0.7, help="Fração de perguntas sobre assuntos já existentes.")
+    parser.add_argument("--spread", type=float, default=0.5, help="Distância das subcategorias ao centro da categoria.")
+    parser.add_argument("--noise-min", type=float, default=0.2)
+    parser.add_argument("--noise-max", type=float, default=0.6)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.75, 0.8, 0.85, 0.9])
+    parser.add_argument("--latency-samples", type=int, default=20)
+    parser.add_argument("--embedding-delay", type=float, default=0.05)
+    parser.add_argument("--llm-delay", type=float, default=1.0, help="Latência simulada do modelo de 70B.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stub_app = create_stub_app(embedding_delay=args.embedding_delay, llm_delay=args.llm_delay)
+    with StubServer(stub_app, port=args.port) as stub:
+        os.environ["GOOGLE_API_BASE_URL"] = f"{stub.url}/v1beta"
+        os.environ["GROQ_API_BASE_URL"] = stub.url
+        asyncio.run(main(args))
+        print(f"Chamadas recebidas pelos stubs: embeddings={stub_app.state.embedding_calls}, llm={stub_app.state.llm_calls}")
@@ -0,0 +1,127 @@
+"""
+Benchmark da busca vetorial sobre cópias quantizadas do embedding (core/quantization.py) com
+re-pontuação exata, contra a busca de precisão completa, numa tabela de teste no Postgres/pgvector local.
+
+Para cada modo (vector, halfvec, bit), reporta o tamanho e o tempo de construção do índice HNSW e,
+para cada número de candidatos re-pontuados, latência p50/p99 e recall@k contra a busca exata
+(força bruta em numpy). A consulta é a do /api/ask (build_search_query).
+
+A tabela 'bench_quantization' é recriada a cada execução. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.quantization --rows 20000 --queries 200 --candidates 20 40 100 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import numpy as np
+from sqlalchemy import text
+from config.database import async_engine, engine
+from config.settings import settings
+from core.hybrid_search import build_search_query, search_params
+from core.quantization import quantized_expression, quantized_index_name, quantized_opclass
+from core.vector_index import OPCLASS_BY_OPERATOR, DISTANCE_OPERATOR, build_index_ddl, index_name
+
+TABLE = "bench_quantization"
+DIMENSION = settings.EMBEDDING_DIMENSION
+
+
+def seed(data: np.ndarray):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id integer PRIMARY KEY, titulo text, descricao text, solucao text, "urlArquivo" text,
+                ativo boolean DEFAULT true, subcategoria_id integer, embedding vector({DIMENSION}),
+                "updatedAt" timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+        batch = 1000
+        for start in range(0, len(data), batch):
+            connection.execute(
+                text(f"INSERT INTO {TABLE} (id, titulo, embedding) VALUES (:id, :titulo, :v)"),
+                [{"id": i + 1, "titulo": f"Documento {i + 1}", "v": data[i]} for i in range(start, min(start + batch, len(data)))]
+            )
+
+
+def build_indexes() -> dict:
+    """Cria os três índices HNSW e retorna {modo: (tamanho em MB, segundos de construção)}."""
+    indexes = {
+        "none": ("embedding", OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR], index_name(TABLE, "embedding", "hnsw")),
+        **{mode: (quantized_expression("embedding", mode), quantized_opclass(mode), quantized_index_name(TABLE, "embedding", "hnsw", mode))
+           for mode in ("halfvec", "bit")},
+    }
+    report = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for mode, (column, opclass, name) in indexes.items():
+            start = time.perf_counter()
+            connection.execute(text(build_index_ddl(TABLE, column, "hnsw", opclass, name)))
+            elapsed = time.perf_counter() - start
+            size = connection.execute(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}).scalar()
+            report[mode] = (size / 1024 / 1024, elapsed)
+        connection.execute(text(f"ANALYZE {TABLE}"))
+    return report
+
+
+async def run_queries(quantization: str, queries: np.ndarray, top_k: int, candidates: int) -> tuple:
+    query = text(build_search_query("vector", filtered=False, table=TABLE, quantization=quantization))
+    latencies, results = [], []
+    async with async_engine.connect() as connection:
+        # O HNSW devolve no máximo ef_search resultados: precisa cobrir os candidatos
+        await connection.execute(text("SELECT set_config('hnsw.ef_search', :value, false)"),
+                                 {"value": str(max(settings.HNSW_EF_SEARCH, candidates))})
+        for vector in queries:
+            params = search_params("vector", vector, "", top_k, None, quantization)
+            if quantization != "none":
+                params["rescore_limit"] = candidates
+            start = time.perf_counter()
+            results.append([row.id for row in (await connection.execute(query, params)).all()])
+            latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies), results
+
+
+async def main(args):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(args.clusters, DIMENSION))
+    data = centers[rng.integers(0, args.clusters, size=args.rows)] + rng.normal(scale=0.35, size=(args.rows, DIMENSION))
+    data = (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+    queries = data[rng.choice(args.rows, size=args.queries)] + rng.normal(scale=0.2, size=(args.queries, DIMENSION))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    truth = [set(np.argsort(-(data @ q))[:args.top_k] + 1) for q in queries]
+
+    print(f"Populando {args.rows} linhas em '{TABLE}'...")
+    seed(data)
+    sizes = build_indexes()
+    with engine.connect() as connection:
+        table_mb = connection.execute(text(f"SELECT pg_table_size('{TABLE}')")).scalar() / 1024 / 1024
+    print(f"Tabela: {table_mb:.1f} MB")
+    print(f"\n{'modo':<8} | {'índice (MB)':>11} | {'construção (s)':>14}")
+    for mode, (size_mb, elapsed) in sizes.items():
+        print(f"{'vector' if mode == 'none' else mode:<8} | {size_mb:>11.1f} | {elapsed:>14.1f}")
+
+    print(f"\n{'modo':<8} | {'candidatos':>10} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'recall@' + str(args.top_k):>9}")
+    runs = [("none", args.top_k)] + [(mode, c) for mode in ("halfvec", "bit") for c in args.candidates]
+    for mode, candidates in runs:
+        latencies, results = await run_queries(mode, queries, args.top_k, candidates)
+        recall = np.mean([len(set(ids) & t) / args.top_k for ids, t in zip(results, truth)])
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        label = "vector" if mode == "none" else mode
+        shown = "-" if mode == "none" else candidates
+        print(f"{label:<8} | {shown:>10} | {statistics.median(latencies):>8.2f} | {p99:>8.2f} | {recall:>9.3f}")
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 40, 100, 200],
+                        help="Candidatos pré-selecionados pela cópia quantizada e re-pontuados.")
+    parser.add_argument("--keep", action="store_true", help="Mantém a tabela de teste ao final.")
+    asyncio.run(main(parser.parse_args()))
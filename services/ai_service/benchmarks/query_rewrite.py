@@ -0,0 +1,149 @@
+"""
+Benchmark do pré-classificador da reescrita com histórico e do cache de reescritas
+(core/query_rewrite.py), contra a reescrita sempre feita pelo LLM.
+
+1. Decisões, sem rede: perguntas de acompanhamento rotuladas à mão (autossuficientes ou
+   dependentes do histórico). Reporta a fração de reescritas dispensadas, os erros que
+   importam (pergunta dependente liberada sem reescrita) e o custo do classificador.
+2. Latência de _rewrite_question_with_history contra o servidor stub do LLM (atraso
+   configurável), num fluxo em que parte das conversas chega de novo (reenvio, nova
+   tentativa): sempre LLM x pré-classificador + cache. Reporta p50/p99, taxa de dispensa e
+   taxa de acerto do cache.
+
+Uso, a partir de services/ai_service:
+
+    python -m benchmarks.query_rewrite --requests 200 --repeat 0.3 --llm-delay 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from benchmarks.stubs import StubServer, create_stub_app
+
+# (pergunta anterior, pergunta de acompanhamento, precisa de reescrita)
+FOLLOW_UPS = [
+    ("Como emitir a nota fiscal eletrônica?", "Como cancelar uma nota fiscal eletrônica já autorizada?", False),
+    ("Como emitir a nota fiscal eletrônica?", "E para cancelar?", True),
+    ("Como emitir a nota fiscal eletrônica?", "Qual o prazo para isso?", True),
+    ("Como emitir a nota fiscal eletrônica?", "Como cancelar essa nota fiscal eletrônica?", False),
+    ("Como emitir a nota fiscal eletrônica?", "Qual o procedimento?", True),
+    ("Como emitir a nota fiscal eletrônica?", "Como faço o mesmo para NFC-e?", True),
+    ("Como emitir a nota fiscal eletrônica?", "Qual o procedimento no caso de rejeição?", True),
+    ("Como emitir a nota fiscal eletrônica?", "Em caso de erro na emissão, como reenviar a nota fiscal?", False),
+    ("Como emitir a nota fiscal eletrônica?", "Caso o boleto vença, como gerar a segunda via?", False),
+    ("Como configurar a impressora fiscal no caixa?", "Onde encontro o driver da impressora fiscal Bematech?", False),
+    ("Como configurar a impressora fiscal no caixa?", "Como reinstalá-la?", True),
+    ("Como configurar a impressora fiscal no caixa?", "E se ela não aparecer na lista?", True),
+    ("Como configurar a impressora fiscal no caixa?", "Como faço a mesma coisa no PDV novo?", True),
+    ("Como configurar a impressora fiscal no caixa?", "Quais portas seriais o sistema suporta para leitores de código de barras?", False),
+    ("Como redefinir a senha do operador?", "Quem pode fazer isso?", True),
+    ("Como redefinir a senha do operador?", "Como bloquear o acesso de um operador desligado da empresa?", False),
+    ("Como redefinir a senha do operador?", "Tem outra forma?", True),
+    ("Como redefinir a senha do operador?", "Qual o tamanho mínimo da senha do operador no sistema?", False),
+    ("Como gerar o relatório de vendas por período?", "Dá para exportar?", True),
+    ("Como gerar o relatório de vendas por período?", "Como exportar o relatório de vendas por período para Excel?", False),
+    ("Como gerar o relatório de vendas por período?", "Mas e o de devoluções?", True),
+    ("Como gerar o relatório de vendas por período?", "Como lançar uma devolução de mercadoria com troca?", False),
+    ("Como gerar o relatório de vendas por período?", "Ele mostra os descontos?", True),
+    ("Qual o horário de fechamento do caixa?", "Como fazer a sangria do caixa durante o turno?", False),
+    ("Qual o horário de fechamento do caixa?", "Posso alterar?", True),
+    ("Qual o horário de fechamento do caixa?", "Como reabrir o caixa depois do fechamento?", False),
+    ("Qual o horário de fechamento do caixa?", "E no domingo?", True),
+    ("Como cadastrar um novo produto?", "Como cadastrar o código NCM de um produto importado?", False),
+    ("Como cadastrar um novo produto?", "Precisa do NCM?", True),
+    ("Como cadastrar um novo produto?", "Depois disso ele já aparece no PDV?", True),
+    ("Como cadastrar um novo produto?", "Como alterar o preço de venda de vários produtos ao mesmo tempo?", False),
+    ("Como cadastrar um novo produto?", "Como excluí-lo?", True),
+    ("O sistema está lento ao abrir vendas.", "Como limpar o cache do navegador no computador do caixa?", False),
+    ("O sistema está lento ao abrir vendas.", "Isso acontece com todos?", True),
+    ("O sistema está lento ao abrir vendas.", "Também acontece no fechamento.", True),
+    ("O sistema está lento ao abrir vendas.", "Qual a velocidade mínima de internet recomendada para o sistema?", False),
+    ("Como consultar o status do pedido do cliente?", "E a previsão de entrega?", True),
+    ("Como consultar o status do pedido do cliente?", "Como alterar o endereço de entrega de um pedido já faturado?", False),
+    ("Como consultar o status do pedido do cliente?", "Onde vejo o código de rastreio do pedido do cliente?", False),
+    ("Como consultar o status do pedido do cliente?", "Qual a diferença entre os dois?", True),
+    ("Como aplicar desconto na venda?", "Tem limite?", True),
+    ("Como aplicar desconto na venda?", "Qual o limite de desconto na venda para operador sem permissão de gerente?", False),
+    ("Como aplicar desconto na venda?", "Como liberar o desconto com a senha do gerente?", False),
+    ("Como aplicar desconto na venda?", "Vale para o outro também?", True),
+    ("Como aplicar desconto na venda?", "Como cancelar um item lançado por engano no cupom fiscal?", False),
+]
+
+
+def decisions(args):
+    from core.query_rewrite import classify
+
+    skipped = wrong_skips = missed = 0
+    timings = []
+    for previous, question, needs_rewrite in FOLLOW_UPS:
+        start = time.perf_counter()
+        decision = classify(question, previous, args.min_terms, args.overlap)
+        timings.append((time.perf_counter() - start) * 1e6)
+        skipped += not decision.rewrite
+        wrong_skips += needs_rewrite and not decision.rewrite
+        missed += not needs_rewrite and decision.rewrite
+        if args.verbose:
+            print(f"{'reescreve' if decision.rewrite else 'dispensa':<9} {decision.reason:<15} {question}")
+
+    dependent = sum(needs for *_, needs in FOLLOW_UPS)
+    print(f"{len(FOLLOW_UPS)} perguntas de acompanhamento ({len(FOLLOW_UPS) - dependent} autossuficientes)")
+    print(f"reescritas dispensadas:                 {skipped / len(FOLLOW_UPS):.1%}")
+    print(f"dependentes liberadas sem reescrita:    {wrong_skips} de {dependent}")
+    print(f"autossuficientes enviadas ao LLM:       {missed} de {len(FOLLOW_UPS) - dependent}")
+    print(f"classificador p50:                      {statistics.median(timings):.1f} µs")
+
+
+async def latency(args):
+    # Importados somente depois de apontar as variáveis de ambiente para os stubs
+    from api.endpoints import rag
+    from core.query_rewrite import RewriteGate
+    from schemas.document import AskRequest, ChatHistoryTurn
+
+    rng = random.Random(args.seed)
+    requests = []
+    for i in range(args.requests):
+        if requests and rng.random() < args.repeat:
+            requests.append(rng.choice(requests))
+            continue
+        previous, question, _ = rng.choice(FOLLOW_UPS)
+        history = [ChatHistoryTurn(pergunta=previous, texto_resposta=f"Resposta {i} sobre: {previous}")]
+        requests.append(AskRequest(question=question, chat_history=history))
+
+    print(f"\n{'modo':<26} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'dispensa':>8} | {'cache hit':>9}")
+    for label, enabled, cache_entries in (("sempre LLM", False, 0), ("pré-classificador + cache", True, args.cache_entries)):
+        rag.rewrite_gate = RewriteGate(enabled, args.min_terms, args.overlap, cache_entries)
+        latencies = []
+        for request in requests:
+            start = time.perf_counter()
+            await rag._rewrite_question_with_history(request)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        stats = rag.rewrite_gate.stats()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{label:<26} | {statistics.median(latencies):>8.1f} | {p99:>8.1f} | {stats['skip_rate']:>8.1%} | {stats['cache_hit_rate']:>9.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--repeat", type=float, default=0.3, help="Fração de requisições que repetem uma conversa já vista.")
+    parser.add_argument("--min-terms", type=int, default=3)
+    parser.add_argument("--overlap", type=float, default=0.6)
+    parser.add_argument("--cache-entries", type=int, default=2000)
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="Latência simulada do llm_principal.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="Mostra a decisão de cada pergunta.")
+    parser.add_argument("--offline", action="store_true", help="Só as decisões (sem servidor stub).")
+    args = parser.parse_args()
+
+    decisions(args)
+    if not args.offline:
+        stub_app = create_stub_app(llm_delay=args.llm_delay)
+        with StubServer(stub_app, port=args.port) as stub:
+            os.environ["GOOGLE_API_BASE_URL"] = f"{stub.url}/v1beta"
+            os.environ["GROQ_API_BASE_URL"] = stub.url
+            asyncio.run(latency(args))
+            print(f"Chamadas recebidas pelo stub do LLM: {stub_app.state.llm_calls}")
@@ -0,0 +1,115 @@
+"""
+Benchmark de relevância do re-ranking local (core/reranker.py), sem rede e sem banco.
+
+Gera uma base sintética de documentos (título, descrição, solução, palavras-chave) em que
+vários documentos do mesmo tema compartilham o vocabulário, e perguntas que citam termos
+específicos de um único documento (código de erro, nome do módulo, sintoma). A similaridade
+vetorial é simulada: relevância real do documento + ruído gaussiano (`--noise`), o que
+reproduz o caso em que o embedding acerta o tema mas confunde documentos vizinhos.
+
+Para cada estratégia, reporta hit@1, hit@k (o documento certo chega ao LLM), MRR e a
+latência do re-ranking por pergunta, além do recall dos candidatos (teto do re-ranking):
+- vetorial: top_k direto da busca (comportamento anterior);
+- bm25 / rrf: busca `--candidates` candidatos e re-ordena até top_k.
+
+Uso, a partir de services/ai_service:
+
+    python -m benchmarks.reranking --questions 300 --top-k 3 --candidates 20
+"""
+import argparse
+import random
+import statistics
+import time
+from core.reranker import Reranker
+
+_THEMES = {
+    "impressão": ["impressora", "spooler", "driver", "fila", "papel", "toner"],
+    "acesso": ["senha", "login", "bloqueio", "perfil", "permissão", "sessão"],
+    "rede": ["vpn", "firewall", "porta", "proxy", "dns", "conexão"],
+    "fiscal": ["certificado", "nota", "sefaz", "xml", "assinatura", "lote"],
+    "backup": ["cópia", "restauração", "agendamento", "disco", "volume", "retenção"]
+}
+_MODULES = ["financeiro", "estoque", "faturamento", "portal", "agenda", "compras", "contábil", "RH"]
+_SYMPTOMS = ["travamento", "lentidão", "mensagem de erro", "tela em branco", "timeout", "duplicidade"]
+_COMMON = ["sistema", "usuário", "verificar", "configuração", "tela", "procedimento", "suporte", "acessar"]
+
+
+def build_corpus(documents: int, seed: int = 5):
+    """Retorna (documentos, perguntas); cada pergunta aponta o id do documento que a responde."""
+    rng = random.Random(seed)
+    corpus, questions = [], []
+    themes = list(_THEMES)
+    for doc_id in range(1, documents + 1):
+        theme = themes[doc_id % len(themes)]
+        vocabulary = _THEMES[theme]
+        module, symptom, code = rng.choice(_MODULES), rng.choice(_SYMPTOMS), f"E{doc_id:04d}"
+        filler = " ".join(rng.choice(vocabulary + _COMMON) for _ in range(rng.randint(30, 120)))
+        corpus.append({
+            "id": doc_id,
+            "theme": theme,
+            "titulo": f"{symptom.capitalize()} de {rng.choice(vocabulary)} no módulo {module}",
+            "descricao": f"Ocorrência {code} de {theme} no {module}: {symptom}.",
+            "solucao": f"{filler}. Para o erro {code}, {rng.choice(vocabulary)} {rng.choice(vocabulary)} e reiniciar.",
+            "palavras_chave": f"{theme}, {module}, {code}",
+            "urlArquivo": None
+        })
+        questions.append((f"Como resolver o erro {code} de {symptom} no {module}?", doc_id, theme))
+    return corpus, questions
+
+
+def simulated_search(corpus: list, target: int, theme: str, limit: int, noise: float, rng: random.Random) -> list:
+    """Busca vetorial simulada: documentos do mesmo tema ficam próximos; o ruído embaralha os vizinhos."""
+    scored = []
+    for doc in corpus:
+        relevance = 0.75 if doc["id"] == target else 0.6 if doc["theme"] == theme else 0.3
+        scored.append({**doc, "similarity": relevance + rng.gauss(0, noise)})
+    scored.sort(key=lambda doc: doc["similarity"], reverse=True)
+    return scored[:limit]
+
+
+def _rank_of(results: list, target: int) -> int:
+    return next((position for position, doc in enumerate(results, start=1) if doc["id"] == target), 0)
+
+
+def main(args):
+    corpus, questions = build_corpus(args.documents)
+    questions = questions[:args.questions]
+    print(f"Base: {len(corpus)} documentos | perguntas: {len(questions)} | top_k={args.top_k} | "
+          f"candidatos={args.candidates} | ruído={args.noise}\n")
+    print(f"{'estratégia':>10} | {'hit@1':>5} | {f'hit@{args.top_k}':>6} | {'MRR':>5} | {'recall cand.':>12} | {'re-rank (µs)':>12}")
+
+    for strategy in ("vetorial", "bm25", "rrf"):
+        rng = random.Random(args.seed)
+        reranker = Reranker(fusion=strategy, rrf_k=args.rrf_k)
+        hits_at_1 = hits_at_k = recalled = 0
+        reciprocal_ranks, latencies = [], []
+        for question, target, theme in questions:
+            if strategy == "vetorial":
+                results = simulated_search(corpus, target, theme, args.top_k, args.noise, rng)
+                recalled += _rank_of(results, target) > 0
+            else:
+                candidates = simulated_search(corpus, target, theme, args.candidates, args.noise, rng)
+                recalled += _rank_of(candidates, target) > 0
+                start = time.perf_counter()
+                results = reranker.rerank(question, candidates, args.top_k)
+                latencies.append((time.perf_counter() - start) * 1e6)
+            rank = _rank_of(results, target)
+            hits_at_1 += rank == 1
+            hits_at_k += rank > 0
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        latency = f"{statistics.median(latencies):>12.0f}" if latencies else f"{'-':>12}"
+        print(f"{strategy:>10} | {hits_at_1 / len(questions):>5.2f} | {hits_at_k / len(questions):>6.2f} | "
+              f"{statistics.mean(reciprocal_ranks):>5.2f} | {recalled / len(questions):>12.2f} | {latency}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--noise", type=float, default=0.08)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=13)
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+"""
+Benchmark do cache semântico de respostas (core/semantic_cache.py), sem rede e sem banco.
+
+Simula um fluxo de perguntas em que poucos assuntos concentram a maior parte do volume
+(popularidade Zipf) e cada ocorrência é uma paráfrase (embedding do assunto + ruído pequeno).
+Reporta:
+- taxa de acerto com LRU e LFU para diferentes tamanhos máximos do cache;
+- latência da busca (p50/p99) e candidatos comparados pelo índice LSH, à medida que o cache
+  cresce, contra a varredura linear de todas as entradas (custo do histórico sem limite);
+- recall do índice: acertos encontrados pelo LSH / acertos encontrados pela varredura linear.
+
+Uso, a partir de services/ai_service:
+
+    python -m benchmarks.semantic_cache --topics 20000 --requests 50000 --sizes 1000 5000
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from core.semantic_cache import SemanticAnswerCache
+
+DIMENSION = 768
+
+
+def question_stream(rng: np.random.Generator, topics: int, requests: int, zipf: float, noise: float):
+    """Gera (assunto, embedding) para cada pergunta do fluxo."""
+    centers = rng.normal(size=(topics, DIMENSION)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    ranks = np.arange(1, topics + 1)
+    probabilities = 1 / ranks ** zipf
+    chosen = rng.choice(topics, size=requests, p=probabilities / probabilities.sum())
+    for topic in chosen:
+        vector = centers[topic] + rng.normal(scale=noise / np.sqrt(DIMENSION), size=DIMENSION).astype(np.float32)
+        yield int(topic), vector
+
+
+def hit_rate(args, policy: str, max_entries: int) -> float:
+    cache = SemanticAnswerCache(max_entries=max_entries, ttl_seconds=0, threshold=args.threshold, policy=policy)
+    for topic, vector in question_stream(np.random.default_rng(args.seed), args.topics, args.requests, args.zipf, args.noise):
+        if cache.lookup(vector) is None:
+            cache.store(vector, None, {"texto_resposta": f"Resposta {topic}", "source_document_id": topic + 1})
+    return cache.stats()["hit_rate"]
+
+
+def linear_scan(vectors: np.ndarray, vector: np.ndarray, threshold: float) -> bool:
+    return len(vectors) > 0 and float(np.max(vectors @ (vector / np.linalg.norm(vector)))) >= threshold
+
+
+def lookup_cost(args):
+    print(f"\n{'entradas':>8} | {'LSH p50 (ms)':>12} | {'LSH p99 (ms)':>12} | {'candidatos':>10} | {'linear p50 (ms)':>15} | {'recall LSH':>10}")
+    # Popularidade uniforme sobre assuntos suficientes para encher o cache até o maior checkpoint
+    largest = max(args.checkpoints)
+    stream = question_stream(np.random.default_rng(args.seed), 2 * largest, 4 * largest + len(args.checkpoints) * args.probes, 0.0, args.noise)
+    cache = SemanticAnswerCache(max_entries=max(args.checkpoints), ttl_seconds=0, threshold=args.threshold)
+    stored = []
+    for checkpoint in sorted(args.checkpoints):
+        # Popula até o checkpoint com perguntas distintas (só as que ainda não estão no cache)
+        while len(cache) < checkpoint:
+            topic, vector = next(stream)
+            if cache.lookup(vector) is None:
+                cache.store(vector, None, {"texto_resposta": f"Resposta {topic}", "source_document_id": topic + 1})
+                stored.append(vector / np.linalg.norm(vector))
+        matrix = np.stack(stored)
+
+        cache._lookup_ms.clear()
+        compared_before, lookups_before = cache.candidates_compared, cache.hits + cache.misses
+        linear_ms, lsh_hits, linear_hits = [], 0, 0
+        for _, vector in (next(stream) for _ in range(args.probes)):
+            lsh_hits += cache.lookup(vector) is not None
+            start = time.perf_counter()
+            linear_hits += linear_scan(matrix, vector, args.threshold)
+            linear_ms.append((time.perf_counter() - start) * 1000)
+
+        stats = cache.stats()
+        compared = (cache.candidates_compared - compared_before) / (cache.hits + cache.misses - lookups_before)
+        recall = lsh_hits / linear_hits if linear_hits else 1.0
+        print(f"{len(cache):>8} | {stats['lookup_p50_ms']:>12.3f} | {stats['lookup_p99_ms']:>12.3f} | {compared:>10.1f} | "
+              f"{statistics.median(linear_ms):>15.3f} | {recall:>10.3f}")
+
+
+def main(args):
+    print(f"Fluxo: {args.requests} perguntas sobre {args.topics} assuntos (Zipf {args.zipf}), limiar {args.threshold}")
+    print(f"\n{'tamanho':>8} | {'LRU':>6} | {'LFU':>6}")
+    for size in args.sizes:
+        print(f"{size:>8} | {hit_rate(args, 'lru', size):>6.3f} | {hit_rate(args, 'lfu', size):>6.3f}")
+    lookup_cost(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--noise", type=float, default=0.15, help="Norma do ruído de cada paráfrase (similaridade ~0.98 entre paráfrases).")
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,138 @@
+"""
+Servidores locais que imitam as APIs da Groq (chat completions compatível com OpenAI)
+e do Google Gemini (embedContent / batchEmbedContents), com latência configurável,
+e servem manuais sintéticos para os benchmarks de ingestão.
+Usados pelos benchmarks para medir o comportamento do serviço sem depender da rede.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from benchmarks.corpus import synthetic_manual
+
+EMBEDDING_DIMENSION = 768
+
+
+def fake_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> list[float]:
+    """Vetor determinístico derivado do texto (mesmo texto -> mesmo vetor)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dimension)]
+
+
+def create_stub_app(embedding_delay: float = 0.05, llm_delay: float = 0.3, embedding_max_concurrency: int | None = None,
+                    llm_delay_per_1k_tokens: float = 0.0) -> FastAPI:
+    """
+    `embedding_max_concurrency` limita as chamadas simultâneas de embedding atendidas,
+    simulando a cota/limite de conexões do provedor.
+    `llm_delay_per_1k_tokens` soma ao atraso do LLM um custo proporcional ao tamanho do
+    prompt (~4 caracteres por token), como o tempo de pré-processamento de um provedor real.
+    """
+    app = FastAPI()
+    app.state.embedding_calls = 0
+    app.state.embedded_texts = 0
+    app.state.llm_calls = 0
+    app.state.llm_prompt_tokens = 0
+    embedding_slots = asyncio.Semaphore(embedding_max_concurrency) if embedding_max_concurrency else None
+
+    @app.post("/v1beta/models/{action:path}")
+    async def embed(action: str, request: Request):
+        body = await request.json()
+        app.state.embedding_calls += 1
+        app.state.embedded_texts += len(body["requests"]) if "requests" in body else 1
+        if embedding_slots is not None:
+            async with embedding_slots:
+                await asyncio.sleep(embedding_delay)
+        else:
+            await asyncio.sleep(embedding_delay)
+        if action.endswith(":batchEmbedContents"):
+            return {"embeddings": [
+                {"values": fake_embedding(item["content"]["parts"][0]["text"])} for item in body["requests"]
+            ]}
+        return {"embedding": {"values": fake_embedding(body["content"]["parts"][0]["text"])}}
+
+    @app.get("/files/manual-{sections}.txt")
+    async def manual(sections: int):
+        return PlainTextResponse(synthetic_manual(sections))
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.llm_calls += 1
+        prompt_tokens = sum(len(message.get("content") or "") for message in body["messages"]) / 4
+        app.state.llm_prompt_tokens += prompt_tokens
+        await asyncio.sleep(llm_delay + llm_delay_per_1k_tokens * prompt_tokens / 1000)
+
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        if body.get("tools"):
+            # Saída estruturada (with_structured_output): responde com uma tool call
+            tool_name = body["tools"][0]["function"]["name"]
+            message["tool_calls"] = [{
+                "id": "call_stub",
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "arguments": json.dumps({"resposta_texto": "Resposta simulada pelo servidor stub.", "id_fonte": 0})
+                }
+            }]
+            finish_reason = "tool_calls"
+        elif body.get("response_format", {}).get("type") == "json_object":
+            # Categorização de pendências (llm_categorizador): JSON no formato de SugestoesIALote,
+            # uma sugestão para cada pergunta "[n] ..." do prompt
+            indices = re.findall(r"^\s*\[(\d+)\]", body["messages"][-1]["content"], flags=re.MULTILINE)
+            message["content"] = json.dumps({"sugestoes": [{
+                "indice": int(indice),
+                "titulo_sugerido": "Assunto simulado pelo servidor stub",
+                "categoria_sugerida": "Categoria stub",
+                "subcategoria_sugerida": "Subcategoria stub"
+            } for indice in indices]})
+        else:
+            # Reescrita: devolve a pergunta de acompanhamento sem alterações
+            prompt = body["messages"][-1]["content"]
+            marker = "Pergunta de Acompanhamento:"
+            tail = prompt.split(marker, 1)[1] if marker in prompt else prompt
+            lines = [line.strip() for line in tail.splitlines() if line.strip()]
+            message["content"] = lines[0] if lines else ""
+
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": {"prompt_tokens": int(prompt_tokens), "completion_tokens": 1, "total_tokens": int(prompt_tokens) + 1}
+        }
+
+    return app
+
+
+class StubServer:
+    """Executa o app stub com uvicorn numa thread separada (context manager)."""
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 8765):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
@@ -0,0 +1,111 @@
+"""
+Benchmark de latência (p50/p99) e recall@k das buscas por similaridade de cosseno
+com e sem índice ANN, em uma tabela de teste populada no Postgres/pgvector local.
+
+Usa o mesmo DDL que o serviço aplica na inicialização (core/vector_index.py).
+A tabela 'bench_vector_index' é recriada a cada execução. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.vector_index --rows 30000 --queries 200 --top-k 5
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from sqlalchemy import text
+from config.database import engine
+from core.vector_index import OPCLASS_BY_OPERATOR, DISTANCE_OPERATOR, build_index_ddl
+
+TABLE = "bench_vector_index"
+DIMENSION = 768
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def clustered_vectors(rng: np.random.Generator, n: int, centers: np.ndarray) -> np.ndarray:
+    """Vetores agrupados em torno de centróides (mais próximo de embeddings reais que ruído uniforme)."""
+    assignment = rng.integers(0, len(centers), size=n)
+    vectors = centers[assignment] + rng.normal(scale=0.35, size=(n, DIMENSION))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def seed(rows: int, data: np.ndarray):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"CREATE TABLE {TABLE} (id integer PRIMARY KEY, embedding vector({DIMENSION}))"))
+        batch = 1000
+        for start in range(0, rows, batch):
+            connection.execute(
+                text(f"INSERT INTO {TABLE} (id, embedding) VALUES (:id, (:v)::vector)"),
+                [{"id": i, "v": to_literal(data[i])} for i in range(start, min(start + batch, rows))]
+            )
+        connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+def run_queries(queries: np.ndarray, top_k: int, search_param: str | None = None, value: int | None = None) -> tuple[list, list]:
+    latencies, results = [], []
+    with engine.connect() as connection:
+        if search_param is not None:
+            connection.execute(text("SELECT set_config(:param, :value, false)"), {"param": search_param, "value": str(value)})
+        query = text(f"SELECT id FROM {TABLE} ORDER BY embedding {DISTANCE_OPERATOR} (:v)::vector LIMIT :k")
+        for q in queries:
+            literal = to_literal(q)
+            start = time.perf_counter()
+            ids = [row[0] for row in connection.execute(query, {"v": literal, "k": top_k})]
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(ids)
+    return latencies, results
+
+
+def report(label: str, latencies: list, results: list, truth: np.ndarray, top_k: int):
+    latencies = sorted(latencies)
+    recall = np.mean([len(set(r) & set(t)) / top_k for r, t in zip(results, truth)])
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<28} | p50 {statistics.median(latencies):8.2f} ms | p99 {p99:8.2f} ms | recall@{top_k} {recall:.3f}")
+
+
+def main(args):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(args.clusters, DIMENSION))
+    data = clustered_vectors(rng, args.rows, centers)
+    queries = clustered_vectors(rng, args.queries, centers)
+
+    print(f"Populando {args.rows} linhas em '{TABLE}'...")
+    seed(args.rows, data)
+
+    # Verdade de referência: top-k exato por cosseno (vetores já normalizados)
+    truth = np.argsort(-(queries @ data.T), axis=1)[:, :args.top_k]
+
+    latencies, results = run_queries(queries, args.top_k)
+    report("sem índice (seq scan)", latencies, results, truth, args.top_k)
+
+    opclass = OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        start = time.perf_counter()
+        connection.execute(text(build_index_ddl(TABLE, "embedding", args.method, opclass, f"{TABLE}_idx")))
+        print(f"Índice {args.method} ({opclass}) criado em {time.perf_counter() - start:.1f}s")
+        connection.execute(text(f"ANALYZE {TABLE}"))
+
+    # ef_search (HNSW) ou probes (IVFFlat): maior valor -> mais recall, mais latência
+    search_param = "hnsw.ef_search" if args.method == "hnsw" else "ivfflat.probes"
+    for value in args.search_values:
+        latencies, results = run_queries(queries, args.top_k, search_param, value)
+        report(f"{search_param}={value}", latencies, results, truth, args.top_k)
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--search-values", type=int, nargs="+", default=[20, 40, 100],
+                        help="Valores de hnsw.ef_search (ou ivfflat.probes) a comparar.")
+    parser.add_argument("--keep", action="store_true", help="Mantém a tabela de teste ao final.")
+    main(parser.parse_args())
@@ -0,0 +1,154 @@
+"""
+Benchmark da busca na réplica vetorial em memória (core/vector_replica.py) x consulta ao pgvector
+(a mesma do /api/ask), numa tabela de teste populada no Postgres/pgvector local.
+
+Reporta, para cada caminho, latência p50/p99 de uma busca isolada, vazão (buscas/s) com
+`--concurrency` buscas simultâneas e recall@k contra a busca exata, com e sem filtro de
+subcategoria; além do tempo da carga completa e de uma atualização incremental da réplica.
+
+A tabela 'bench_vector_replica' é recriada a cada execução (as palavras-chave vêm das tabelas
+reais, vazias para esses ids). Uso, a partir de services/ai_service:
+
+    python -m benchmarks.vector_replica --rows 5000 --queries 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import numpy as np
+from sqlalchemy import text
+from config.database import async_engine, engine
+from config.settings import settings
+from core.hybrid_search import build_search_query
+from core.vector_index import OPCLASS_BY_OPERATOR, DISTANCE_OPERATOR, build_index_ddl
+from core.vector_replica import VectorReplica
+
+TABLE = "bench_vector_replica"
+DIMENSION = 768
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def seed(data: np.ndarray, subcategories: np.ndarray):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id integer PRIMARY KEY, titulo text, descricao text, solucao text, "urlArquivo" text,
+                ativo boolean DEFAULT true, subcategoria_id integer, embedding vector({DIMENSION}),
+                "updatedAt" timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+        batch = 1000
+        for start in range(0, len(data), batch):
+            connection.execute(
+                text(f"INSERT INTO {TABLE} (id, titulo, solucao, subcategoria_id, embedding) VALUES (:id, :titulo, :solucao, :sub, (:v)::vector)"),
+                [{"id": i + 1, "titulo": f"Documento {i + 1}", "solucao": f"Solução do documento {i + 1}.",
+                  "sub": int(subcategories[i]), "v": to_literal(data[i])} for i in range(start, min(start + batch, len(data)))]
+            )
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        opclass = OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+        connection.execute(text(build_index_ddl(TABLE, "embedding", "hnsw", opclass, f"{TABLE}_embedding_idx")))
+        connection.execute(text(f"CREATE INDEX {TABLE}_subcategoria_idx ON {TABLE} (subcategoria_id)"))
+        connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+async def pgvector_search(vector: np.ndarray, top_k: int, subcategoria_id) -> list:
+    query = text(build_search_query("vector", filtered=bool(subcategoria_id), table=TABLE))
+    params = {"q_vector": vector, "top_k": top_k} | ({"sub_id": subcategoria_id} if subcategoria_id else {})
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(settings.HNSW_EF_SEARCH)})
+        return [row.id for row in (await connection.execute(query, params)).all()]
+
+
+async def replica_search(replica: VectorReplica, vector: np.ndarray, top_k: int, subcategoria_id) -> list:
+    return [doc["id"] for doc in replica.search(vector, top_k, subcategoria_id)]
+
+
+async def measure(search, queries: np.ndarray, subcategories: list, top_k: int, concurrency: int) -> tuple:
+    # Latência: uma busca por vez
+    latencies, results = [], []
+    for vector, subcategoria_id in zip(queries, subcategories):
+        start = time.perf_counter()
+        results.append(await search(vector, top_k, subcategoria_id))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # Vazão: `concurrency` buscas em andamento ao mesmo tempo
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(vector, subcategoria_id):
+        async with semaphore:
+            await search(vector, top_k, subcategoria_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(vector, sub) for vector, sub in zip(queries, subcategories)))
+    throughput = len(queries) / (time.perf_counter() - start)
+    return latencies, results, throughput
+
+
+def report(label: str, latencies: list, results: list, truth: list, throughput: float, top_k: int):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    recall = np.mean([len(set(r) & t) / max(1, min(top_k, len(t))) for r, t in zip(results, truth)])
+    print(f"{label:<30} | p50 {statistics.median(latencies):7.3f} ms | p99 {p99:7.3f} ms | "
+          f"{throughput:9.0f} buscas/s | recall@{top_k} {recall:.3f}")
+
+
+async def main(args):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(args.clusters, DIMENSION))
+    data = centers[rng.integers(0, args.clusters, size=args.rows)] + rng.normal(scale=0.35, size=(args.rows, DIMENSION))
+    data = (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+    subcategories = rng.integers(1, args.subcategories + 1, size=args.rows)
+
+    print(f"Populando {args.rows} linhas em '{TABLE}'...")
+    seed(data, subcategories)
+
+    replica = VectorReplica(table=TABLE)
+    async with async_engine.connect() as connection:
+        start = time.perf_counter()
+        await replica.refresh(connection)
+        print(f"Carga completa da réplica: {(time.perf_counter() - start) * 1000:.0f} ms, {replica.stats()['matrix_mb']} MB")
+
+        await connection.execute(text(f'UPDATE {TABLE} SET "updatedAt" = now() + interval \'1 second\', titulo = titulo || \' (rev)\' WHERE id <= 10'))
+        await connection.commit()
+        start = time.perf_counter()
+        await replica.refresh(connection)
+        print(f"Atualização incremental (10 linhas): {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    queries = data[rng.choice(args.rows, size=args.queries)] + rng.normal(scale=0.2, size=(args.queries, DIMENSION))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    for filtered in (False, True):
+        query_subcategories = [int(s) for s in rng.integers(1, args.subcategories + 1, size=args.queries)] if filtered else [None] * args.queries
+        truth = []
+        for vector, subcategoria_id in zip(queries, query_subcategories):
+            members = np.flatnonzero(subcategories == subcategoria_id) if subcategoria_id else np.arange(args.rows)
+            truth.append(set(members[np.argsort(-(data[members] @ vector))[:args.top_k]] + 1))
+
+        suffix = " + subcategoria" if filtered else ""
+        latencies, results, throughput = await measure(pgvector_search, queries, query_subcategories, args.top_k, args.concurrency)
+        report(f"pgvector (HNSW){suffix}", latencies, results, truth, throughput, args.top_k)
+        latencies, results, throughput = await measure(
+            lambda v, k, s: replica_search(replica, v, k, s), queries, query_subcategories, args.top_k, args.concurrency
+        )
+        report(f"réplica em memória{suffix}", latencies, results, truth, throughput, args.top_k)
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--subcategories", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--keep", action="store_true", help="Mantém a tabela de teste ao final.")
+    asyncio.run(main(parser.parse_args()))
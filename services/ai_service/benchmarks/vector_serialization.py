@@ -0,0 +1,80 @@
+"""
+Benchmark de serialização das respostas com vetores do /api/documents/process:
+tempo e tamanho do payload no JSON padrão (listas de floats) versus base64 float32/float16
+e msgpack com vetores binários, para documentos de tamanhos típicos.
+
+Não depende de rede nem de banco. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.vector_serialization --chunks 1 20 200 1000
+"""
+import argparse
+import json
+import random
+import time
+from fastapi.encoders import jsonable_encoder
+from core.vector_codec import VectorFormat, render
+
+DIMENSION = 768
+
+
+def make_documents(n_chunks: int) -> list[dict]:
+    rng = random.Random(n_chunks)
+    return [{
+        "titulo": f"Seção {i}",
+        "descricao": "Descrição do procedimento de atendimento.",
+        "solucao": "Passo a passo da solução. " * 20,
+        "palavras_chave": ["sistema", "acesso", "erro"],
+        "subcategoria_id": 1,
+        "embedding": [rng.uniform(-0.1, 0.1) for _ in range(DIMENSION)],
+        "urlArquivo": "https://exemplo/arquivo.pdf",
+        "ativo": True
+    } for i in range(n_chunks)]
+
+
+def serialize_default(documents: list[dict]) -> bytes:
+    # Mesmo caminho do FastAPI para um dict retornado pelo endpoint (JSONResponse)
+    content = jsonable_encoder({"message": "ok", "data": documents})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def serialize_with(vector_format: VectorFormat):
+    convert = vector_format.convert()
+
+    def serialize(documents: list[dict]) -> bytes:
+        payload = {"message": "ok", "data": [{**doc, "embedding": convert(doc["embedding"])} for doc in documents]}
+        response = render(payload, vector_format)
+        return response.body
+
+    return serialize
+
+
+def measure(serialize, documents: list[dict], repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = serialize(documents)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(body)
+
+
+def main(args):
+    variants = [
+        ("json (padrão)", serialize_default),
+        ("json + float32 base64", serialize_with(VectorFormat("json", "float32"))),
+        ("json + float16 base64", serialize_with(VectorFormat("json", "float16"))),
+        ("msgpack float32", serialize_with(VectorFormat("msgpack", "float32"))),
+        ("msgpack float16", serialize_with(VectorFormat("msgpack", "float16"))),
+    ]
+    print(f"{'chunks':>6} | {'formato':<24} | {'tempo (ms)':>10} | {'tamanho (KB)':>12}")
+    for n_chunks in args.chunks:
+        documents = make_documents(n_chunks)
+        for label, serialize in variants:
+            elapsed, size = measure(serialize, documents, args.repeat)
+            print(f"{n_chunks:>6} | {label:<24} | {elapsed:>10.2f} | {size / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1, 20, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,148 @@
+"""
+Benchmark do envio do embedding da pergunta ao pgvector: literal de texto x codec binário,
+com e sem reaproveitamento de prepared statements, numa tabela de teste no Postgres/pgvector local.
+
+Para cada variante, reporta latência p50/p99 por consulta de:
+- transferência pura: `SELECT vetor <=> vetor`, sem tabela (só envio, parse e conversão);
+- busca top-k: a consulta vetorial do /api/ask (build_search_query) sobre a tabela de teste.
+Antes, mostra o tamanho do parâmetro e o custo de serialização no cliente em cada formato.
+
+Variantes:
+- texto: o embedding vai como string '[0.1,...]' e o Postgres converte com CAST(... AS vector);
+- binário: pgvector.Vector pelo codec binário do asyncpg (config/database.py);
+- binário sem cache: idem, com prepared_statement_cache_size=0 (parse e plano a cada consulta).
+
+A tabela 'bench_vector_transfer' é recriada a cada execução. Uso, a partir de services/ai_service:
+
+    python -m benchmarks.vector_transfer --rows 5000 --queries 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import numpy as np
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from config.database import async_engine, engine
+from config.settings import settings
+from core.hybrid_search import build_search_query
+from core.vector_index import OPCLASS_BY_OPERATOR, DISTANCE_OPERATOR, build_index_ddl, query_vector
+
+TABLE = "bench_vector_transfer"
+DIMENSION = 768
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(str(float(x)) for x in vector) + "]"
+
+
+def seed(data: np.ndarray):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id integer PRIMARY KEY, titulo text, descricao text, solucao text, "urlArquivo" text,
+                ativo boolean DEFAULT true, subcategoria_id integer, embedding vector({DIMENSION}),
+                "updatedAt" timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+        batch = 1000
+        for start in range(0, len(data), batch):
+            connection.execute(
+                text(f"INSERT INTO {TABLE} (id, titulo, embedding) VALUES (:id, :titulo, :v)"),
+                [{"id": i + 1, "titulo": f"Documento {i + 1}", "v": data[i]} for i in range(start, min(start + batch, len(data)))]
+            )
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        opclass = OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+        connection.execute(text(build_index_ddl(TABLE, "embedding", "hnsw", opclass, f"{TABLE}_embedding_idx")))
+        connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+def unprepared_engine():
+    """Mesmo engine assíncrono da aplicação, mas sem reaproveitar prepared statements."""
+    unprepared = create_async_engine(settings.ASYNC_DATABASE_URL, connect_args={"prepared_statement_cache_size": 0})
+
+    @event.listens_for(unprepared.sync_engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.run_async(register_vector)
+
+    return unprepared
+
+
+def encoding_cost(queries: np.ndarray):
+    print(f"{'formato':<10} | {'bytes':>6} | {'serialização p50 (µs)':>22}")
+    for label, encode, size in (
+        ("texto", to_literal, lambda value: len(value.encode())),
+        ("binário", lambda vector: query_vector(vector.tolist()).to_binary(), len),
+    ):
+        timings = []
+        for vector in queries:
+            start = time.perf_counter()
+            value = encode(vector)
+            timings.append((time.perf_counter() - start) * 1e6)
+        print(f"{label:<10} | {size(value):>6} | {statistics.median(timings):>22.1f}")
+
+
+async def measure(target_engine, query: str, params: list) -> list:
+    latencies = []
+    async with target_engine.connect() as connection:
+        await connection.execute(text("SELECT set_config('hnsw.ef_search', :value, false)"), {"value": str(settings.HNSW_EF_SEARCH)})
+        statement = text(query)
+        await connection.execute(statement, params[0])  # aquecimento (prepara o statement, se houver cache)
+        for values in params:
+            start = time.perf_counter()
+            (await connection.execute(statement, values)).all()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
+
+
+async def main(args):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(args.clusters, DIMENSION))
+    data = centers[rng.integers(0, args.clusters, size=args.rows)] + rng.normal(scale=0.35, size=(args.rows, DIMENSION))
+    data = (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+    queries = data[rng.choice(args.rows, size=args.queries)] + rng.normal(scale=0.2, size=(args.queries, DIMENSION))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    encoding_cost(queries)
+    print(f"\nPopulando {args.rows} linhas em '{TABLE}'...")
+    seed(data)
+
+    search = build_search_query("vector", filtered=False, table=TABLE)
+    text_search = search.replace("(:q_vector)::vector", "CAST(:q_text AS vector)")
+    transfer = f"SELECT (:q_vector)::vector {DISTANCE_OPERATOR} (:q_vector)::vector"
+    text_transfer = f"SELECT CAST(:q_text AS vector) {DISTANCE_OPERATOR} CAST(:q_text AS vector)"
+    text_params = [{"q_text": to_literal(q), "top_k": args.top_k} for q in queries]
+    binary_params = [{"q_vector": query_vector(q.tolist()), "top_k": args.top_k} for q in queries]
+
+    unprepared = unprepared_engine()
+    variants = [
+        ("texto", async_engine, text_transfer, text_search, text_params),
+        ("binário", async_engine, transfer, search, binary_params),
+        ("binário sem cache", unprepared, transfer, search, binary_params),
+    ]
+    print(f"\n{'variante':<18} | {'transferência p50/p99 (ms)':>26} | {'busca top-k p50/p99 (ms)':>24}")
+    for label, target, transfer_query, search_query, params in variants:
+        columns = []
+        for query in (transfer_query, search_query):
+            latencies = await measure(target, query, params)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            columns.append(f"{statistics.median(latencies):.3f} / {p99:.3f}")
+        print(f"{label:<18} | {columns[0]:>26} | {columns[1]:>24}")
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await unprepared.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Mantém a tabela de teste ao final.")
+    asyncio.run(main(parser.parse_args()))
@@ -1,6 +1,42 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+from pgvector.asyncpg import register_vector
+from pgvector.psycopg2 import register_vector as register_vector_psycopg2
 from .settings import settings
 
-engine = create_engine(settings.DATABASE_URL)
+_POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
 
-print("Engine do SQLAlchemy criado. A conexão será estabelecida sob demanda.")
\ No newline at end of file
+engine = create_engine(settings.DATABASE_URL, **_POOL_OPTIONS)
+
+@event.listens_for(engine, "connect")
+def _register_vector_adapter(dbapi_connection, connection_record):
+    """Registra o adaptador do tipo 'vector' (aceita arrays numpy como parâmetro) no pool síncrono."""
+    register_vector_psycopg2(dbapi_connection)
+
+# Engine assíncrono (asyncpg) usado no caminho do /api/ask, para que as consultas
+# ao pgvector não bloqueiem o event loop do uvicorn. O dialeto prepara cada consulta no
+# servidor e reaproveita o statement na mesma conexão (cache de DB_PREPARED_STATEMENT_CACHE_SIZE).
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    **_POOL_OPTIONS,
+    connect_args={
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "server_settings": {"plan_cache_mode": settings.DB_PLAN_CACHE_MODE},
+    },
+)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_codec(dbapi_connection, connection_record):
+    """
+    Registra o codec binário do tipo 'vector' em cada nova conexão do pool assíncrono:
+    os embeddings trafegam como float32 (4 bytes por dimensão), sem texto para o Postgres analisar.
+    """
+    dbapi_connection.run_async(register_vector)
+
+print("Engines do SQLAlchemy (síncrono e assíncrono) criados. A conexão será estabelecida sob demanda.")
@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -15,6 +16,17 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: int
     DB_DATABASE: str
+    # Pool de conexões (cada engine, síncrono e assíncrono, tem o seu)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Prepared statements mantidos por conexão assíncrona (0 desativa o reaproveitamento)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 256
+    # "force_custom_plan": o statement preparado pula o parse, mas o plano é refeito com os
+    # parâmetros reais (um plano genérico pode ignorar o índice ANN do ORDER BY ... LIMIT)
+    DB_PLAN_CACHE_MODE: Literal["auto", "force_custom_plan", "force_generic_plan"] = "force_custom_plan"
 
     # --- Chaves de API
     GROQ_API_KEY: str
@@ -26,6 +38,151 @@ class Settings(BaseSettings):
     REASONING_LLM_MODEL_NAME: str = "llama-3.3-70b-versatile"
 
     SIMILARITY_THRESHOLD_FOR_CACHE: float = 0.95
+    # Cache semântico de respostas: "memory" (core/semantic_cache.py, limitado e invalidável) ou
+    # "history" (busca direta no histórico chat_consultas/chat_respostas, comportamento anterior)
+    SEMANTIC_CACHE_BACKEND: Literal["memory", "history"] = "memory"
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+    SEMANTIC_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    SEMANTIC_CACHE_EVICTION: Literal["lru", "lfu"] = "lru"
+    # Intervalo da verificação dos documentos fonte (alterados, desativados ou excluídos)
+    SEMANTIC_CACHE_VALIDATE_SECONDS: float = 30.0
+    # Respostas do histórico carregadas na inicialização (0 = começa vazio)
+    SEMANTIC_CACHE_WARM_ENTRIES: int = 1000
+    # Inicia a busca RAG da pergunta original em paralelo com o cache e a reescrita
+    SPECULATIVE_RETRIEVAL: bool = True
+    # Pré-classificador da reescrita com histórico (core/query_rewrite.py): perguntas
+    # autossuficientes não passam pelo LLM. Uma pergunta com menos de REWRITE_MIN_TERMS termos
+    # relevantes é reescrita; com pronome/demonstrativo, só se não repetir ao menos
+    # REWRITE_OVERLAP_THRESHOLD dos seus termos da pergunta anterior
+    REWRITE_GATE_ENABLED: bool = True
+    REWRITE_MIN_TERMS: int = 3
+    REWRITE_OVERLAP_THRESHOLD: float = 0.6
+    # Reescritas feitas pelo LLM, por (histórico, pergunta) (0 desativa)
+    REWRITE_CACHE_MAX_ENTRIES: int = 2000
+
+    # --- Modo de recuperação: só vetorial, ou híbrido (vetorial + texto completo em português,
+    # fundidos por RRF; requer a coluna "textoBusca" criada pela migration do backend)
+    RETRIEVAL_MODE: Literal["vector", "hybrid"] = "vector"
+    # Documentos trazidos por cada ramo da busca híbrida antes da fusão
+    HYBRID_CANDIDATES: int = 40
+    HYBRID_VECTOR_WEIGHT: float = 1.0
+    HYBRID_TEXT_WEIGHT: float = 1.0
+    HYBRID_RRF_K: int = 60
+
+    # --- Re-ranking local (BM25, opcionalmente fundido com a similaridade vetorial via RRF)
+    # A busca vetorial traz RERANK_CANDIDATES candidatos e só os top_k melhores seguem para o LLM
+    RERANK_ENABLED: bool = False
+    RERANK_CANDIDATES: int = 20
+    RERANK_FUSION: Literal["rrf", "bm25"] = "rrf"
+    RERANK_RRF_K: int = 60
+
+    # --- Montagem do contexto do prompt de geração (orçamento em tokens estimados)
+    CONTEXT_PACKING_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_PASSAGE_MAX_TOKENS: int = 600
+    # Similaridade (Jaccard de trigramas) a partir da qual uma passagem é considerada duplicada
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8
+
+    # --- Índices vetoriais (ANN) gerenciados pelo serviço
+    VECTOR_INDEX_TYPE: Literal["hnsw", "ivfflat", "none"] = "hnsw"
+    VECTOR_INDEX_AUTO_CREATE: bool = True
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40
+    IVFFLAT_LISTS: int = 100
+    IVFFLAT_PROBES: int = 10
+    # Dimensão das colunas de embedding (VECTOR(768) nas migrations do backend)
+    EMBEDDING_DIMENSION: int = 768
+    # Índice ANN sobre uma cópia quantizada do embedding (ver core/quantization.py): "halfvec"
+    # (float16) ou "bit" (1 bit por dimensão). Os QUANTIZED_CANDIDATES mais próximos na cópia
+    # são re-pontuados com o embedding completo; "bit" costuma precisar de mais candidatos.
+    VECTOR_QUANTIZATION: Literal["none", "halfvec", "bit"] = "none"
+    QUANTIZED_CANDIDATES: int = 100
+
+    # --- Busca vetorial com filtro de subcategoria (ver core/filtered_search.py)
+    # Subcategorias com até este número de documentos usam varredura exata
+    FILTERED_EXACT_MAX_ROWS: int = 5000
+    # Subcategorias com pelo menos este número de documentos ganham um índice ANN parcial
+    FILTERED_PARTIAL_INDEX_MIN_ROWS: int = 50000
+    FILTERED_PARTIAL_INDEX_AUTO_CREATE: bool = True
+    # Limite de tuplas visitadas pela varredura iterativa do HNSW
+    FILTERED_MAX_SCAN_TUPLES: int = 20000
+    FILTERED_STATS_REFRESH_SECONDS: float = 300.0
+
+    # --- Réplica em memória dos embeddings dos documentos (busca exata sem ida ao banco).
+    # Cada worker do uvicorn mantém a sua cópia, atualizada por polling de "updatedAt".
+    VECTOR_REPLICA_ENABLED: bool = False
+    VECTOR_REPLICA_REFRESH_SECONDS: float = 10.0
+
+    # --- Categorização dos assuntos pendentes (ver core/categorizer.py): perguntas com
+    # similaridade >= PENDENCY_MATCH_THRESHOLD com uma subcategoria existente são atribuídas a
+    # ela sem chamar o LLM; subcategorias sugeridas pelo LLM com similaridade >=
+    # PENDENCY_DEDUP_THRESHOLD com outra da mesma categoria reaproveitam a existente
+    PENDENCY_CATEGORIZER_ENABLED: bool = True
+    PENDENCY_MATCH_THRESHOLD: float = 0.85
+    PENDENCY_DEDUP_THRESHOLD: float = 0.9
+
+    # --- Fila de criação dos assuntos pendentes: o endpoint só enfileira; um worker no processo
+    # da API consome a fila em lotes (até PENDENCY_BATCH_SIZE perguntas, ou o que chegar em
+    # PENDENCY_FLUSH_SECONDS), categoriza o lote num único prompt e grava tudo numa transação.
+    # "redis": fila compartilhada e durável; "sync": sem fila, o endpoint grava o assunto antes de
+    # responder; "memory": fila local do processo, perdida num restart (testes/desenvolvimento);
+    # "auto": "redis" se REDIS_URL estiver configurada, senão "sync"
+    PENDENCY_QUEUE_BACKEND: Literal["auto", "sync", "memory", "redis"] = "auto"
+    PENDENCY_BATCH_SIZE: int = 16
+    PENDENCY_FLUSH_SECONDS: float = 2.0
+    PENDENCY_MAX_ATTEMPTS: int = 3
+    # Com "redis", o lote fica na lista `processing` até ser gravado; se o worker morrer, as
+    # perguntas voltam à fila quando o lease (renovado durante o lote) expirar
+    PENDENCY_LEASE_SECONDS: int = 60
+
+    # --- Endpoints dos provedores (podem apontar para servidores locais, ex: benchmarks)
+    GOOGLE_API_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta"
+    GROQ_API_BASE_URL: Optional[str] = None
+    EMBEDDING_HTTP_TIMEOUT: float = 30.0
+    # Chamadas simultâneas à API de embeddings por processo (um lote grande de ingestão é dividido
+    # em várias). Respostas 429 são repetidas até EMBEDDING_RETRY_ATTEMPTS vezes, esperando o
+    # Retry-After da API ou, sem ele, EMBEDDING_RETRY_BASE_SECONDS dobrado a cada tentativa
+    EMBEDDING_MAX_CONCURRENT_REQUESTS: int = 4
+    EMBEDDING_RETRY_ATTEMPTS: int = 5
+    EMBEDDING_RETRY_BASE_SECONDS: float = 1.0
+
+    # --- Cache de embeddings (LRU em memória + camada compartilhada opcional no Redis)
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    REDIS_URL: Optional[str] = None
+
+    # --- Micro-batching de embeddings de perguntas concorrentes
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # --- Ingestão de documentos
+    INGEST_DOWNLOAD_TIMEOUT: float = 60.0
+    INGEST_EMBEDDING_BATCH_SIZE: int = 50
+    # Orçamento de tokens por chunk (estimado) e sobreposição entre as partes de seções longas.
+    # CHUNK_MAX_TOKENS=0 mantém um chunk por cabeçalho "#", sem limite. Vale só para arquivos:
+    # entradas manuais (solucao) nunca são divididas.
+    CHUNK_MAX_TOKENS: int = 512
+    CHUNK_OVERLAP_TOKENS: int = 64
+
+    # --- Pool de processos para o particionamento (Unstructured) e a extração dos chunks
+    # PARTITION_POOL_WORKERS=0 executa numa thread do próprio processo (ex: em worker.py)
+    PARTITION_POOL_WORKERS: int = 2
+    PARTITION_MAX_CONCURRENCY: int = 4
+    PARTITION_TIMEOUT_SECONDS: float = 300.0
+
+    # --- Jobs de ingestão em segundo plano
+    # "memory": fila no próprio processo da API (testes/desenvolvimento);
+    # "redis": fila compartilhada, consumida pelos processos de worker.py
+    JOB_BACKEND: Literal["memory", "redis"] = "memory"
+    JOB_TTL_SECONDS: int = 24 * 3600
+    JOB_LOCAL_WORKERS: int = 1
+    JOB_WORKER_PROCESSES: int = 2
+    # Lease renovado pelo worker enquanto o job roda; sem renovação (worker morto) o job volta
+    # para a fila, até JOB_MAX_ATTEMPTS tentativas
+    JOB_LEASE_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 3
 
     # Propriedade para construir a URL de conexão dinamicamente
     @property
@@ -33,6 +190,11 @@ class Settings(BaseSettings):
         """Constrói a URL de conexão do SQLAlchemy a partir das variáveis."""
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_DATABASE}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """URL de conexão para o engine assíncrono (driver asyncpg)."""
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_DATABASE}"
+
 try:
     settings = Settings()
 except Exception as e:
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+EmbedMany = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+# Prefixo da descrição das categorias/subcategorias criadas pelo serviço (seguido da pergunta)
+AI_DESCRIPTION_PREFIX = "Criada via IA: "
+
+# Mudou alguma linha (inclusão, edição ou exclusão)? Comparado a cada uso, antes de recarregar tudo
+_FINGERPRINT = """
+    SELECT (SELECT count(*) FROM categorias) AS categorias, (SELECT max("updatedAt") FROM categorias) AS categorias_em,
+           (SELECT count(*) FROM subcategorias) AS subcategorias, (SELECT max("updatedAt") FROM subcategorias) AS subcategorias_em
+"""
+
+
+class CategoryMatch(NamedTuple):
+    categoria_id: int
+    categoria_nome: str
+    subcategoria_id: int
+    subcategoria_nome: str
+    similarity: float
+
+
+def label_text(categoria_nome: str, subcategoria_nome: str, descricao: Optional[str] = None) -> str:
+    """Texto embedado de uma subcategoria: "Categoria: Subcategoria. descrição"."""
+    label = f"{categoria_nome}: {subcategoria_nome}"
+    if descricao:
+        descricao = descricao.removeprefix(AI_DESCRIPTION_PREFIX).strip()
+        label += f". {descricao}" if descricao else ""
+    return label
+
+
+class PendencyCategorizer:
+    """
+    Categorização por vizinho mais próximo das perguntas que viram assuntos pendentes: a
+    pergunta é comparada (cosseno) com os embeddings pré-computados das subcategorias
+    existentes; acima de `match_threshold`, a subcategoria (e sua categoria) é reaproveitada
+    sem chamar o LLM. Abaixo disso o assunto é considerado novo e vai para o LLM, e a
+    subcategoria sugerida por ele só é criada se não houver uma quase idêntica na mesma
+    categoria (`dedup_threshold`).
+
+    As categorias, subcategorias e seus embeddings ficam em memória. A cada uso, uma consulta
+    de contagem/último "updatedAt" detecta mudanças; só então as linhas são relidas, e só os
+    textos novos ou alterados são embedados de novo.
+    """
+
+    def __init__(self, match_threshold: float, dedup_threshold: float):
+        self.match_threshold = match_threshold
+        self.dedup_threshold = dedup_threshold
+        self.categories: dict = {}       # id -> nome
+        self._by_name: dict = {}         # nome em minúsculas -> id
+        self._subcategories: list = []   # (id, categoria_id, nome), alinhado com as linhas de _matrix
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._vectors: dict = {}         # texto -> vetor normalizado
+        self._fingerprint = None
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+        self.embedded_labels = 0
+        self.matched = 0
+        self.llm_fallbacks = 0
+        self.deduplicated = 0
+
+    async def refresh(self, connection: AsyncConnection, embed_many: EmbedMany) -> bool:
+        """Recarrega as categorias/subcategorias se algo mudou no banco. Retorna se recarregou."""
+        fingerprint = tuple((await connection.execute(text(_FINGERPRINT))).one())
+        if fingerprint == self._fingerprint:
+            return False
+        async with self._lock:
+            if fingerprint == self._fingerprint:
+                return False
+            categorias = (await connection.execute(text("SELECT id, nome FROM categorias"))).mappings().all()
+            subcategorias = (await connection.execute(text(
+                "SELECT id, categoria_id, nome, descricao FROM subcategorias WHERE nome IS NOT NULL"
+            ))).mappings().all()
+            await self.update(categorias, subcategorias, embed_many)
+            self._fingerprint = fingerprint
+            self.refreshes += 1
+        logger.info(f"Categorizador de pendências atualizado: {len(self.categories)} categorias, {len(self._subcategories)} subcategorias.")
+        return True
+
+    async def update(self, categorias, subcategorias, embed_many: EmbedMany):
+        """Substitui o conteúdo do índice, embedando apenas os textos ainda não conhecidos."""
+        categories = {row["id"]: row["nome"] for row in categorias if row["nome"]}
+        labels = [(row["id"], row["categoria_id"], row["nome"], label_text(categories.get(row["categoria_id"], ""), row["nome"], row["descricao"]))
+                  for row in subcategorias if row["categoria_id"] in categories]
+
+        missing = list(dict.fromkeys(label for *_, label in labels if label not in self._vectors))
+        if missing:
+            for label, vector in zip(missing, await embed_many(missing)):
+                self._vectors[label] = _normalize(vector)
+            self.embedded_labels += len(missing)
+        current = {label for *_, label in labels}
+        self._vectors = {label: vector for label, vector in self._vectors.items() if label in current}
+
+        self.categories = categories
+        self._by_name = {nome.lower(): categoria_id for categoria_id, nome in categories.items()}
+        self._subcategories = [(sub_id, categoria_id, nome) for sub_id, categoria_id, nome, _ in labels]
+        self._matrix = np.stack([self._vectors[label] for *_, label in labels]) if labels else np.empty((0, 0), dtype=np.float32)
+
+    def category_id(self, nome: str) -> Optional[int]:
+        return self._by_name.get(nome.strip().lower())
+
+    def _nearest(self, embedding, categoria_id: Optional[int] = None) -> Optional[CategoryMatch]:
+        if not self._subcategories:
+            return None
+        scores = self._matrix @ _normalize(embedding)
+        if categoria_id is not None:
+            scores = np.where([sub[1] == categoria_id for sub in self._subcategories], scores, -np.inf)
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            return None
+        sub_id, sub_categoria_id, nome = self._subcategories[best]
+        return CategoryMatch(sub_categoria_id, self.categories[sub_categoria_id], sub_id, nome, float(scores[best]))
+
+    def match(self, embedding) -> Optional[CategoryMatch]:
+        """Subcategoria existente para a pergunta, se a similaridade passar do limiar; senão None (LLM)."""
+        nearest = self._nearest(embedding)
+        if nearest is not None and nearest.similarity >= self.match_threshold:
+            self.matched += 1
+            return nearest
+        self.llm_fallbacks += 1
+        return None
+
+    def duplicate_of(self, nome: str, embedding, categoria_id: int) -> Optional[CategoryMatch]:
+        """Subcategoria de mesmo nome ou quase idêntica (mesma categoria) à sugerida pelo LLM, para ser reaproveitada."""
+        for sub_id, sub_categoria_id, sub_nome in self._subcategories:
+            if sub_categoria_id == categoria_id and sub_nome.strip().lower() == nome.strip().lower():
+                self.deduplicated += 1
+                return CategoryMatch(categoria_id, self.categories[categoria_id], sub_id, sub_nome, 1.0)
+        nearest = self._nearest(embedding, categoria_id)
+        if nearest is not None and nearest.similarity >= self.dedup_threshold:
+            self.deduplicated += 1
+            return nearest
+        return None
+
+    def stats(self) -> dict:
+        decisions = self.matched + self.llm_fallbacks
+        return {
+            "enabled": settings.PENDENCY_CATEGORIZER_ENABLED,
+            "categories": len(self.categories),
+            "subcategories": len(self._subcategories),
+            "refreshes": self.refreshes,
+            "embedded_labels": self.embedded_labels,
+            "llm_calls_avoided": self.matched,
+            "llm_fallbacks": self.llm_fallbacks,
+            "avoided_rate": self.matched / decisions if decisions else 0.0,
+            "subcategories_deduplicated": self.deduplicated
+        }
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+pendency_categorizer = PendencyCategorizer(
+    match_threshold=settings.PENDENCY_MATCH_THRESHOLD,
+    dedup_threshold=settings.PENDENCY_DEDUP_THRESHOLD
+)
@@ -0,0 +1,93 @@
+import re
+from bisect import bisect_left
+from typing import NamedTuple
+
+# Marcadores de campo. Todos terminam em ":" e o IGNORECASE do `re` compara caractere a
+# caractere, então cada ocorrência tem o tamanho do literal e termina num ":" do chunk.
+_MARKERS = [
+    (name, re.compile(re.escape(literal), re.IGNORECASE), len(literal))
+    for name, literal in (("descricao", "Descrição:"), ("solucao", "Solução:"), ("palavras_chave", "Palavras-chave:"))
+]
+_WHITESPACE = re.compile(r'\s*')
+
+
+def _iter_markers(chunk: str):
+    """Produz (tipo, início, fim) de cada marcador, em ordem, numa passada pelos ":" do chunk."""
+    colon = chunk.find(':')
+    while colon != -1:
+        end = colon + 1
+        for name, pattern, size in _MARKERS:
+            start = end - size
+            if start >= 0 and pattern.match(chunk, start, end):
+                yield name, start, end
+                break
+        colon = chunk.find(':', end)
+
+
+class ChunkFields(NamedTuple):
+    """Campos extraídos de um chunk (já sem espaços nas pontas; "" quando ausentes)."""
+    titulo: str
+    descricao: str
+    solucao: str
+    palavras_chave: str
+
+
+def _parse_titulo(chunk: str, descricao_starts: list) -> str:
+    """
+    Equivalente a `re.search(r'#\\s*(.*?)(?:\\n|Descrição:)', chunk, re.IGNORECASE)`:
+    o texto após o primeiro "#" que tenha, na mesma linha, uma quebra de linha ou um "Descrição:".
+    """
+    hash_pos = chunk.find('#')
+    while hash_pos != -1:
+        text_start = _WHITESPACE.match(chunk, hash_pos + 1).end()
+        line_end = chunk.find('\n', text_start)
+        index = bisect_left(descricao_starts, text_start)
+        descricao_pos = descricao_starts[index] if index < len(descricao_starts) else -1
+
+        ends = [pos for pos in (line_end, descricao_pos) if pos != -1]
+        if ends:
+            return chunk[text_start:min(ends)].strip()
+        # Sem fim de linha depois do texto: o regex recua no `\s*` e, se os espaços após o "#"
+        # contiverem uma quebra de linha, casa com um título vazio; senão tenta o próximo "#".
+        if '\n' in chunk[hash_pos + 1:text_start]:
+            return ""
+        hash_pos = chunk.find('#', hash_pos + 1)
+    return ""
+
+
+def parse_chunk(chunk: str) -> ChunkFields:
+    """
+    Extrai título, descrição, solução e palavras-chave numa única passada pelos marcadores.
+    Produz o mesmo resultado das buscas individuais usadas anteriormente:
+    - descrição: do primeiro "Descrição:" até o próximo "Solução:"/"Palavras-chave:" (ou o fim);
+    - solução: do primeiro "Solução:" até o próximo "Palavras-chave:" (ou o fim);
+    - palavras-chave: do primeiro "Palavras-chave:" até o fim.
+    """
+    descricao_starts = []
+    descricao = solucao = palavras_chave = None
+    descricao_end = solucao_end = None
+
+    for kind, start, end in _iter_markers(chunk):
+        if kind == "descricao":
+            descricao_starts.append(start)
+            if descricao is None:
+                descricao = end
+            continue
+        # Um "Solução:" ou "Palavras-chave:" encerra a descrição aberta
+        if descricao is not None and descricao_end is None:
+            descricao_end = start
+        if kind == "solucao":
+            if solucao is None:
+                solucao = end
+        else:
+            if solucao is not None and solucao_end is None:
+                solucao_end = start
+            if palavras_chave is None:
+                palavras_chave = end
+
+    return ChunkFields(
+        titulo=_parse_titulo(chunk, descricao_starts),
+        descricao=chunk[descricao:descricao_end].strip() if descricao is not None else "",
+        solucao=chunk[solucao:solucao_end].strip() if solucao is not None else "",
+        palavras_chave=chunk[palavras_chave:].strip() if palavras_chave is not None else ""
+    )
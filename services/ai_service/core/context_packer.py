@@ -0,0 +1,184 @@
+from typing import List, Optional, Sequence
+from config.settings import settings
+from core.tokenization import budget_units, estimate_tokens, normalize_terms
+
+# Marca de trecho omitido ao recortar uma passagem
+_ELLIPSIS = "[...]"
+# Colunas que indicam que os resultados já vêm ordenados por outro critério que não a similaridade
+_RANKED_KEYS = {"rerank_score", "hybrid_score"}
+# Orçamento mínimo que ainda vale a pena usar com uma passagem recortada
+_MIN_PASSAGE_TOKENS = 40
+
+
+def _passage_header(doc) -> str:
+    return f"Contexto (ID: {doc['id']}): Título: '{doc['titulo']}'. Solução: "
+
+
+def _shingles(terms: List[str], size: int = 3) -> set:
+    if len(terms) < size:
+        return {tuple(terms)} if terms else set()
+    return {tuple(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def trim_passage(passage: str, question_terms: set, max_tokens: int) -> tuple:
+    """
+    Recorta `passage` para até `max_tokens`, mantendo a janela contígua de sentenças com mais
+    termos da pergunta (contígua para não quebrar a ordem dos passos de um procedimento).
+    Empates favorecem o início do texto. Retorna (texto, foi_recortado).
+    """
+    if estimate_tokens(passage) <= max_tokens:
+        return passage, False
+
+    # Reserva espaço para as marcas de trecho omitido nas duas pontas
+    max_tokens = max(1, max_tokens - 2 * estimate_tokens(_ELLIPSIS))
+    units = budget_units(passage, max_tokens)
+    scores = [len(question_terms.intersection(normalize_terms(passage[start:end]))) for start, end, _ in units]
+
+    best_score, best_window = -1, (0, 1)
+    j = tokens = score = 0
+    for i in range(len(units)):
+        while j < len(units) and tokens + units[j][2] <= max_tokens:
+            tokens += units[j][2]
+            score += scores[j]
+            j += 1
+        if j == i:
+            # Uma única palavra maior que o limite: a janela é só ela
+            tokens, score, j = units[i][2], scores[i], i + 1
+        if score > best_score:
+            best_score, best_window = score, (i, j)
+        tokens -= units[i][2]
+        score -= scores[i]
+
+    first, last = best_window
+    text = passage[units[first][0]:units[last - 1][1]]
+    if units[first][2] > max_tokens:
+        # Palavra única gigante (ex: base64, URL): corte por caracteres
+        text = text[:max_tokens * 4]
+    if first > 0:
+        text = f"{_ELLIPSIS} {text}"
+    if last < len(units):
+        text = f"{text} {_ELLIPSIS}"
+    return text, True
+
+
+class PackedContext:
+    """Contexto montado para o prompt de geração e o relatório do que foi enviado."""
+
+    def __init__(self, text: str, passages: List[dict], tokens: int, original_tokens: int, dropped_duplicates: int, dropped_budget: int):
+        self.text = text
+        self.passages = passages
+        self.tokens = tokens
+        self.original_tokens = original_tokens
+        self.dropped_duplicates = dropped_duplicates
+        self.dropped_budget = dropped_budget
+
+    def report(self) -> dict:
+        return {
+            "tokens": self.tokens,
+            "original_tokens": self.original_tokens,
+            "passages": len(self.passages),
+            "trimmed": sum(passage["trimmed"] for passage in self.passages),
+            "dropped_duplicates": self.dropped_duplicates,
+            "dropped_budget": self.dropped_budget
+        }
+
+
+class ContextPacker:
+    """
+    Preenche um orçamento de tokens com as passagens recuperadas pelo RAG:
+    - ordena por similaridade (maior primeiro), ou mantém a ordem do re-ranking/busca híbrida;
+    - descarta passagens quase duplicadas de outras já incluídas (Jaccard de trigramas de termos);
+    - recorta cada passagem para as sentenças mais relevantes à pergunta, limitada a
+      `max_passage_tokens` e ao que resta do orçamento.
+    A passagem mais similar é sempre incluída (recortada, se preciso).
+    """
+
+    def __init__(self, token_budget: int, max_passage_tokens: int, dedup_threshold: float):
+        self.token_budget = token_budget
+        self.max_passage_tokens = max_passage_tokens
+        self.dedup_threshold = dedup_threshold
+        self.requests = 0
+        self.tokens_sent = 0
+        self.tokens_original = 0
+        self.dropped_duplicates = 0
+        self.dropped_budget = 0
+
+    def pack(self, rag_results: Sequence, question: str) -> PackedContext:
+        question_terms = set(normalize_terms(question))
+        # Resultados re-ordenados (re-ranking ou busca híbrida) já chegam na ordem final
+        if all(_RANKED_KEYS.intersection(doc.keys()) for doc in rag_results):
+            ranked = list(rag_results)
+        else:
+            ranked = sorted(rag_results, key=lambda doc: doc["similarity"] or 0.0, reverse=True)
+
+        lines, passages, included_shingles = [], [], []
+        remaining = self.token_budget
+        dropped_duplicates = dropped_budget = original_tokens = 0
+        for doc in ranked:
+            header = _passage_header(doc)
+            solucao = doc["solucao"] or ""
+            original_tokens += estimate_tokens(header + solucao)
+
+            shingles = _shingles(normalize_terms(solucao))
+            if any(_jaccard(shingles, other) >= self.dedup_threshold for other in included_shingles):
+                dropped_duplicates += 1
+                continue
+
+            available = min(self.max_passage_tokens, remaining - estimate_tokens(header))
+            if passages and available < _MIN_PASSAGE_TOKENS:
+                dropped_budget += 1
+                continue
+
+            passage, trimmed = trim_passage(solucao, question_terms, max(available, _MIN_PASSAGE_TOKENS))
+            line = header + passage
+            tokens = estimate_tokens(line)
+            remaining -= tokens
+            lines.append(line)
+            included_shingles.append(shingles)
+            passages.append({"id": doc["id"], "tokens": tokens, "trimmed": trimmed})
+
+        text = "\n".join(lines)
+        packed = PackedContext(text, passages, estimate_tokens(text), original_tokens, dropped_duplicates, dropped_budget)
+        self.requests += 1
+        self.tokens_sent += packed.tokens
+        self.tokens_original += original_tokens
+        self.dropped_duplicates += dropped_duplicates
+        self.dropped_budget += dropped_budget
+        return packed
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.CONTEXT_PACKING_ENABLED,
+            "token_budget": self.token_budget,
+            "requests": self.requests,
+            "avg_tokens_sent": round(self.tokens_sent / self.requests, 1) if self.requests else 0.0,
+            "avg_tokens_original": round(self.tokens_original / self.requests, 1) if self.requests else 0.0,
+            "dropped_duplicates": self.dropped_duplicates,
+            "dropped_budget": self.dropped_budget
+        }
+
+
+context_packer = ContextPacker(
+    token_budget=settings.CONTEXT_TOKEN_BUDGET,
+    max_passage_tokens=settings.CONTEXT_PASSAGE_MAX_TOKENS,
+    dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+)
+
+
+def build_context(rag_results: Sequence, question: str, packer: Optional[ContextPacker] = None) -> PackedContext:
+    """
+    Contexto do prompt de geração. Com CONTEXT_PACKING_ENABLED=false, mantém o comportamento
+    anterior (todas as passagens completas, na ordem da busca).
+    """
+    if not settings.CONTEXT_PACKING_ENABLED:
+        text = "\n".join(_passage_header(doc) + (doc["solucao"] or "") for doc in rag_results)
+        tokens = estimate_tokens(text)
+        passages = [{"id": doc["id"], "tokens": estimate_tokens(_passage_header(doc) + (doc["solucao"] or "")), "trimmed": False} for doc in rag_results]
+        return PackedContext(text, passages, tokens, tokens, 0, 0)
+    return (packer or context_packer).pack(rag_results, question)
@@ -1,139 +1,227 @@
-import requests
-import io
-import re
-from typing import List
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import httpx
+from sqlalchemy import text
 from models.loader import embeddings_model
 from schemas.document import DocumentProcessRequest
-from unstructured.partition.auto import partition
+from config.settings import settings
+from config.database import async_engine
+from core.partition_pool import partition_pool
+from core.text_extraction import iter_prepared_chunks, iter_spooled_chunks, spool_chunks_from_file
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def process_and_generate_chunks(request_data: DocumentProcessRequest) -> List[dict]:
+# Status de cada chunk em relação aos hashes já conhecidos
+ADDED, UNCHANGED = "added", "unchanged"
+
+
+def chunk_content_hash(texto_para_embedding: str, model_name: str = settings.EMBEDDINGS_MODEL_NAME) -> str:
     """
-    Processa um documento, divide-o em chunks e gera embeddings para todos 
-    os chunks de forma otimizada usando uma única chamada de API em lote.
+    Hash estável do chunk: o texto exato enviado para embedding e o modelo que o gera.
+    Trocar de modelo muda todos os hashes, forçando a geração de novos embeddings.
     """
+    return hashlib.sha256(f"{model_name}\n{texto_para_embedding}".encode("utf-8")).hexdigest()
+
+
+class ChunkDiff:
+    """Compara os chunks processados com os hashes já conhecidos de uma ingestão anterior."""
+
+    def __init__(self, known_hashes: Iterable[str] = ()):
+        self.known = set(known_hashes)
+        self.seen = set()
+        self.added = 0
+        self.unchanged = 0
+
+    def classify(self, content_hash: str) -> str:
+        self.seen.add(content_hash)
+        if content_hash in self.known:
+            self.unchanged += 1
+            return UNCHANGED
+        self.added += 1
+        return ADDED
+
+    def removed(self) -> List[str]:
+        """Hashes conhecidos que não aparecem mais no documento."""
+        return sorted(self.known - self.seen)
+
+    def summary(self) -> dict:
+        return {"added": self.added, "unchanged": self.unchanged, "removed": len(self.known - self.seen), "removed_hashes": self.removed()}
 
-    logger.info(f"Iniciando processamento e chunking para o documento : {request_data.titulo}")
-    
-    logical_blocks = []
-    fallback_keywords = request_data.palavras_chave
 
+async def _lookup_known_hashes(url_arquivo: str) -> List[str]:
+    """Hashes dos chunks já cadastrados para o mesmo arquivo."""
+    query = text('''
+        SELECT DISTINCT "hashConteudo" FROM documentos
+        WHERE "urlArquivo" = :url_arquivo AND "hashConteudo" IS NOT NULL
+    ''')
+    async with async_engine.connect() as connection:
+        return list((await connection.execute(query, {"url_arquivo": url_arquivo})).scalars().all())
 
-    # --- ETAPA 1: EXTRAIR O TEXTO DO DOCUMENTO ---
+
+async def _load_known_embeddings(content_hashes: List[str]) -> dict:
+    """Embeddings já salvos para os hashes informados (hash -> vetor)."""
+    query = text('''
+        SELECT DISTINCT ON ("hashConteudo") "hashConteudo", embedding FROM documentos
+        WHERE "hashConteudo" = ANY(:hashes) AND embedding IS NOT NULL
+    ''')
+    async with async_engine.connect() as connection:
+        rows = (await connection.execute(query, {"hashes": content_hashes})).all()
+    return {content_hash: [float(value) for value in embedding] for content_hash, embedding in rows}
+
+
+async def load_chunk_diff(request_data: DocumentProcessRequest) -> ChunkDiff:
+    """Monta a comparação a partir de `known_hashes` ou, se solicitado, dos hashes salvos no banco."""
+    known_hashes = request_data.known_hashes
+    if known_hashes is None and request_data.lookup_known_hashes and request_data.url_arquivo:
+        known_hashes = await _lookup_known_hashes(request_data.url_arquivo)
+        logger.info(f"{len(known_hashes)} hash(es) conhecido(s) encontrados no banco para {request_data.url_arquivo}")
+    return ChunkDiff(known_hashes or ())
+
+
+async def _download_to_temp_file(url: str) -> str:
+    """
+    Baixa o arquivo em streaming para um arquivo temporário em disco e retorna o caminho,
+    que é repassado ao processo do pool de particionamento. O chamador remove o arquivo.
+    """
+    with tempfile.NamedTemporaryFile(delete=False) as file:
+        try:
+            async with httpx.AsyncClient(timeout=settings.INGEST_DOWNLOAD_TIMEOUT, follow_redirects=True) as client:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async for data in response.aiter_bytes(chunk_size=64 * 1024):
+                        file.write(data)
+        except BaseException:
+            file.close()
+            os.remove(file.name)
+            raise
+    return file.name
+
+
+async def _iter_prepared_chunks(request_data: DocumentProcessRequest) -> AsyncIterator[Tuple[dict, str]]:
+    """
+    ETAPAS 1 e 2: extrai o texto do documento e os campos de cada chunk.
+    Os chunks de um arquivo são gravados pelo pool de processos num arquivo temporário e lidos
+    daqui um a um, à medida que o consumidor avança: o processo da API não guarda a lista inteira.
+    """
     if request_data.url_arquivo:
         logger.info(f"Processando a partir da URL: {request_data.url_arquivo}")
         try:
             logger.debug("Baixando conteúdo do arquivo...")
-            response = requests.get(request_data.url_arquivo)
-            response.raise_for_status()
-            file_content = response.content
-
-            logger.debug("Particionando o arquivo com Unstructured...")
-            elements = partition(file=io.BytesIO(file_content), strategy="fast")
-            if not elements:
-                logger.warning(f"Unstructured não retornou elementos para o arquivo da URL: {request_data.url_arquivo}")
-                raise ValueError("Unstructured não retornou elementos do arquivo.")
-            logger.info("Conteúdo do arquivo baixado e particionado com sucesso.")
-
-        except requests.exceptions.RequestException as e:
+            file_path = await _download_to_temp_file(request_data.url_arquivo)
+        except httpx.HTTPError as e:
             logger.error(f"Erro de rede ao baixar o arquivo da URL: {e}")
             raise ValueError(f"Não foi possível baixar o arquivo da URL: {request_data.url_arquivo}")
-        
-        except Exception as e:
-            logger.exception(f"Erro inesperado ao processar o arquivo com Unstructured: {e}")
-            raise ValueError(f"Erro ao processar o arquivo com Unstructured: {e}")
 
-        full_text = "\n\n".join([el.text for el in elements if el.text.strip()])
-        logical_blocks = re.split(r'(?=\n#\s)', full_text)
-    
-    # Se for entrada manual, o 'logical_blocks' usará os dados manuais.
+        spool_path = f"{file_path}.chunks"
+        try:
+            try:
+                file_name = os.path.basename(unquote(urlparse(request_data.url_arquivo).path)) or None
+                # Particionamento e regex rodam fora do event loop, no pool de processos
+                count = await partition_pool.run(spool_chunks_from_file, file_path, file_name, request_data, spool_path)
+                logger.info(f"Conteúdo do arquivo baixado e particionado com sucesso: {count} chunk(s).")
+            except TimeoutError:
+                raise
+            except Exception as e:
+                logger.exception(f"Erro inesperado ao processar o arquivo com Unstructured: {e}")
+                raise ValueError(f"Erro ao processar o arquivo com Unstructured: {e}")
+            finally:
+                os.remove(file_path)
+
+            with open(spool_path, "rb") as spool:
+                for prepared in iter_spooled_chunks(spool):
+                    yield prepared
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+
+    # Se for entrada manual, os blocos lógicos usarão os dados manuais.
     elif request_data.solucao:
         logger.info("Processando a partir de texto manual (solucao).")
         manual_text = f"# {request_data.titulo}\nDescrição: {request_data.descricao}\nSolução: {request_data.solucao}"
-        logical_blocks = [manual_text]
+        # Entrada manual é sempre um único documento, por maior que seja: o backend grava (ou
+        # atualiza) exatamente um registro para ela, com o título informado
+        for prepared in iter_prepared_chunks(request_data, [manual_text], max_tokens=0):
+            yield prepared
     else:
         raise ValueError("Forneça 'solucao' ou 'url_arquivo'.")
-    
-    logger.info(f"Documento dividido em {len(logical_blocks)} bloco(s) lógicos.")
-
-    # --- ETAPA 2: PREPARAR OS DADOS E TEXTOS PARA EMBEDDING ---
-    chunks_to_process = []
-    texts_for_embedding = []
-
-    for i, chunk_text in enumerate(logical_blocks):
-        clean_chunk = chunk_text.strip()
-        if not clean_chunk:
-            continue
-
-        logger.debug(f"Processando chunk #{i+1}/{len(logical_blocks)}...")
-
-        titulo_final = request_data.titulo
-        descricao_final = request_data.descricao
-        solucao_final = clean_chunk.lstrip('#').strip()
-        palavras_chave_extraidas = ""
-        
-        match_titulo = re.search(r'#\s*(.*?)(?:\n|Descrição:)', clean_chunk, re.IGNORECASE)
-        if match_titulo and match_titulo.group(1).strip():
-            titulo_final = match_titulo.group(1).strip()
-
-        match_descricao = re.search(r'Descrição:(.*?)(?=\s*Solução:|\s*Palavras-chave:|$)', clean_chunk, re.DOTALL | re.IGNORECASE)
-        if match_descricao and match_descricao.group(1).strip():
-            descricao_final = match_descricao.group(1).strip()
-        
-        match_solucao = re.search(r'Solução:(.*?)(?=\s*Palavras-chave:|$)', clean_chunk, re.DOTALL | re.IGNORECASE)
-        if match_solucao and match_solucao.group(1).strip():
-            solucao_final = match_solucao.group(1).strip()
-        
-        match_palavras_chave = re.search(r'Palavras-chave:(.*)', clean_chunk, re.DOTALL | re.IGNORECASE)
-        if match_palavras_chave and match_palavras_chave.group(1).strip():
-            palavras_chave_extraidas = match_palavras_chave.group(1).strip()
-            
-        # Prioriza as palavras-chave extraídas do documento. Se não houver, usa as do fallback que vem do front.
-        palavras_chave_finais = palavras_chave_extraidas if palavras_chave_extraidas else ", ".join(fallback_keywords)
-
-        texto_para_embedding = f"Título: {titulo_final}\nDescrição: {descricao_final}\nSolução: {solucao_final}"
-        if palavras_chave_finais:
-            texto_para_embedding += f"\nPalavras-chave: {palavras_chave_finais.strip().rstrip('.')}"
-
-        logger.debug(f"  - Título do chunk: '{titulo_final}'")
-        logger.debug(f"  - Texto preparado para embedding (primeiros 100 chars): '{texto_para_embedding[:100]}...'")
-       
-        texts_for_embedding.append(texto_para_embedding)
-        chunks_to_process.append({
-            "titulo": titulo_final,
-            "descricao": descricao_final,
-            "solucao": solucao_final,
-            "palavras_chave": [p.strip().rstrip('.') for p in palavras_chave_finais.split(',') if p.strip()]
-        })
-
-
-    # --- ETAPA 3: GERAR EMBEDDINGS EM LOTE  ---
-    if not texts_for_embedding:
-        logger.warning(f"Nenhum texto válido encontrado para gerar embeddings no documento ID: {request_data.documento_id}")
+
+
+async def _embed_chunk_batch(request_data: DocumentProcessRequest, batch: List[Tuple[dict, str]], diff: ChunkDiff) -> List[dict]:
+    """
+    ETAPAS 3 e 4: gera os embeddings de um lote de chunks e monta os documentos finais.
+    Apenas chunks novos ou alterados vão para o modelo; os inalterados reaproveitam o embedding
+    já salvo no banco, de modo que todo documento devolvido tem embedding (o backend grava
+    cada um como veio). Um hash conhecido sem embedding salvo é gerado de novo.
+    """
+    hashes = [chunk_content_hash(texto) for _, texto in batch]
+    statuses = [diff.classify(content_hash) for content_hash in hashes]
+    unchanged = [content_hash for content_hash, chunk_status in zip(hashes, statuses) if chunk_status == UNCHANGED]
+    stored = await _load_known_embeddings(unchanged) if unchanged else {}
+    pending = [texto for (_, texto), content_hash in zip(batch, hashes) if content_hash not in stored]
+
+    embeddings = []
+    if pending:
+        try:
+            logger.info(f"Gerando embeddings em lote para {len(pending)} de {len(batch)} chunks.")
+            embeddings = await embeddings_model.aembed_documents(pending)
+            logger.info("Embeddings gerados com sucesso.")
+        except Exception as e:
+            logger.exception("Falha na chamada para o modelo de embeddings.")
+            raise RuntimeError(f"Erro ao gerar embeddings: {e}")
+    else:
+        logger.info(f"Nenhum dos {len(batch)} chunks do lote foi alterado. Embeddings reaproveitados.")
+
+    new_embeddings = iter(embeddings)
+    return [{
+        "titulo": chunk_data["titulo"],
+        "descricao": chunk_data["descricao"],
+        "solucao": chunk_data["solucao"],
+        "palavras_chave": chunk_data["palavras_chave"],
+        "subcategoria_id": request_data.subcategoria_id,
+        "embedding": stored[content_hash] if content_hash in stored else next(new_embeddings),
+        "urlArquivo": request_data.url_arquivo,
+        "ativo": True,
+        "content_hash": content_hash,
+        "status": chunk_status
+    } for (chunk_data, _), content_hash, chunk_status in zip(batch, hashes, statuses)]
+
+
+async def iter_processed_documents(request_data: DocumentProcessRequest, diff: Optional[ChunkDiff] = None,
+                                   batch_size: int = settings.INGEST_EMBEDDING_BATCH_SIZE) -> AsyncIterator[dict]:
+    """
+    Modo streaming: produz os documentos (chunks com embedding) à medida que ficam prontos.
+    Os chunks são extraídos no pool de processos e lidos aos poucos; os embeddings saem em lotes
+    de até `batch_size`, mantendo o uso de memória e o tamanho das chamadas à API limitados.
+    `diff` (re-ingestão incremental) recebe a classificação de cada chunk; ao final, `diff.removed()`
+    lista os chunks conhecidos que deixaram de existir.
+    """
+    diff = diff if diff is not None else ChunkDiff()
+    logger.info(f"Iniciando processamento e chunking para o documento : {request_data.titulo}")
+    batch: List[Tuple[dict, str]] = []
+    async for prepared in _iter_prepared_chunks(request_data):
+        batch.append(prepared)
+        if len(batch) >= batch_size:
+            for document in await _embed_chunk_batch(request_data, batch, diff):
+                yield document
+            batch = []
+    if batch:
+        for document in await _embed_chunk_batch(request_data, batch, diff):
+            yield document
+
+
+async def process_and_generate_chunks(request_data: DocumentProcessRequest, diff: Optional[ChunkDiff] = None) -> List[dict]:
+    """
+    Processa um documento, divide-o em chunks e gera embeddings para todos
+    os chunks novos ou alterados em chamadas de API em lote.
+    """
+    final_documents = [document async for document in iter_processed_documents(request_data, diff)]
+    if not final_documents:
+        logger.warning(f"Nenhum texto válido encontrado para gerar embeddings no documento: {request_data.titulo}")
         return []
 
-    try:
-        logger.info(f"Gerando embeddings em lote para {len(texts_for_embedding)} chunks.")
-        embeddings = embeddings_model.embed_documents(texts_for_embedding)
-        logger.info("Embeddings gerados com sucesso.")
-    except Exception as e:
-        logger.exception("Falha na chamada para o modelo de embeddings.")
-        raise RuntimeError(f"Erro ao gerar embeddings: {e}")
-
-    # --- ETAPA 4: MONTAR A RESPOSTA FINAL ---
-    final_documents = []
-    for chunk_data, embedding in zip(chunks_to_process, embeddings):
-        final_documents.append({
-            "titulo": chunk_data["titulo"],
-            "descricao": chunk_data["descricao"],
-            "solucao": chunk_data["solucao"],
-            "palavras_chave": chunk_data["palavras_chave"], 
-            "subcategoria_id": request_data.subcategoria_id,
-            "embedding": embedding,
-            "urlArquivo": request_data.url_arquivo,
-            "ativo": True
-        })
     logger.info(f"Montagem final concluída. Retornando {len(final_documents)} documentos processados.")
-    return final_documents
\ No newline at end of file
+    return final_documents
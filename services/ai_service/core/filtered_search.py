@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from typing import NamedTuple, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from config.settings import settings
+from core.quantization import quantized_expression, quantized_opclass
+from core.vector_index import DISTANCE_OPERATOR, OPCLASS_BY_OPERATOR, build_index_ddl, version_tuple
+
+logger = logging.getLogger(__name__)
+
+# Estratégias de busca por similaridade com filtro de subcategoria
+ANN = "ann"                       # sem filtro: índice ANN global
+EXACT_SCAN = "exact_scan"         # subcategoria pequena: varredura exata (sem o índice ANN)
+ITERATIVE_SCAN = "iterative_scan" # índice ANN global com varredura iterativa (pgvector >= 0.8)
+PARTIAL_INDEX = "partial_index"   # índice ANN parcial só com os documentos da subcategoria
+
+# Varredura iterativa: ordem estrita no HNSW; o IVFFlat só oferece a ordem aproximada
+_ITERATIVE_SETTINGS = {
+    "hnsw": (("hnsw.iterative_scan", "strict_order"), ("hnsw.max_scan_tuples", "FILTERED_MAX_SCAN_TUPLES")),
+    "ivfflat": (("ivfflat.iterative_scan", "relaxed_order"), ("ivfflat.max_probes", "IVFFLAT_LISTS")),
+}
+
+
+class SearchPlan(NamedTuple):
+    strategy: str
+    # Documentos ativos da subcategoria na última contagem (None sem filtro)
+    rows: Optional[int]
+    # Subcategoria a ser escrita como literal na consulta: o planner só escolhe um índice
+    # parcial se o predicado da consulta casar com o do índice, o que não acontece com parâmetros
+    inline_subcategory: Optional[int] = None
+
+
+def partial_index_name(table: str, method: str, subcategoria_id: int, quantization: str = "none") -> str:
+    kind = "cosine" if quantization == "none" else quantization
+    return f"{table}_embedding_{method}_{kind}_sub{int(subcategoria_id)}_idx"
+
+
+def partial_index_predicate(subcategoria_id: int) -> str:
+    return f"ativo = true AND subcategoria_id = {int(subcategoria_id)}"
+
+
+async def apply_strategy(connection: AsyncConnection, strategy: str, iterative_supported: bool = True):
+    """Ajusta os parâmetros do planner/pgvector da transação corrente para a estratégia escolhida."""
+    if strategy == EXACT_SCAN:
+        # Desliga apenas os index scans: o HNSW/IVFFlat deixa de ser usado, mas o filtro por
+        # subcategoria continua podendo usar o índice B-tree via bitmap scan
+        await connection.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+    elif strategy == ITERATIVE_SCAN or (strategy == PARTIAL_INDEX and iterative_supported):
+        # No índice parcial, a varredura iterativa só compensa documentos inativos recém-alterados
+        (mode_name, mode_value), (limit_name, limit_setting) = _ITERATIVE_SETTINGS[settings.VECTOR_INDEX_TYPE]
+        await connection.execute(
+            text("SELECT set_config(:mode_name, :mode_value, true), set_config(:limit_name, :limit_value, true)"),
+            {"mode_name": mode_name, "mode_value": mode_value,
+             "limit_name": limit_name, "limit_value": str(getattr(settings, limit_setting))}
+        )
+
+
+class FilteredSearchPlanner:
+    """
+    Escolhe como executar a busca vetorial com filtro de subcategoria, a partir da contagem de
+    documentos ativos por subcategoria (atualizada a cada `refresh_seconds`):
+    - até `exact_max_rows` documentos: varredura exata, que é barata e sempre retorna top_k;
+    - com índice parcial válido (ver `ensure_partial_indexes`): índice parcial;
+    - demais: índice global com varredura iterativa, que continua percorrendo o grafo até
+      encontrar top_k documentos da subcategoria. Sem suporte no pgvector (< 0.8), varredura exata.
+    Um índice ANN global com pós-filtro (o comportamento anterior) pode retornar menos que top_k.
+    """
+
+    def __init__(self, exact_max_rows: int, refresh_seconds: float, table: str = "documentos"):
+        self.exact_max_rows = exact_max_rows
+        self.refresh_seconds = refresh_seconds
+        self.table = table
+        self.counts: dict = {}
+        self.partial_indexes: set = set()
+        self.iterative_supported = False
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.decisions = Counter()
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, connection: AsyncConnection):
+        rows = (await connection.execute(text(f"""
+            SELECT subcategoria_id, count(*) AS total FROM {self.table}
+            WHERE ativo = true AND subcategoria_id IS NOT NULL
+            GROUP BY subcategoria_id
+        """))).all()
+        self.counts = {row.subcategoria_id: row.total for row in rows}
+
+        # Só contam os índices parciais do modo de quantização em uso (os outros não casam com a consulta)
+        kind = "cosine" if settings.VECTOR_QUANTIZATION == "none" else settings.VECTOR_QUANTIZATION
+        pattern = re.compile(rf"^{re.escape(self.table)}_embedding_{settings.VECTOR_INDEX_TYPE}_{kind}_sub(\d+)_idx$")
+        indexes = (await connection.execute(text("""
+            SELECT i.relname AS index_name
+            FROM pg_index ix
+            JOIN pg_class t ON t.oid = ix.indrelid
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            WHERE t.relname = :table AND ix.indisvalid
+        """), {"table": self.table})).all()
+        self.partial_indexes = {int(match.group(1)) for row in indexes if (match := pattern.match(row.index_name))}
+
+        version = (await connection.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))).scalar()
+        self.iterative_supported = version_tuple(version) >= (0, 8)
+        self.refreshed_at = time.monotonic()
+        self.refreshes += 1
+        logger.info(f"Estatísticas de subcategorias atualizadas: {len(self.counts)} subcategorias, "
+                    f"índices parciais={sorted(self.partial_indexes)}, varredura iterativa={self.iterative_supported}")
+
+    async def _ensure_fresh(self, connection: AsyncConnection):
+        if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < self.refresh_seconds:
+            return
+        async with self._lock:
+            if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_seconds:
+                await self.refresh(connection)
+
+    def choose(self, subcategoria_id: Optional[int]) -> SearchPlan:
+        if not subcategoria_id:
+            return SearchPlan(ANN, None)
+        rows = self.counts.get(subcategoria_id, 0)
+        if rows <= self.exact_max_rows or settings.VECTOR_INDEX_TYPE == "none":
+            return SearchPlan(EXACT_SCAN, rows)
+        if subcategoria_id in self.partial_indexes:
+            return SearchPlan(PARTIAL_INDEX, rows, inline_subcategory=int(subcategoria_id))
+        if self.iterative_supported:
+            return SearchPlan(ITERATIVE_SCAN, rows)
+        return SearchPlan(EXACT_SCAN, rows)
+
+    async def prepare(self, connection: AsyncConnection, subcategoria_id: Optional[int]) -> SearchPlan:
+        """Escolhe a estratégia e aplica os parâmetros correspondentes na transação de `connection`."""
+        if subcategoria_id:
+            await self._ensure_fresh(connection)
+        plan = self.choose(subcategoria_id)
+        await apply_strategy(connection, plan.strategy, self.iterative_supported)
+        self.decisions[plan.strategy] += 1
+        if subcategoria_id:
+            logger.info(f"Busca filtrada: subcategoria {subcategoria_id} ({plan.rows} documentos) -> {plan.strategy}")
+        return plan
+
+    def stats(self) -> dict:
+        return {
+            "decisions": dict(self.decisions),
+            "subcategories": len(self.counts),
+            "partial_indexes": sorted(self.partial_indexes),
+            "iterative_scan_supported": self.iterative_supported,
+            "refreshes": self.refreshes,
+            "stats_age_seconds": round(time.monotonic() - self.refreshed_at, 1) if self.refreshed_at is not None else None
+        }
+
+
+async def ensure_partial_indexes(engine: AsyncEngine, table: str = "documentos"):
+    """
+    Cria (CONCURRENTLY) um índice ANN parcial para cada subcategoria com pelo menos
+    FILTERED_PARTIAL_INDEX_MIN_ROWS documentos ativos. Índices já existentes são mantidos.
+    Com VECTOR_QUANTIZATION, o índice parcial é sobre a cópia quantizada do embedding.
+    """
+    method = settings.VECTOR_INDEX_TYPE
+    if method == "none" or not settings.FILTERED_PARTIAL_INDEX_AUTO_CREATE:
+        return
+
+    quantization = settings.VECTOR_QUANTIZATION
+    if quantization == "none":
+        column, opclass = "embedding", OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+    else:
+        column, opclass = quantized_expression("embedding", quantization), quantized_opclass(quantization)
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text("SELECT pg_advisory_lock(hashtext('ai_service_vector_indexes'))"))
+        try:
+            large = (await connection.execute(text(f"""
+                SELECT subcategoria_id FROM {table}
+                WHERE ativo = true AND subcategoria_id IS NOT NULL
+                GROUP BY subcategoria_id
+                HAVING count(*) >= :min_rows
+            """), {"min_rows": settings.FILTERED_PARTIAL_INDEX_MIN_ROWS})).scalars().all()
+
+            for subcategoria_id in large:
+                name = partial_index_name(table, method, subcategoria_id, quantization)
+                valid = (await connection.execute(text("""
+                    SELECT ix.indisvalid FROM pg_index ix JOIN pg_class i ON i.oid = ix.indexrelid WHERE i.relname = :name
+                """), {"name": name})).scalar()
+                if valid:
+                    continue
+                if valid is False:
+                    logger.warning(f"Índice parcial '{name}' está inválido. Recriando...")
+                    await connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+                logger.info(f"Criando índice parcial {method} para a subcategoria {subcategoria_id}...")
+                await connection.execute(text(build_index_ddl(
+                    table, column, method, opclass, name, where=partial_index_predicate(subcategoria_id)
+                )))
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(hashtext('ai_service_vector_indexes'))"))
+
+
+filtered_search_planner = FilteredSearchPlanner(
+    exact_max_rows=settings.FILTERED_EXACT_MAX_ROWS,
+    refresh_seconds=settings.FILTERED_STATS_REFRESH_SECONDS
+)
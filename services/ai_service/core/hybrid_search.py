@@ -0,0 +1,112 @@
+from config.settings import settings
+from core.quantization import candidate_source, rescore_limit
+from core.vector_index import DISTANCE_OPERATOR, query_vector
+
+# Coluna tsvector (gerada pelo banco a partir de título, descrição e solução) e a configuração
+# de idioma usada por ela. A coluna e o índice GIN são criados pela migration do backend.
+TEXT_SEARCH_COLUMN = '"textoBusca"'
+TEXT_SEARCH_CONFIG = "portuguese"
+
+_KEYWORDS_COLUMN = """,
+               (SELECT string_agg(pc.palavra, ', ') FROM documentos_palavras_chave dpc
+                JOIN palavras_chave pc ON pc.id = dpc.palavra_chave_id
+                WHERE dpc.documento_id = d.id) AS palavras_chave"""
+
+
+def build_search_query(mode: str, filtered: bool, with_keywords: bool = False, table: str = "documentos",
+                       inline_subcategory: int | None = None, quantization: str = "none") -> str:
+    """
+    Monta a consulta de recuperação de documentos.
+
+    - "vector": ordenação pela distância de cosseno do embedding (índice ANN);
+    - "hybrid": um ramo vetorial e um ramo de texto completo (tsvector + GIN), cada um com até
+      `:candidates` documentos, fundidos por Reciprocal Rank Fusion com pesos configuráveis,
+      tudo numa única ida ao banco. O filtro de subcategoria é aplicado dentro dos dois ramos.
+
+    Parâmetros: q_vector, top_k, sub_id (se `filtered`) e, no modo híbrido, q_text, candidates,
+    vector_weight, text_weight e rrf_k (ver `search_params`). Com `inline_subcategory`, o filtro
+    usa o valor literal em vez de :sub_id (necessário para o uso de índices parciais). Com
+    `quantization` ("halfvec"/"bit"), a busca vetorial pré-seleciona :rescore_limit candidatos
+    pela cópia quantizada e os ordena pela distância exata (ver core/quantization.py).
+    """
+    if inline_subcategory is not None:
+        where = f"d.ativo = true AND d.subcategoria_id = {int(inline_subcategory)}"
+    else:
+        where = "d.ativo = true" + (" AND d.subcategoria_id = :sub_id" if filtered else "")
+    keywords = _KEYWORDS_COLUMN if with_keywords else ""
+    distance = f"d.embedding {DISTANCE_OPERATOR} (:q_vector)::vector"
+    source, vector_where = candidate_source(table, where, quantization)
+
+    if mode == "vector":
+        return f"""
+        SELECT d.id, d.titulo, d.descricao, d.solucao, d."urlArquivo", d."updatedAt",
+               (1 - ({distance})) AS similarity{keywords}
+        FROM {source}
+        WHERE {vector_where}
+        ORDER BY {distance}
+        LIMIT :top_k;
+    """
+
+    if mode != "hybrid":
+        raise ValueError(f"Modo de recuperação não suportado: {mode}")
+
+    # Os termos da pergunta são combinados com OU: basta um código ou termo em comum para
+    # o documento entrar no ramo textual (o ts_rank_cd ordena pelos que têm mais termos).
+    return f"""
+        WITH vetorial AS (
+            SELECT id, row_number() OVER (ORDER BY distancia) AS posicao
+            FROM (
+                SELECT d.id, {distance} AS distancia
+                FROM {source}
+                WHERE {vector_where}
+                ORDER BY distancia
+                LIMIT :candidates
+            ) v
+        ),
+        textual AS (
+            SELECT id, row_number() OVER (ORDER BY relevancia DESC) AS posicao
+            FROM (
+                SELECT d.id, ts_rank_cd(d.{TEXT_SEARCH_COLUMN}, consulta) AS relevancia
+                FROM {table} d,
+                     replace(plainto_tsquery('{TEXT_SEARCH_CONFIG}', CAST(:q_text AS text))::text, '&', '|')::tsquery AS consulta
+                WHERE {where} AND d.{TEXT_SEARCH_COLUMN} @@ consulta
+                ORDER BY relevancia DESC
+                LIMIT :candidates
+            ) t
+        ),
+        fusao AS (
+            SELECT id, sum(pontuacao) AS hybrid_score
+            FROM (
+                SELECT id, CAST(:vector_weight AS float8) / (CAST(:rrf_k AS integer) + posicao) AS pontuacao FROM vetorial
+                UNION ALL
+                SELECT id, CAST(:text_weight AS float8) / (CAST(:rrf_k AS integer) + posicao) FROM textual
+            ) p
+            GROUP BY id
+        )
+        SELECT d.id, d.titulo, d.descricao, d.solucao, d."urlArquivo", d."updatedAt",
+               (1 - ({distance})) AS similarity, f.hybrid_score{keywords}
+        FROM fusao f
+        JOIN {table} d ON d.id = f.id
+        ORDER BY f.hybrid_score DESC
+        LIMIT :top_k;
+    """
+
+
+def search_params(mode: str, embedding, question: str, limit: int, subcategoria_id: int | None,
+                  quantization: str = "none") -> dict:
+    """Parâmetros de `build_search_query` para o modo e o limite de resultados informados."""
+    params = {"q_vector": query_vector(embedding), "top_k": limit}
+    if subcategoria_id:
+        params["sub_id"] = subcategoria_id
+    candidates = max(limit, settings.HYBRID_CANDIDATES) if mode == "hybrid" else limit
+    if quantization != "none":
+        params["rescore_limit"] = rescore_limit(candidates)
+    if mode == "hybrid":
+        params.update({
+            "q_text": question,
+            "candidates": candidates,
+            "vector_weight": settings.HYBRID_VECTOR_WEIGHT,
+            "text_weight": settings.HYBRID_TEXT_WEIGHT,
+            "rrf_k": settings.HYBRID_RRF_K
+        })
+    return params
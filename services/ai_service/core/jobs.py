@@ -0,0 +1,307 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import time
+from typing import List, Optional, Tuple
+import msgpack
+from config.settings import settings
+from core.document_analyzer import iter_processed_documents, load_chunk_diff
+from core.vector_codec import decode_vector, encode_vector
+from schemas.document import DocumentProcessRequest
+
+logger = logging.getLogger(__name__)
+
+# Estados de um job de ingestão
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class InMemoryJobBackend:
+    """Fila e armazenamento de jobs em memória (um único processo). Usado em testes e desenvolvimento."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: dict = {}
+        self._results: dict = {}
+
+    async def enqueue(self, job_id: str, payload: dict):
+        await self._queue.put((job_id, payload))
+
+    async def dequeue(self, timeout: float) -> Optional[Tuple[str, dict]]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    # Num único processo o job não sobrevive ao worker: não há lease a renovar nem órfãos a recuperar
+    async def heartbeat(self, job_id: str):
+        pass
+
+    async def ack(self, job_id: str):
+        pass
+
+    async def is_alive(self, job_id: str) -> bool:
+        return True
+
+    async def requeue_stale(self) -> List[str]:
+        return []
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def save(self, job_id: str, job: dict):
+        self._jobs[job_id] = dict(job)
+
+    async def set_result(self, job_id: str, documents: List[dict]):
+        self._results[job_id] = documents
+
+    async def get_result(self, job_id: str) -> Optional[List[dict]]:
+        return self._results.get(job_id)
+
+    async def aclose(self):
+        pass
+
+
+class RedisJobBackend:
+    """
+    Fila e armazenamento de jobs no Redis, compartilhados entre a API e os processos worker.
+    Fila: lista (LPUSH/BLMOVE). O BLMOVE move a mensagem para a lista `processing`, de onde ela só
+    sai no `ack`; enquanto roda, o worker renova um lease (`heartbeat`). Se o worker morrer, o
+    lease expira e `requeue_stale` devolve a mensagem à fila (ver lá a carência do recém-movido). Estado: JSON por job. Resultado:
+    msgpack com os embeddings em bytes float32, para não guardar milhares de floats como texto.
+    Tudo expira após JOB_TTL_SECONDS.
+    """
+
+    def __init__(self, redis_client, key_prefix: str = "ai_jobs:", ttl_seconds: int = 24 * 3600, lease_seconds: int = 60):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._queue = f"{key_prefix}queue"
+        self._processing = f"{key_prefix}processing"
+        # Mensagem bruta de cada job em execução neste processo, para o LREM do ack
+        self._messages: dict = {}
+
+    def _lease_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}lease:{job_id}"
+
+    def _unleased_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}unleased:{job_id}"
+
+    async def enqueue(self, job_id: str, payload: dict):
+        await self.redis.lpush(self._queue, json.dumps({"job_id": job_id, "payload": payload}))
+
+    async def dequeue(self, timeout: float) -> Optional[Tuple[str, dict]]:
+        raw = await self.redis.blmove(self._queue, self._processing, max(1, int(timeout)), "RIGHT", "LEFT")
+        if raw is None:
+            return None
+        message = json.loads(raw)
+        job_id = message["job_id"]
+        self._messages[job_id] = raw
+        await self.heartbeat(job_id)
+        return job_id, message["payload"]
+
+    async def heartbeat(self, job_id: str):
+        await self.redis.set(self._lease_key(job_id), 1, ex=self.lease_seconds)
+
+    async def ack(self, job_id: str):
+        raw = self._messages.pop(job_id, None)
+        if raw is not None:
+            await self.redis.lrem(self._processing, 1, raw)
+        await self.redis.delete(self._lease_key(job_id))
+
+    async def is_alive(self, job_id: str) -> bool:
+        return bool(await self.redis.exists(self._lease_key(job_id)))
+
+    async def _in_grace(self, job_id: str) -> bool:
+        """
+        O lease é gravado logo depois do BLMOVE, numa segunda ida ao Redis: um job ainda QUEUED
+        sem lease pode ter acabado de ser movido. Ele só é dado como órfão depois de passar
+        `lease_seconds` assim, contados da primeira varredura que o encontrou sem lease.
+        Um job RUNNING (ou concluído) já teve lease, e sem ele o worker está morto.
+        """
+        job = await self.get(job_id)
+        if job is not None and job.get("status") != QUEUED:
+            return False
+        now = time.time()
+        key = self._unleased_key(job_id)
+        await self.redis.set(key, now, nx=True, ex=self.lease_seconds * 3)
+        first_seen = await self.redis.get(key)
+        return first_seen is not None and now - float(first_seen) < self.lease_seconds
+
+    async def requeue_stale(self) -> List[str]:
+        """Devolve à fila os jobs em `processing` cujo lease expirou (worker morto). Retorna os IDs."""
+        requeued = []
+        for raw in await self.redis.lrange(self._processing, 0, -1):
+            job_id = json.loads(raw)["job_id"]
+            if await self.is_alive(job_id) or await self._in_grace(job_id):
+                continue
+            # Vários workers podem varrer ao mesmo tempo: só quem remover a mensagem a devolve
+            if await self.redis.lrem(self._processing, 1, raw):
+                # RPUSH: volta para a ponta consumida, à frente dos jobs mais novos
+                await self.redis.rpush(self._queue, raw)
+                await self.redis.delete(self._unleased_key(job_id))
+                requeued.append(job_id)
+        return requeued
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        data = await self.redis.get(f"{self.key_prefix}job:{job_id}")
+        return json.loads(data) if data else None
+
+    async def save(self, job_id: str, job: dict):
+        await self.redis.set(f"{self.key_prefix}job:{job_id}", json.dumps(job), ex=self.ttl_seconds)
+
+    async def set_result(self, job_id: str, documents: List[dict]):
+        packed = msgpack.packb(
+            [{**document, "embedding": encode_vector(document["embedding"])} for document in documents],
+            use_bin_type=True
+        )
+        await self.redis.set(f"{self.key_prefix}result:{job_id}", packed, ex=self.ttl_seconds)
+
+    async def get_result(self, job_id: str) -> Optional[List[dict]]:
+        data = await self.redis.get(f"{self.key_prefix}result:{job_id}")
+        if data is None:
+            return None
+        return [{**document, "embedding": decode_vector(document["embedding"])} for document in msgpack.unpackb(data, raw=False)]
+
+    async def aclose(self):
+        await self.redis.aclose()
+
+
+def create_job_backend():
+    if settings.JOB_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("JOB_BACKEND=redis exige REDIS_URL configurada.")
+        import redis.asyncio as redis
+        return RedisJobBackend(
+            redis.from_url(settings.REDIS_URL),
+            ttl_seconds=settings.JOB_TTL_SECONDS,
+            lease_seconds=settings.JOB_LEASE_SECONDS
+        )
+    return InMemoryJobBackend()
+
+
+def job_id_for(request: DocumentProcessRequest) -> str:
+    """ID determinístico: reenviar o mesmo documento reaproveita o job em vez de refazer o trabalho."""
+    return hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()[:32]
+
+
+async def recover_stale_jobs(backend) -> List[str]:
+    """Devolve à fila os jobs de workers mortos e os marca como QUEUED."""
+    requeued = await backend.requeue_stale()
+    for job_id in requeued:
+        job = await backend.get(job_id)
+        if job is not None:
+            job.update(status=QUEUED, updated_at=_now())
+            await backend.save(job_id, job)
+        logger.warning(f"Job {job_id} sem lease (worker interrompido). Devolvido à fila.")
+    return requeued
+
+
+async def _reusable(backend, job: dict, request: DocumentProcessRequest) -> bool:
+    """
+    Um job existente só é reaproveitado se ainda estiver na fila ou rodando num worker vivo, ou
+    se tiver concluído a partir de conteúdo que está inteiro na requisição (entrada manual). Um
+    arquivo pode mudar no mesmo `url_arquivo`: o resultado concluído dele não é reaproveitado.
+    """
+    if job["status"] == RUNNING and not await backend.is_alive(job["job_id"]):
+        # Worker morreu: devolve a mensagem órfã à fila (se ela ainda estiver em `processing`)
+        await recover_stale_jobs(backend)
+        job.update(await backend.get(job["job_id"]) or {})
+    if job["status"] == QUEUED:
+        return True
+    if job["status"] == RUNNING:
+        return await backend.is_alive(job["job_id"])
+    return job["status"] == SUCCEEDED and not request.url_arquivo
+
+
+async def submit_job(backend, request: DocumentProcessRequest) -> dict:
+    """Enfileira o processamento do documento (ou retorna o job existente, se ainda valer)."""
+    job_id = job_id_for(request)
+    existing = await backend.get(job_id)
+    if existing and await _reusable(backend, existing, request):
+        logger.info(f"Job {job_id} já existe ({existing['status']}). Reaproveitando.")
+        return existing
+
+    job = {
+        "job_id": job_id,
+        "status": QUEUED,
+        "titulo": request.titulo,
+        "chunks_processed": 0,
+        "error": None,
+        "created_at": _now(),
+        "updated_at": _now()
+    }
+    await backend.save(job_id, job)
+    await backend.enqueue(job_id, request.model_dump())
+    logger.info(f"Job {job_id} enfileirado para o documento '{request.titulo}'.")
+    return job
+
+
+async def run_job(backend, job_id: str, payload: dict):
+    """Executa um job de ingestão, atualizando o progresso a cada chunk concluído."""
+    job = await backend.get(job_id) or {"job_id": job_id, "created_at": _now()}
+    attempts = job.get("attempts", 0) + 1
+    if attempts > settings.JOB_MAX_ATTEMPTS:
+        logger.error(f"Job {job_id} interrompido {attempts - 1} vez(es). Desistindo.")
+        job.update(status=FAILED, error="O processamento do documento foi interrompido repetidas vezes.", error_status_code=500, updated_at=_now())
+        await backend.save(job_id, job)
+        return
+    job.update(status=RUNNING, attempts=attempts, started_at=_now(), updated_at=_now(), chunks_processed=0, error=None)
+    await backend.save(job_id, job)
+
+    documents = []
+    try:
+        request = DocumentProcessRequest.model_validate(payload)
+        diff = await load_chunk_diff(request)
+        async for document in iter_processed_documents(request, diff):
+            documents.append(document)
+            job.update(chunks_processed=len(documents), updated_at=_now())
+            await backend.save(job_id, job)
+
+        await backend.set_result(job_id, documents)
+        job.update(status=SUCCEEDED, chunks=diff.summary(), finished_at=_now(), updated_at=_now())
+        logger.info(f"Job {job_id} concluído: {len(documents)} documento(s).")
+    except ValueError as e:
+        logger.warning(f"Erro de validação no job {job_id}: {e}")
+        job.update(status=FAILED, error=str(e), error_status_code=400, updated_at=_now())
+    except Exception:
+        logger.exception(f"Erro inesperado no job {job_id}")
+        job.update(status=FAILED, error="Ocorreu um erro inesperado no processamento do documento.", error_status_code=500, updated_at=_now())
+    await backend.save(job_id, job)
+
+
+async def _keep_alive(backend, job_id: str):
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        await backend.heartbeat(job_id)
+
+
+async def worker_loop(backend, stop: asyncio.Event, name: str = "worker"):
+    """Consome a fila de jobs até `stop` ser sinalizado, recuperando de tempos em tempos os órfãos."""
+    logger.info(f"[{name}] Aguardando jobs de ingestão...")
+    last_sweep = 0.0
+    while not stop.is_set():
+        if time.monotonic() - last_sweep >= settings.JOB_LEASE_SECONDS:
+            last_sweep = time.monotonic()
+            await recover_stale_jobs(backend)
+        item = await backend.dequeue(timeout=1.0)
+        if item is None:
+            continue
+        job_id, payload = item
+        logger.info(f"[{name}] Iniciando job {job_id}")
+        heartbeat = asyncio.create_task(_keep_alive(backend, job_id))
+        try:
+            await run_job(backend, job_id, payload)
+        finally:
+            heartbeat.cancel()
+            await backend.ack(job_id)
+
+
+job_backend = create_job_backend()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up():
+    """Inicializador dos processos: importa o Unstructured (e seus modelos/regex) uma única vez."""
+    import unstructured.partition.auto  # noqa: F401
+    import core.text_extraction  # noqa: F401
+
+
+def _ping() -> bool:
+    return True
+
+
+class PartitionPool:
+    """
+    Camada de processos para a parte CPU-bound da ingestão (partition do Unstructured e
+    extração dos chunks), para que o parsing de um PDF não congele o event loop da API.
+
+    - `workers` > 0: ProcessPoolExecutor (spawn) com `workers` processos já aquecidos;
+      `workers` = 0: executa numa thread (usado pelos processos de worker.py, que já são
+      dedicados à ingestão e não precisam de um segundo nível de processos).
+    - `max_concurrency`: jobs de extração em andamento (em execução ou na fila do pool);
+      os excedentes aguardam um slot sem ocupar memória dentro do executor.
+    - `timeout`: tempo máximo de cada job. Um processo que estoura o tempo não pode ser
+      interrompido pelo executor, então o pool é reciclado (processos encerrados e recriados).
+      Os outros documentos que estavam no pool reciclado não falham: são reenviados ao pool
+      novo (`resubmitted`). Cada pool tem uma geração, para que só o primeiro a notar a falha
+      de um pool o recicle.
+    """
+
+    def __init__(self, workers: int, max_concurrency: int, timeout: float):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.resubmitted = 0
+        self.in_flight = 0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up
+        )
+
+    async def start(self):
+        """Cria o pool e aquece todos os processos (import do Unstructured) antes do primeiro documento."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)))
+        logger.info(f"Pool de particionamento iniciado com {self.workers} processo(s).")
+
+    def _recycle(self, generation: int):
+        """
+        Encerra os processos do pool da geração `generation` (inclusive os travados) e cria um
+        pool novo. Se essa geração já foi reciclada (por outro documento), não faz nada.
+        """
+        if generation != self._generation:
+            return
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            # O executor não expõe como interromper uma tarefa em execução; encerrar os processos é a única forma.
+            # Sem cancel_futures: as tarefas pendentes recebem BrokenProcessPool e são reenviadas ao pool novo.
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False)
+        self._executor = self._create_executor()
+        self._generation += 1
+        self.restarts += 1
+
+    async def _run_in_pool(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        # Quando o pool quebra não dá para saber qual documento derrubou o processo: todos os que
+        # estavam nele são reenviados ao pool novo, até duas vezes. O culpado derruba os pools
+        # seguintes também e é o que esgota as tentativas.
+        resubmissions = 2
+        while True:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            generation = self._generation
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(self._executor, func, *args), self.timeout)
+            except asyncio.TimeoutError:
+                self._recycle(generation)
+                raise
+            except BrokenProcessPool:
+                if generation == self._generation:
+                    logger.warning("Processo do pool de particionamento encerrado inesperadamente. Recriando o pool.")
+                    self._recycle(generation)
+                if resubmissions <= 0:
+                    raise
+                resubmissions -= 1
+                self.resubmitted += 1
+
+    async def run(self, func: Callable, *args):
+        """Executa `func(*args)` no pool, respeitando o limite de concorrência e o timeout."""
+        if self._slots is None:
+            await self.start()
+
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                if self.workers <= 0:
+                    result = await asyncio.wait_for(asyncio.to_thread(func, *args), self.timeout)
+                else:
+                    result = await self._run_in_pool(func, *args)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error(f"Extração excedeu o limite de {self.timeout:g}s.")
+                raise TimeoutError(f"O processamento do arquivo excedeu o limite de {self.timeout:g}s.")
+            except BrokenProcessPool:
+                # O processo morreu em todas as tentativas deste documento (ex: falta de memória num PDF grande)
+                self.failed += 1
+                logger.exception("Documento derrubou o pool de particionamento em todas as tentativas.")
+                raise
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "resubmitted": self.resubmitted
+        }
+
+
+partition_pool = PartitionPool(
+    workers=settings.PARTITION_POOL_WORKERS,
+    max_concurrency=settings.PARTITION_MAX_CONCURRENCY,
+    timeout=settings.PARTITION_TIMEOUT_SECONDS
+)
@@ -0,0 +1,492 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+import uuid
+from typing import List, NamedTuple, Optional
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import PydanticOutputParser
+from sqlalchemy import text
+from config.database import async_engine
+from config.settings import settings
+from core.categorizer import AI_DESCRIPTION_PREFIX, label_text, pendency_categorizer
+from models.loader import embeddings_model, llm_categorizador
+from schemas.document import SugestaoIA, SugestoesIALote
+
+logger = logging.getLogger(__name__)
+
+_PARSER = PydanticOutputParser(pydantic_object=SugestoesIALote)
+
+_PROMPT = ChatPromptTemplate.from_messages([
+    ("human", """Você é um especialista em organização de base de conhecimento. Sua tarefa é analisar cada pergunta de usuário da lista abaixo e estruturá-la para um novo registro.
+    Siga o formato de saída JSON abaixo, com uma sugestão para cada pergunta, informando o número dela em "indice":
+    {format_instructions}
+
+    **Regras Mandatórias:**
+    1.  **Título:** Crie um breve descrição que resuma a pergunta.
+    2.  **Categoria:** Analise a pergunta e compare com a "Lista de Categorias Existentes".
+        - Se a pergunta se encaixar BEM em uma das categorias existentes, use EXATAMENTE o nome da categoria da lista.
+        - Se NENHUMA categoria existente for adequada, crie um NOME CURTO E CONCISO para uma NOVA categoria (1-3 palavras).
+    3.  **Subcategoria:** Crie um nome específico e detalhado para a subcategoria, representando o assunto exato da pergunta.
+        Perguntas sobre o mesmo assunto devem receber exatamente a mesma categoria e subcategoria.
+
+    **Lista de Categorias Existentes:**
+    `{lista_categorias}`
+
+    **Perguntas dos Usuários:**
+    {perguntas}
+    """)
+])
+
+# Tamanho máximo do título do assunto quando ele vem da própria pergunta (sem o LLM)
+_TITLE_MAX_CHARS = 120
+
+
+class _Assignment(NamedTuple):
+    titulo: str
+    categoria_nome: str
+    categoria_id: Optional[int]
+    subcategoria_nome: str
+    subcategoria_id: Optional[int]
+
+
+def _title_from_question(question: str) -> str:
+    title = " ".join(question.split())
+    return title if len(title) <= _TITLE_MAX_CHARS else title[:_TITLE_MAX_CHARS - 3].rstrip() + "..."
+
+
+def _description(question: str) -> str:
+    return f"{AI_DESCRIPTION_PREFIX}{question[:50]}..."
+
+
+async def suggest_categories(questions: List[str], categorias: List[str]) -> List[SugestaoIA]:
+    """
+    Categoriza várias perguntas numa única chamada ao llm_categorizador, na ordem da entrada.
+    Perguntas que o LLM deixar sem sugestão no lote são categorizadas individualmente.
+    """
+    logger.info(f"Invocando LLM para categorizar {len(questions)} pergunta(s).")
+    chain = _PROMPT | llm_categorizador | _PARSER
+    lote = await chain.ainvoke({
+        "format_instructions": _PARSER.get_format_instructions(),
+        "lista_categorias": ', '.join(categorias) if categorias else 'Nenhuma',
+        "perguntas": "\n".join(f"[{i}] {question}" for i, question in enumerate(questions, start=1))
+    })
+    by_index = {sugestao.indice: SugestaoIA(**sugestao.model_dump(exclude={"indice"})) for sugestao in lote.sugestoes}
+
+    missing = [i for i in range(1, len(questions) + 1) if i not in by_index]
+    if missing and len(questions) > 1:
+        logger.warning(f"LLM não retornou sugestão para {len(missing)} pergunta(s) do lote. Categorizando individualmente.")
+        for i in missing:
+            by_index[i] = (await suggest_categories([questions[i - 1]], categorias))[0]
+    elif missing:
+        raise ValueError("O LLM não retornou sugestão para a pergunta.")
+    return [by_index[i] for i in range(1, len(questions) + 1)]
+
+
+class InMemoryPendencyQueue:
+    """Fila em memória (um único processo). Usada em testes e desenvolvimento."""
+
+    backend = "memory"
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def put(self, item: dict):
+        await self._queue.put(item)
+
+    async def take_batch(self, max_size: int, max_wait: float, timeout: float = 1.0) -> List[dict]:
+        """Espera até `timeout` pelo primeiro item; depois, junta até `max_size` itens ou `max_wait` segundos."""
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and self._queue.empty():
+                break
+            try:
+                batch.append(self._queue.get_nowait() if not self._queue.empty() else await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    # Num único processo a fila não sobrevive ao worker: não há lease a renovar nem órfãos a recuperar
+    async def heartbeat(self, batch: List[dict]):
+        pass
+
+    async def ack(self, batch: List[dict]):
+        pass
+
+    async def requeue_stale(self) -> List[dict]:
+        return []
+
+    def depth(self) -> Optional[int]:
+        return self._queue.qsize()
+
+    async def aclose(self):
+        pass
+
+
+class RedisPendencyQueue:
+    """
+    Fila compartilhada no Redis: qualquer worker da API pode consumir. Como na fila de jobs
+    (core/jobs.py), o BLMOVE move cada mensagem para a lista `processing`, de onde ela só sai
+    no `ack`, depois que o lote foi gravado; enquanto o lote roda, o worker renova um lease por
+    mensagem (`heartbeat`). Se o worker morrer, o lease expira e `requeue_stale` devolve as
+    mensagens à fila.
+    """
+
+    backend = "redis"
+
+    def __init__(self, redis_client, key_prefix: str = "ai_pendencies:", lease_seconds: int = 60):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.lease_seconds = lease_seconds
+        self._queue = f"{key_prefix}queue"
+        self._processing = f"{key_prefix}processing"
+        # Mensagem bruta de cada item em processamento neste worker, para o LREM do ack
+        self._messages: dict = {}
+
+    def _lease_key(self, message_id: str) -> str:
+        return f"{self.key_prefix}lease:{message_id}"
+
+    def _unleased_key(self, message_id: str) -> str:
+        return f"{self.key_prefix}unleased:{message_id}"
+
+    async def put(self, item: dict):
+        await self.redis.lpush(self._queue, json.dumps({**item, "message_id": uuid.uuid4().hex}))
+
+    async def take_batch(self, max_size: int, max_wait: float, timeout: float = 1.0) -> List[dict]:
+        raw = await self.redis.blmove(self._queue, self._processing, max(timeout, 0.01), "RIGHT", "LEFT")
+        if raw is None:
+            return []
+        raws = [raw]
+        deadline = time.monotonic() + max_wait
+        while len(raws) < max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raw = await self.redis.lmove(self._queue, self._processing, "RIGHT", "LEFT")
+            else:
+                raw = await self.redis.blmove(self._queue, self._processing, remaining, "RIGHT", "LEFT")
+            if raw is None:
+                break
+            raws.append(raw)
+        batch = [json.loads(raw) for raw in raws]
+        for item, raw in zip(batch, raws):
+            self._messages[item["message_id"]] = raw
+        await self.heartbeat(batch)
+        return batch
+
+    async def heartbeat(self, batch: List[dict]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for item in batch:
+                pipe.set(self._lease_key(item["message_id"]), 1, ex=self.lease_seconds)
+            await pipe.execute()
+
+    async def ack(self, batch: List[dict]):
+        for item in batch:
+            raw = self._messages.pop(item["message_id"], None)
+            if raw is not None:
+                await self.redis.lrem(self._processing, 1, raw)
+            await self.redis.delete(self._lease_key(item["message_id"]))
+
+    async def _in_grace(self, message_id: str) -> bool:
+        """
+        O lease é gravado logo depois do BLMOVE, numa segunda ida ao Redis: uma mensagem sem lease
+        só é dada como órfã depois de passar `lease_seconds` assim, contados da primeira varredura
+        que a encontrou sem lease.
+        """
+        now = time.time()
+        key = self._unleased_key(message_id)
+        await self.redis.set(key, now, nx=True, ex=self.lease_seconds * 3)
+        first_seen = await self.redis.get(key)
+        return first_seen is not None and now - float(first_seen) < self.lease_seconds
+
+    async def requeue_stale(self) -> List[dict]:
+        """Devolve à fila as mensagens em `processing` cujo lease expirou (worker morto)."""
+        requeued = []
+        for raw in await self.redis.lrange(self._processing, 0, -1):
+            item = json.loads(raw)
+            message_id = item["message_id"]
+            if await self.redis.exists(self._lease_key(message_id)) or await self._in_grace(message_id):
+                continue
+            # Vários workers podem varrer ao mesmo tempo: só quem remover a mensagem a devolve
+            if await self.redis.lrem(self._processing, 1, raw):
+                await self.redis.rpush(self._queue, raw)
+                await self.redis.delete(self._unleased_key(message_id))
+                requeued.append(item)
+        return requeued
+
+    def depth(self) -> Optional[int]:
+        return None
+
+    async def aclose(self):
+        await self.redis.aclose()
+
+
+def create_pendency_queue():
+    """
+    Fila configurada em PENDENCY_QUEUE_BACKEND, ou None para gravar de forma síncrona.
+    Sem uma fila durável ("auto" sem REDIS_URL) o endpoint não enfileira: a pergunta só
+    é aceita depois que o assunto pendente está gravado, e nada se perde num restart.
+    """
+    backend = settings.PENDENCY_QUEUE_BACKEND
+    if backend == "auto":
+        backend = "redis" if settings.REDIS_URL else "sync"
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("PENDENCY_QUEUE_BACKEND=redis exige REDIS_URL configurada.")
+        import redis.asyncio as redis
+        return RedisPendencyQueue(redis.from_url(settings.REDIS_URL), lease_seconds=settings.PENDENCY_LEASE_SECONDS)
+    if backend == "memory":
+        return InMemoryPendencyQueue()
+    return None
+
+
+class PendencyProcessor:
+    """
+    Criação dos assuntos pendentes em lotes, fora do ciclo da requisição: o endpoint só
+    enfileira a pergunta (`submit`) e o worker (`run`) consome a fila em lotes de até
+    `batch_size` perguntas (ou o que chegar em `flush_seconds`). Para cada lote:
+    1. descarta consultas repetidas ou que já têm assunto pendente (reentrega após falha);
+    2. atribui pelo vizinho mais próximo (core/categorizer.py) as perguntas de assuntos já
+       existentes; as demais vão todas num único prompt ao llm_categorizador;
+    3. grava categorias, subcategorias e assuntos pendentes com inserts em lote, numa
+       transação curta (nenhuma chamada externa com a transação aberta).
+    Se o lote falha, as perguntas são reprocessadas uma a uma, para que um item ruim não
+    derrube os demais; só as que falharem sozinhas voltam para a fila, até `max_attempts`
+    tentativas por pergunta. Sem fila (`queue` None), `submit` grava a pergunta na hora.
+    O lote só é confirmado na fila (`ack`) depois de tratado; enquanto roda, o lease das suas
+    mensagens é renovado a cada `lease_seconds / 3`, e a cada `lease_seconds` o worker devolve
+    à fila as mensagens de workers mortos.
+    """
+
+    def __init__(self, queue, batch_size: int, flush_seconds: float, max_attempts: int, lease_seconds: float = 60):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.enqueued = 0
+        self.batches = 0
+        self.created = 0
+        self.skipped = 0
+        self.llm_calls = 0
+        self.llm_questions = 0
+        self.retried = 0
+        self.dropped = 0
+        self.split_batches = 0
+        self.recovered = 0
+        self.last_batch_ms = 0.0
+
+    async def submit(self, question: str, consulta_id: int) -> bool:
+        """Enfileira a pergunta; sem fila, grava o assunto pendente na hora. Retorna se enfileirou."""
+        item = {"question": question, "consulta_id": consulta_id, "attempts": 0}
+        if self.queue is None:
+            await self.process_batch([item])
+            return False
+        await self.queue.put(item)
+        self.enqueued += 1
+        return True
+
+    async def _assign(self, pending: List[dict]) -> List[_Assignment]:
+        enabled = settings.PENDENCY_CATEGORIZER_ENABLED
+        questions = [item["question"] for item in pending]
+        vectors = await embeddings_model.aembed_queries(questions) if enabled else [None] * len(pending)
+
+        assignments: List[Optional[_Assignment]] = [None] * len(pending)
+        to_llm = []
+        for i, vector in enumerate(vectors):
+            match = pendency_categorizer.match(vector) if enabled else None
+            if match is None:
+                to_llm.append(i)
+                continue
+            assignments[i] = _Assignment(_title_from_question(questions[i]), match.categoria_nome, match.categoria_id,
+                                         match.subcategoria_nome, match.subcategoria_id)
+        if not to_llm:
+            return assignments
+
+        sugestoes = await suggest_categories([questions[i] for i in to_llm], list(pendency_categorizer.categories.values()))
+        self.llm_calls += 1
+        self.llm_questions += len(to_llm)
+        for i, sugestao in zip(to_llm, sugestoes):
+            categoria = sugestao.categoria_sugerida.strip()
+            assignments[i] = _Assignment(sugestao.titulo_sugerido, categoria, pendency_categorizer.category_id(categoria),
+                                         sugestao.subcategoria_sugerida.strip(), None)
+
+        # Subcategoria sugerida quase idêntica a uma existente da mesma categoria: reaproveita
+        existing = [i for i in to_llm if assignments[i].categoria_id is not None]
+        if enabled and existing:
+            labels = [label_text(assignments[i].categoria_nome, assignments[i].subcategoria_nome) for i in existing]
+            for i, vector in zip(existing, await embeddings_model.aembed_queries(labels)):
+                duplicate = pendency_categorizer.duplicate_of(assignments[i].subcategoria_nome, vector, assignments[i].categoria_id)
+                if duplicate is not None:
+                    assignments[i] = assignments[i]._replace(subcategoria_nome=duplicate.subcategoria_nome, subcategoria_id=duplicate.subcategoria_id)
+        return assignments
+
+    async def process_batch(self, items: List[dict]) -> int:
+        """Categoriza e grava um lote. Retorna quantos assuntos pendentes foram criados."""
+        start = time.perf_counter()
+        unique = list({item["consulta_id"]: item for item in items}.values())
+        async with async_engine.connect() as connection:
+            done = set((await connection.execute(
+                text("SELECT consulta_id FROM assuntos_pendentes WHERE consulta_id = ANY(:ids)"),
+                {"ids": [item["consulta_id"] for item in unique]}
+            )).scalars().all())
+            await pendency_categorizer.refresh(connection, embeddings_model.aembed_queries)
+        pending = [item for item in unique if item["consulta_id"] not in done]
+        self.skipped += len(items) - len(pending)
+        if not pending:
+            return 0
+
+        assignments = await self._assign(pending)
+        await self._write(pending, assignments)
+        self.batches += 1
+        self.created += len(pending)
+        self.last_batch_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Lote de assuntos pendentes gravado: {len(pending)} assunto(s) em {self.last_batch_ms:.0f} ms.")
+        return len(pending)
+
+    async def _write(self, pending: List[dict], assignments: List[_Assignment]):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        async with async_engine.begin() as connection:
+            # Categorias novas (sem repetir nomes sugeridos para mais de uma pergunta do lote)
+            new_categories = {}
+            for item, assignment in zip(pending, assignments):
+                if assignment.categoria_id is None:
+                    new_categories.setdefault(assignment.categoria_nome.lower(), (assignment.categoria_nome, _description(item["question"])))
+            if new_categories:
+                rows = (await connection.execute(text("""
+                    INSERT INTO categorias (nome, descricao, "createdAt", "updatedAt")
+                    SELECT nome, descricao, :now, :now FROM unnest(CAST(:nomes AS text[]), CAST(:descricoes AS text[])) AS n(nome, descricao)
+                    RETURNING id, nome
+                """), {"nomes": [nome for nome, _ in new_categories.values()],
+                       "descricoes": [descricao for _, descricao in new_categories.values()], "now": now})).all()
+                category_ids = {row.nome.lower(): row.id for row in rows}
+                assignments = [a if a.categoria_id is not None else a._replace(categoria_id=category_ids[a.categoria_nome.lower()])
+                               for a in assignments]
+                logger.info(f"Novas categorias criadas: {[row.nome for row in rows]}")
+
+            new_subcategories = {}
+            for item, assignment in zip(pending, assignments):
+                if assignment.subcategoria_id is None:
+                    key = (assignment.categoria_id, assignment.subcategoria_nome.lower())
+                    new_subcategories.setdefault(key, (assignment.subcategoria_nome, _description(item["question"])))
+            if new_subcategories:
+                rows = (await connection.execute(text("""
+                    INSERT INTO subcategorias (categoria_id, nome, descricao, "createdAt", "updatedAt")
+                    SELECT categoria_id, nome, descricao, :now, :now
+                    FROM unnest(CAST(:categorias AS integer[]), CAST(:nomes AS text[]), CAST(:descricoes AS text[])) AS s(categoria_id, nome, descricao)
+                    RETURNING id, categoria_id, nome
+                """), {"categorias": [categoria_id for categoria_id, _ in new_subcategories],
+                       "nomes": [nome for nome, _ in new_subcategories.values()],
+                       "descricoes": [descricao for _, descricao in new_subcategories.values()], "now": now})).all()
+                subcategory_ids = {(row.categoria_id, row.nome.lower()): row.id for row in rows}
+                assignments = [a if a.subcategoria_id is not None else a._replace(subcategoria_id=subcategory_ids[(a.categoria_id, a.subcategoria_nome.lower())])
+                               for a in assignments]
+                logger.info(f"Novas subcategorias criadas: {[row.nome for row in rows]}")
+
+            await connection.execute(text("""
+                INSERT INTO assuntos_pendentes (consulta_id, texto_assunto, datahora_sugestao, subcategoria_id, "createdAt", "updatedAt")
+                SELECT consulta_id, texto_assunto, :now, subcategoria_id, :now, :now
+                FROM unnest(CAST(:consultas AS integer[]), CAST(:titulos AS text[]), CAST(:subcategorias AS integer[])) AS p(consulta_id, texto_assunto, subcategoria_id)
+            """), {"consultas": [item["consulta_id"] for item in pending], "titulos": [a.titulo for a in assignments],
+                   "subcategorias": [a.subcategoria_id for a in assignments], "now": now})
+
+    async def _retry(self, item: dict):
+        attempts = item.get("attempts", 0) + 1
+        if attempts < self.max_attempts:
+            await self.queue.put({**item, "attempts": attempts})
+            self.retried += 1
+        else:
+            logger.error(f"Assunto pendente da consulta {item['consulta_id']} descartado após {attempts} tentativas.")
+            self.dropped += 1
+
+    async def _handle(self, batch: List[dict]):
+        try:
+            await self.process_batch(batch)
+            return
+        except Exception:
+            logger.exception(f"Falha ao processar um lote de {len(batch)} assunto(s) pendente(s).")
+        if len(batch) == 1:
+            await self._retry(batch[0])
+            return
+        # O lote é gravado numa única transação: nada dele foi salvo. Cada pergunta é
+        # reprocessada sozinha, e só as que falharem de novo contam uma tentativa.
+        self.split_batches += 1
+        for item in batch:
+            try:
+                await self.process_batch([item])
+            except Exception:
+                logger.exception(f"Falha ao processar o assunto pendente da consulta {item['consulta_id']}.")
+                await self._retry(item)
+
+    async def aclose(self):
+        if self.queue is not None:
+            await self.queue.aclose()
+
+    async def _keep_alive(self, batch: List[dict]):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self.queue.heartbeat(batch)
+
+    async def _consume(self, batch: List[dict]):
+        heartbeat = asyncio.create_task(self._keep_alive(batch))
+        try:
+            await self._handle(batch)
+        finally:
+            heartbeat.cancel()
+        # Sem ack (o worker caiu no meio do lote), as mensagens voltam à fila quando o lease expirar
+        await self.queue.ack(batch)
+
+    async def recover_stale(self) -> int:
+        requeued = await self.queue.requeue_stale()
+        if requeued:
+            logger.warning(f"{len(requeued)} assunto(s) pendente(s) sem lease (worker interrompido). Devolvido(s) à fila.")
+        self.recovered += len(requeued)
+        return len(requeued)
+
+    async def run(self, stop: asyncio.Event, name: str = "pendency-worker"):
+        """Consome a fila até `stop` ser sinalizado; depois, processa o que ainda estiver na fila."""
+        if self.queue is None:
+            return
+        logger.info(f"[{name}] Aguardando assuntos pendentes...")
+        last_sweep = 0.0
+        while not stop.is_set():
+            if time.monotonic() - last_sweep >= self.lease_seconds:
+                last_sweep = time.monotonic()
+                await self.recover_stale()
+            batch = await self.queue.take_batch(self.batch_size, self.flush_seconds)
+            if batch:
+                await self._consume(batch)
+        while batch := await self.queue.take_batch(self.batch_size, 0, timeout=0.01):
+            await self._consume(batch)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.queue.backend if self.queue is not None else "sync",
+            "queue_depth": self.queue.depth() if self.queue is not None else None,
+            "enqueued": self.enqueued,
+            "batches": self.batches,
+            "created": self.created,
+            "avg_batch_size": self.created / self.batches if self.batches else 0.0,
+            "skipped_duplicates": self.skipped,
+            "llm_calls": self.llm_calls,
+            "llm_questions": self.llm_questions,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "split_batches": self.split_batches,
+            "recovered": self.recovered,
+            "last_batch_ms": round(self.last_batch_ms, 1)
+        }
+
+
+pendency_processor = PendencyProcessor(
+    create_pendency_queue(),
+    batch_size=settings.PENDENCY_BATCH_SIZE,
+    flush_seconds=settings.PENDENCY_FLUSH_SECONDS,
+    max_attempts=settings.PENDENCY_MAX_ATTEMPTS,
+    lease_seconds=settings.PENDENCY_LEASE_SECONDS
+)
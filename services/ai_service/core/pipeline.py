@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, List
+
+
+class StagedExecutor:
+    """
+    Executor das etapas de um pipeline (ex: /api/ask). Etapas independentes podem ser
+    iniciadas em paralelo com `start` e aguardadas com `result`; etapas cujo resultado
+    deixou de ser necessário (perdedoras de uma especulação) são canceladas com `cancel`.
+    Registra a duração de cada etapa para o detalhamento de latência.
+
+    Deve ser usado como context manager assíncrono, para que nenhuma task fique órfã.
+    """
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._created = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.cancelled: List[str] = []
+
+    async def __aenter__(self) -> "StagedExecutor":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _timed(self, name: str, stage: Awaitable) -> Any:
+        start = time.perf_counter()
+        try:
+            return await stage
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+
+    def start(self, name: str, stage: Awaitable) -> asyncio.Task:
+        """Inicia uma etapa em segundo plano."""
+        task = asyncio.create_task(self._timed(name, stage), name=name)
+        self._tasks[name] = task
+        return task
+
+    def has(self, name: str) -> bool:
+        return name in self._tasks
+
+    async def result(self, name: str) -> Any:
+        """Aguarda o resultado de uma etapa iniciada com `start`."""
+        return await self._tasks[name]
+
+    async def run(self, name: str, stage: Awaitable) -> Any:
+        """Executa uma etapa em primeiro plano (sequencial), registrando sua duração."""
+        return await self._timed(name, stage)
+
+    def cancel(self, *names: str):
+        for name in names:
+            task = self._tasks.get(name)
+            if task is not None and not task.done():
+                task.cancel()
+                self.cancelled.append(name)
+
+    def cancel_pending(self):
+        self.cancel(*self._tasks)
+
+    async def aclose(self):
+        """Cancela as etapas pendentes e aguarda o término de todas (inclusive falhas não lidas)."""
+        self.cancel_pending()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._created) * 1000
+
+    def breakdown(self) -> dict:
+        return {
+            "stages_ms": {name: round(ms, 1) for name, ms in self.timings.items()},
+            "cancelled": list(self.cancelled),
+            "total_ms": round(self.total_ms(), 1)
+        }
+
+    def server_timing(self) -> str:
+        """Detalhamento no formato do cabeçalho HTTP Server-Timing."""
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.timings.items()]
+        entries.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(entries)
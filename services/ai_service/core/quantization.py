@@ -0,0 +1,101 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from config.settings import settings
+from core.vector_index import VECTOR_INDEXES, build_index_ddl, version_tuple
+
+logger = logging.getLogger(__name__)
+
+# Cópias quantizadas do embedding, indexadas como expressão sobre a própria coluna (o banco as
+# calcula na escrita; não há coluna nova para manter sincronizada):
+# - halfvec: float16, metade do tamanho, mesma distância de cosseno;
+# - bit: 1 bit por dimensão (o sinal), 1/32 do tamanho, distância de Hamming.
+# Em ambos os casos o índice só pré-seleciona candidatos: a ordem final é a distância exata.
+# Por modo: (expressão sobre a coluna, expressão sobre o parâmetro :q_vector, operador, classe de operadores)
+_QUANTIZED = {
+    "halfvec": ("({column}::halfvec({dimension}))", "(:q_vector)::vector::halfvec({dimension})", "<=>", "halfvec_cosine_ops"),
+    "bit": ("(binary_quantize({column})::bit({dimension}))", "binary_quantize((:q_vector)::vector)::bit({dimension})", "<~>", "bit_hamming_ops"),
+}
+
+# Versão do pgvector que introduziu halfvec, binary_quantize e os índices sobre bit
+_MIN_VERSION = (0, 7)
+
+
+def quantized_expression(column: str, quantization: str) -> str:
+    """Expressão indexada (e usada no ORDER BY da pré-seleção) para `column`."""
+    return _QUANTIZED[quantization][0].format(column=column, dimension=settings.EMBEDDING_DIMENSION)
+
+
+def quantized_opclass(quantization: str) -> str:
+    return _QUANTIZED[quantization][3]
+
+
+def quantized_distance(column: str, quantization: str) -> str:
+    _, query, operator, _ = _QUANTIZED[quantization]
+    return f"{quantized_expression(column, quantization)} {operator} {query.format(dimension=settings.EMBEDDING_DIMENSION)}"
+
+
+def quantized_index_name(table: str, column: str, method: str, quantization: str) -> str:
+    return f"{table}_{column}_{method}_{quantization}_idx"
+
+
+def candidate_source(table: str, where: str, quantization: str, alias: str = "d") -> tuple:
+    """
+    (FROM, WHERE) da busca vetorial. Sem quantização, a própria tabela. Com quantização, os
+    :rescore_limit documentos mais próximos na cópia quantizada (pelo índice), unidos de volta à
+    tabela para que a consulta externa ordene pela distância exata do embedding completo.
+    """
+    if quantization == "none":
+        return f"{table} {alias}", where
+    return f"""(
+                SELECT {alias}.id FROM {table} {alias}
+                WHERE {where}
+                ORDER BY {quantized_distance(f'{alias}.embedding', quantization)}
+                LIMIT :rescore_limit
+            ) candidatos
+            JOIN {table} {alias} ON {alias}.id = candidatos.id""", "true"
+
+
+def rescore_limit(limit: int) -> int:
+    """Candidatos trazidos da cópia quantizada para re-pontuação exata."""
+    return max(limit, settings.QUANTIZED_CANDIDATES)
+
+
+async def ensure_quantized_indexes(engine: AsyncEngine):
+    """
+    Cria (CONCURRENTLY) os índices ANN sobre a cópia quantizada de cada coluna de embedding
+    (VECTOR_INDEXES), quando VECTOR_QUANTIZATION estiver ativo. A construção percorre as linhas
+    existentes (é o backfill); as novas entram no índice na própria escrita. Um índice de
+    precisão completa que já exista deixa de ser usado e pode ser removido para liberar memória.
+    """
+    quantization, method = settings.VECTOR_QUANTIZATION, settings.VECTOR_INDEX_TYPE
+    if quantization == "none" or method == "none":
+        return
+
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        version = (await connection.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))).scalar()
+        if version_tuple(version) < _MIN_VERSION:
+            logger.error(f"VECTOR_QUANTIZATION={quantization} requer pgvector >= 0.7 (instalado: {version}). "
+                         f"Os índices quantizados não serão criados e as buscas farão varredura sequencial.")
+            return
+
+        await connection.execute(text("SELECT pg_advisory_lock(hashtext('ai_service_vector_indexes'))"))
+        try:
+            for table, column in VECTOR_INDEXES:
+                name = quantized_index_name(table, column, method, quantization)
+                valid = (await connection.execute(text("""
+                    SELECT ix.indisvalid FROM pg_index ix JOIN pg_class i ON i.oid = ix.indexrelid WHERE i.relname = :name
+                """), {"name": name})).scalar()
+                if valid:
+                    continue
+                if valid is False:
+                    logger.warning(f"Índice quantizado '{name}' está inválido. Recriando...")
+                    await connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+                logger.info(f"Criando índice {method} ({quantization}) em {table}.{column}...")
+                await connection.execute(text(build_index_ddl(
+                    table, quantized_expression(column, quantization), method, quantized_opclass(quantization), name
+                )))
+                logger.info(f"Índice '{name}' criado com sucesso.")
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(hashtext('ai_service_vector_indexes'))"))
@@ -0,0 +1,147 @@
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Sequence
+from config.settings import settings
+from core.tokenization import normalize_terms
+
+# Palavras que apontam para algo dito antes (pronomes, demonstrativos, advérbios de lugar).
+# Comparadas sem acentos e em minúsculas; muitas delas são stopwords em normalize_terms.
+_DEIXIS = frozenset("""
+    isso isto aquilo esse essa esses essas este esta estes estas aquele aquela aqueles aquelas
+    disso disto daquilo desse dessa desses dessas deste desta destes destas daquele daquela
+    nisso nisto naquilo nesse nessa nesses nessas neste nesta nestes nestas naquele naquela
+    ele ela eles elas dele dela deles delas nele nela neles nelas
+    anterior anteriores acima ali la ai outro outra outros outras
+    mesmo mesma mesmos mesmas
+""".split())
+# Locuções que retomam o contexto sem nenhuma palavra de _DEIXIS ("no caso de rejeição"). "Caso"
+# sozinho não entra: "em caso de erro" e o "caso" condicional não dependem do histórico
+_DEICTIC_PHRASES = re.compile(r"\bno caso\b")
+# Expressões fixas com palavras de _DEIXIS que não retomam nada ("vários produtos ao mesmo tempo")
+_IDIOMS = re.compile(r"\bao mesmo tempo\b")
+# Início típico de continuação: "e sobre...", "mas e se...", "também...", "então..."
+_CONTINUATION = re.compile(r"^(e|mas|entao|tambem|alem disso)\s")
+# Pronome oblíquo ligado ao verbo: "configurá-lo", "enviá-las"
+_CLITIC = re.compile(r"\w-(o|a|os|as|lo|la|los|las|no|na|nos|nas|lhe|lhes)\b")
+_WORDS = re.compile(r"\w+(?:-\w+)*")
+
+
+def _plain(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+
+class RewriteDecision(NamedTuple):
+    rewrite: bool
+    reason: str  # "continuation", "deixis", "short", "restated" ou "self_contained"
+
+
+def classify(question: str, previous_question: Optional[str], min_terms: int, overlap_threshold: float) -> RewriteDecision:
+    """
+    Decide, só com regras léxicas, se a pergunta depende do histórico:
+    - começa como continuação ("e sobre...", "mas...") -> reescreve;
+    - tem pronome/demonstrativo ou oblíquo ("isso", "dele", "o mesmo", "no caso", "configurá-lo") -> reescreve, a não ser
+      que repita o assunto da pergunta anterior (fração dos seus termos presentes nela
+      >= `overlap_threshold`);
+    - tem menos de `min_terms` termos relevantes ("qual o procedimento?") -> reescreve;
+    - senão a pergunta é autossuficiente e segue sem passar pelo LLM.
+    """
+    plain = _plain(question)
+    if _CONTINUATION.match(plain):
+        return RewriteDecision(True, "continuation")
+
+    terms = normalize_terms(question)
+    words = _IDIOMS.sub(" ", plain)
+    if _CLITIC.search(plain) or _DEICTIC_PHRASES.search(words) or any(word in _DEIXIS for word in _WORDS.findall(words)):
+        if previous_question and len(terms) >= min_terms:
+            previous = set(normalize_terms(previous_question))
+            if sum(term in previous for term in terms) / len(terms) >= overlap_threshold:
+                return RewriteDecision(False, "restated")
+        return RewriteDecision(True, "deixis")
+
+    if len(terms) < min_terms:
+        return RewriteDecision(True, "short")
+    return RewriteDecision(False, "self_contained")
+
+
+def history_digest(history: str) -> str:
+    return hashlib.sha1(history.encode("utf-8")).hexdigest()
+
+
+class RewriteGate:
+    """
+    Evita a chamada de reescrita ao LLM quando ela não muda nada: o pré-classificador léxico
+    (`classify`) libera as perguntas autossuficientes direto para a busca, e as reescritas
+    feitas pelo LLM ficam num cache LRU limitado, com chave (digest do histórico, pergunta).
+    """
+
+    def __init__(self, enabled: bool, min_terms: int, overlap_threshold: float, cache_max_entries: int):
+        self.enabled = enabled
+        self.min_terms = min_terms
+        self.overlap_threshold = overlap_threshold
+        self.cache_max_entries = cache_max_entries
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self.decisions = 0
+        self.skipped = 0
+        self.reasons: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def decide(self, question: str, previous_questions: Sequence[str]) -> RewriteDecision:
+        if not self.enabled:
+            return RewriteDecision(True, "disabled")
+        decision = classify(question, previous_questions[-1] if previous_questions else None, self.min_terms, self.overlap_threshold)
+        self.decisions += 1
+        self.skipped += not decision.rewrite
+        self.reasons[decision.reason] = self.reasons.get(decision.reason, 0) + 1
+        return decision
+
+    @staticmethod
+    def cache_key(history: str, question: str) -> tuple:
+        return history_digest(history), " ".join(question.split())
+
+    def get(self, key: tuple) -> Optional[str]:
+        if self.cache_max_entries <= 0:
+            return None
+        rewritten = self._cache.get(key)
+        if rewritten is None:
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return rewritten
+
+    def put(self, key: tuple, rewritten: str):
+        if self.cache_max_entries <= 0:
+            return
+        self._cache[key] = rewritten
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "decisions": self.decisions,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.decisions if self.decisions else 0.0,
+            "reasons": dict(self.reasons),
+            "cache_entries": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+            "cache_evictions": self.evictions
+        }
+
+
+rewrite_gate = RewriteGate(
+    enabled=settings.REWRITE_GATE_ENABLED,
+    min_terms=settings.REWRITE_MIN_TERMS,
+    overlap_threshold=settings.REWRITE_OVERLAP_THRESHOLD,
+    cache_max_entries=settings.REWRITE_CACHE_MAX_ENTRIES
+)
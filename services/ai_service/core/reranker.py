@@ -0,0 +1,102 @@
+import math
+from collections import Counter
+from typing import List, Sequence
+from config.settings import settings
+from core.tokenization import normalize_terms
+
+# Peso de cada campo no documento indexado pelo BM25 (repetição dos termos do campo)
+FIELD_WEIGHTS = {"titulo": 3, "palavras_chave": 2, "descricao": 1, "solucao": 1}
+
+
+def _document_terms(doc) -> Counter:
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = doc.get(field)
+        if not value:
+            continue
+        for term in normalize_terms(value if isinstance(value, str) else ", ".join(value)):
+            counts[term] += weight
+    return counts
+
+
+def bm25_scores(query_terms: Sequence[str], documents: Sequence[Counter], k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """
+    BM25 da consulta sobre cada documento. As estatísticas (IDF, tamanho médio) vêm dos
+    próprios candidatos: é uma re-ordenação local, sem índice invertido da base inteira.
+    """
+    if not documents:
+        return []
+    lengths = [sum(counts.values()) for counts in documents]
+    average_length = (sum(lengths) / len(lengths)) or 1.0
+    total = len(documents)
+
+    scores = [0.0] * total
+    for term in set(query_terms):
+        frequency = sum(1 for counts in documents if term in counts)
+        if not frequency:
+            continue
+        idf = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+        for index, counts in enumerate(documents):
+            tf = counts.get(term, 0)
+            if tf:
+                scores[index] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[index] / average_length))
+    return scores
+
+
+def reciprocal_rank_fusion(*rankings: Sequence[int], k: int = 60) -> List[float]:
+    """RRF: soma de 1 / (k + posição) de cada item em cada ranking (listas de índices, melhor primeiro)."""
+    fused = [0.0] * max((len(ranking) for ranking in rankings), default=0)
+    for ranking in rankings:
+        for position, index in enumerate(ranking, start=1):
+            fused[index] += 1.0 / (k + position)
+    return fused
+
+
+class Reranker:
+    """
+    Re-ordena os candidatos da busca vetorial com um pontuador léxico local (CPU, sem rede):
+    - "bm25": apenas o BM25 sobre título/descrição/solução/palavras-chave;
+    - "rrf": fusão por posição (Reciprocal Rank Fusion) do BM25 com a similaridade vetorial.
+    """
+
+    def __init__(self, fusion: str, rrf_k: int):
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.requests = 0
+        self.candidates = 0
+        self.promoted = 0
+
+    def rerank(self, question: str, candidates: Sequence, top_k: int) -> List[dict]:
+        """Retorna os `top_k` melhores candidatos (como dicts, com `rerank_score`), do melhor para o pior."""
+        documents = [dict(candidate) for candidate in candidates]
+        if not documents:
+            return []
+
+        lexical = bm25_scores(normalize_terms(question), [_document_terms(doc) for doc in documents])
+        if self.fusion == "bm25":
+            scores = lexical
+        else:
+            vector_ranking = sorted(range(len(documents)), key=lambda i: documents[i]["similarity"] or 0.0, reverse=True)
+            lexical_ranking = sorted(range(len(documents)), key=lambda i: lexical[i], reverse=True)
+            scores = reciprocal_rank_fusion(vector_ranking, lexical_ranking, k=self.rrf_k)
+
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)[:top_k]
+        self.requests += 1
+        self.candidates += len(documents)
+        # Quantos dos escolhidos não estavam no top_k original da busca vetorial
+        self.promoted += sum(1 for i in order if i >= top_k)
+        for i in order:
+            documents[i]["rerank_score"] = scores[i]
+        return [documents[i] for i in order]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.RERANK_ENABLED,
+            "fusion": self.fusion,
+            "requests": self.requests,
+            "avg_candidates": round(self.candidates / self.requests, 1) if self.requests else 0.0,
+            "promoted_from_overfetch": self.promoted
+        }
+
+
+reranker = Reranker(fusion=settings.RERANK_FUSION, rrf_k=settings.RERANK_RRF_K)
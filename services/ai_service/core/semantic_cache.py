@@ -0,0 +1,395 @@
+import asyncio
+import itertools
+import logging
+import math
+import statistics
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from typing import Optional
+import msgpack
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from config.settings import settings
+from core.vector_codec import decode_vector, encode_vector
+
+logger = logging.getLogger(__name__)
+
+# Motivos de remoção de uma entrada, reportados nas métricas
+EVICTED, EXPIRED, SOURCE_CHANGED, NEGATIVE_FEEDBACK = "evicted", "expired", "source_changed", "negative_feedback"
+
+
+class _Entry:
+    __slots__ = ("key", "vector", "subcategoria_id", "answer", "source_document_id", "source_version",
+                 "created_at", "hits", "signatures")
+
+    def __init__(self, key: int, vector: np.ndarray, subcategoria_id: Optional[int], answer: dict, signatures: tuple,
+                 source_version=None):
+        self.key = key
+        self.vector = vector
+        self.subcategoria_id = subcategoria_id
+        self.answer = answer
+        self.source_document_id = answer.get("source_document_id")
+        # "updatedAt" do documento fonte lido junto com ele na recuperação que gerou a resposta
+        # (None: registrado na primeira validação após a inserção)
+        self.source_version = source_version
+        self.created_at = time.monotonic()
+        self.hits = 0
+        self.signatures = signatures
+
+
+class LSHIndex:
+    """
+    Índice ANN por hiperplanos aleatórios (LSH para similaridade de cosseno): `tables` tabelas
+    de hash, cada uma com assinaturas de `bits` bits. A busca consulta o bucket da assinatura e
+    os vizinhos a um bit de distância (multi-probe) em cada tabela, e só compara por produto
+    interno os candidatos encontrados, sem percorrer todas as entradas.
+    Pensado para limiares altos de similaridade (perguntas quase iguais), como o do cache.
+    """
+
+    def __init__(self, tables: int, bits: int, seed: int = 0):
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        self._planes: Optional[np.ndarray] = None
+        self._weights = 1 << np.arange(bits, dtype=np.int64)
+        self._buckets = [dict() for _ in range(tables)]
+
+    def signatures(self, vector: np.ndarray) -> tuple:
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.tables * self.bits, len(vector))).astype(np.float32)
+        bits = (self._planes @ vector > 0).reshape(self.tables, self.bits)
+        return tuple(int(value) for value in bits.astype(np.int64) @ self._weights)
+
+    def add(self, key: int, signatures: tuple):
+        for buckets, signature in zip(self._buckets, signatures):
+            buckets.setdefault(signature, set()).add(key)
+
+    def remove(self, key: int, signatures: tuple):
+        for buckets, signature in zip(self._buckets, signatures):
+            bucket = buckets.get(signature)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[signature]
+
+    def candidates(self, signatures: tuple) -> set:
+        found = set()
+        for buckets, signature in zip(self._buckets, signatures):
+            for probe in itertools.chain((signature,), (signature ^ (1 << bit) for bit in range(self.bits))):
+                bucket = buckets.get(probe)
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def clear(self):
+        self._buckets = [dict() for _ in range(self.tables)]
+
+
+class SemanticAnswerCache:
+    """
+    Cache semântico de respostas, independente do histórico do chat:
+    - tamanho limitado (`max_entries`), com remoção LRU ou LFU;
+    - TTL por entrada;
+    - invalidação quando o documento fonte é alterado, desativado ou excluído (ver `validate`)
+      e quando a resposta recebe avaliação negativa (ver `invalidate_everywhere`);
+    - busca pelo índice LSH próprio, com custo que não cresce com o histórico de perguntas.
+    Uma resposta só é reaproveitada para a mesma subcategoria em que foi gerada.
+    Cada worker do uvicorn mantém o seu cache; com `redis_client`, as invalidações por
+    avaliação negativa são repassadas aos outros workers por pub/sub (ver `listen`).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float, policy: str = "lru", index_tables: int = 8,
+                 redis_client=None, channel: str = "ai_semantic_cache:invalidations"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.policy = policy
+        # Bits por assinatura crescem com log2 do tamanho máximo: os buckets mantêm poucas
+        # entradas, e o número de candidatos por busca não cresce com o cache
+        self.index = LSHIndex(index_tables, max(8, math.ceil(math.log2(max(max_entries, 2))) + 2))
+        # Ordem de inserção/acesso (LRU) e, para o LFU, as chaves agrupadas por número de acessos
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_hits: dict = {}
+        self._next_key = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.removed = Counter()
+        self.candidates_compared = 0
+        self._lookup_ms = deque(maxlen=1000)
+        self.redis = redis_client
+        self.channel = channel
+        # Identifica as mensagens deste worker, que já invalidou localmente antes de publicar
+        self._origin = uuid.uuid4().hex
+        self.remote_invalidations = 0
+        self.publish_errors = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: int, reason: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.index.remove(key, entry.signatures)
+            self._unlink_hits(entry)
+            self.removed[reason] += 1
+
+    def _unlink_hits(self, entry: _Entry):
+        bucket = self._by_hits.get(entry.hits)
+        if bucket is not None:
+            bucket.pop(entry.key, None)
+            if not bucket:
+                del self._by_hits[entry.hits]
+
+    def _link_hits(self, entry: _Entry):
+        self._by_hits.setdefault(entry.hits, OrderedDict())[entry.key] = None
+
+    def _best_match(self, vector: np.ndarray, subcategoria_id: Optional[int]) -> tuple:
+        """Retorna (entrada mais similar da subcategoria, similaridade, candidatos comparados)."""
+        now = time.monotonic()
+        candidates = []
+        for key in self.index.candidates(self.index.signatures(vector)):
+            entry = self._entries[key]
+            if self._expired(entry, now):
+                self._remove(key, EXPIRED)
+            elif entry.subcategoria_id == subcategoria_id:
+                candidates.append(entry)
+        if not candidates:
+            return None, 0.0, 0
+        scores = np.stack([entry.vector for entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best], float(scores[best]), len(candidates)
+
+    def lookup(self, embedding, subcategoria_id: Optional[int] = None) -> Optional[dict]:
+        """Resposta em cache para uma pergunta similar (acima do limiar), ou None."""
+        start = time.perf_counter()
+        vector = self._normalize(embedding)
+        entry, similarity, compared = self._best_match(vector, subcategoria_id) if vector is not None else (None, 0.0, 0)
+        self._lookup_ms.append((time.perf_counter() - start) * 1000)
+        self.candidates_compared += compared
+
+        if entry is None or similarity < self.threshold:
+            self.misses += 1
+            if entry is not None:
+                logger.debug(f"CACHE SEMÂNTICO MISS. Similaridade mais próxima: {similarity:.4f}")
+            return None
+
+        self.hits += 1
+        self._unlink_hits(entry)
+        entry.hits += 1
+        self._link_hits(entry)
+        self._entries.move_to_end(entry.key)
+        logger.info(f"CACHE SEMÂNTICO HIT! Similaridade: {similarity:.4f}")
+        return {**entry.answer, "similarity": similarity}
+
+    def store(self, embedding, subcategoria_id: Optional[int], answer: dict, source_version=None) -> Optional[_Entry]:
+        """
+        Guarda a resposta (texto_resposta e dados da fonte). Uma entrada quase idêntica da mesma
+        subcategoria é substituída, em vez de duplicada. `source_version` é o "updatedAt" da fonte
+        na leitura que gerou a resposta: uma edição logo depois já a invalida na próxima validação.
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        existing, similarity, _ = self._best_match(vector, subcategoria_id)
+        if existing is not None and similarity >= self.threshold:
+            self._remove(existing.key, EVICTED)
+
+        while len(self._entries) >= self.max_entries:
+            self._remove(self._victim(), EVICTED)
+
+        signatures = self.index.signatures(vector)
+        entry = _Entry(next(self._next_key), vector, subcategoria_id, dict(answer), signatures, source_version)
+        self._entries[entry.key] = entry
+        self.index.add(entry.key, signatures)
+        self._link_hits(entry)
+        self.inserts += 1
+        return entry
+
+    def _victim(self) -> int:
+        if self.policy == "lfu":
+            # Menos acessada; no empate, a inserida/acessada há mais tempo
+            return next(iter(self._by_hits[min(self._by_hits)]))
+        return next(iter(self._entries))
+
+    def invalidate_document(self, document_id: int, reason: str = SOURCE_CHANGED) -> int:
+        keys = [key for key, entry in self._entries.items() if entry.source_document_id == document_id]
+        for key in keys:
+            self._remove(key, reason)
+        return len(keys)
+
+    def invalidate_question(self, embedding, subcategoria_id: Optional[int] = None) -> int:
+        """Remove a resposta em cache para a pergunta (ex: avaliação negativa). Retorna quantas foram removidas."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return 0
+        removed = 0
+        while True:
+            entry, similarity, _ = self._best_match(vector, subcategoria_id)
+            if entry is None or similarity < self.threshold:
+                return removed
+            self._remove(entry.key, NEGATIVE_FEEDBACK)
+            removed += 1
+
+    async def invalidate_everywhere(self, embedding, subcategoria_id: Optional[int] = None) -> int:
+        """
+        Remove a resposta em cache para a pergunta neste worker e publica a invalidação para os
+        demais (sem Redis, só neste worker). Retorna quantas foram removidas localmente.
+        """
+        removed = self.invalidate_question(embedding, subcategoria_id)
+        if self.redis is not None:
+            message = msgpack.packb({"origin": self._origin, "subcategoria_id": subcategoria_id, "embedding": encode_vector(embedding)},
+                                    use_bin_type=True)
+            try:
+                await self.redis.publish(self.channel, message)
+            except Exception as e:
+                self.publish_errors += 1
+                logger.warning(f"Falha ao publicar a invalidação do cache semântico no Redis: {e}")
+        return removed
+
+    async def listen(self, stop: asyncio.Event):
+        """Aplica as invalidações publicadas pelos outros workers até `stop` ser sinalizado."""
+        while not stop.is_set():
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                try:
+                    while not stop.is_set():
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is None:
+                            continue
+                        data = msgpack.unpackb(message["data"], raw=False)
+                        if data["origin"] == self._origin:
+                            continue
+                        self.remote_invalidations += self.invalidate_question(decode_vector(data["embedding"]), data["subcategoria_id"])
+                finally:
+                    await pubsub.aclose()
+            except Exception:
+                logger.exception("Falha na assinatura das invalidações do cache semântico. Reconectando...")
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def validate(self, connection: AsyncConnection) -> int:
+        """
+        Confere os documentos fonte das entradas no banco e remove as entradas cuja fonte foi
+        desativada, excluída ou alterada ("updatedAt" diferente do lido com a resposta).
+        Também descarta as entradas expiradas. Retorna quantas entradas foram removidas.
+        """
+        now = time.monotonic()
+        before = len(self._entries)
+        for key in [key for key, entry in self._entries.items() if self._expired(entry, now)]:
+            self._remove(key, EXPIRED)
+
+        sources = {entry.source_document_id for entry in self._entries.values() if entry.source_document_id}
+        if sources:
+            rows = (await connection.execute(
+                text('SELECT id, "updatedAt" FROM documentos WHERE id = ANY(:ids) AND ativo = true'),
+                {"ids": list(sources)}
+            )).all()
+            versions = {row.id: row.updatedAt for row in rows}
+            for entry in list(self._entries.values()):
+                if not entry.source_document_id:
+                    continue
+                version = versions.get(entry.source_document_id)
+                if version is None:
+                    self._remove(entry.key, SOURCE_CHANGED)
+                elif entry.source_version is None:
+                    entry.source_version = version
+                elif entry.source_version != version:
+                    self._remove(entry.key, SOURCE_CHANGED)
+        return before - len(self._entries)
+
+    async def warm_up(self, connection: AsyncConnection, limit: int):
+        """
+        Carrega as perguntas mais recentes do histórico do chat cuja fonte ainda está ativa e
+        cuja resposta não recebeu avaliação negativa.
+        """
+        rows = (await connection.execute(text("""
+            SELECT c.embedding, c.subcategoria_id, cr.texto_resposta,
+                   d.id AS source_document_id, d."urlArquivo" AS source_document_url,
+                   d.titulo AS source_document_title, d."updatedAt" AS source_version
+            FROM chat_consultas c
+            JOIN chat_respostas cr ON cr.consulta_id = c.id
+            JOIN documentos d ON d.id = cr.documento_fonte AND d.ativo = true
+            WHERE c.embedding IS NOT NULL AND cr.texto_resposta IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM feedbacks f WHERE f.resposta_id = cr.id AND f.util = false)
+            ORDER BY c."createdAt" DESC
+            LIMIT :limit
+        """), {"limit": limit})).mappings().all()
+        # Das mais antigas para as mais recentes, para que as recentes sejam as últimas a sair do LRU
+        for row in reversed(rows):
+            answer = {field: row[field] for field in ("texto_resposta", "source_document_id", "source_document_url", "source_document_title")}
+            self.store(row["embedding"], row["subcategoria_id"], answer, row["source_version"])
+        logger.info(f"Cache semântico carregado com {len(self._entries)} respostas do histórico.")
+
+    async def run(self, engine: AsyncEngine, stop: asyncio.Event, interval: float):
+        """Valida as entradas periodicamente até `stop` ser sinalizado."""
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            if stop.is_set():
+                break
+            try:
+                async with engine.connect() as connection:
+                    removed = await self.validate(connection)
+                if removed:
+                    logger.info(f"Cache semântico: {removed} respostas invalidadas.")
+            except Exception:
+                logger.exception("Falha ao validar o cache semântico.")
+
+    async def aclose(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        latencies = sorted(self._lookup_ms)
+        return {
+            "backend": settings.SEMANTIC_CACHE_BACKEND,
+            "policy": self.policy,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "inserts": self.inserts,
+            "removed": dict(self.removed),
+            "remote_invalidations": self.remote_invalidations,
+            "publish_errors": self.publish_errors,
+            "avg_candidates": round(self.candidates_compared / lookups, 1) if lookups else 0.0,
+            "lookup_p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+            "lookup_p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3) if latencies else None
+        }
+
+
+def _create_redis_client():
+    """Cliente Redis das invalidações entre workers; None se REDIS_URL não estiver configurada."""
+    if not settings.REDIS_URL:
+        return None
+    import redis.asyncio as redis
+    return redis.from_url(settings.REDIS_URL)
+
+
+semantic_cache = SemanticAnswerCache(
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    threshold=settings.SIMILARITY_THRESHOLD_FOR_CACHE,
+    policy=settings.SEMANTIC_CACHE_EVICTION,
+    redis_client=_create_redis_client()
+)
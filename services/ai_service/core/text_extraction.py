@@ -0,0 +1,143 @@
+import re
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+import msgpack
+from schemas.document import DocumentProcessRequest
+from config.settings import settings
+from core.chunk_parser import parse_chunk
+from core.tokenization import estimate_tokens, split_by_token_budget
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tokens reservados para o sufixo " (parte i/n)" adicionado ao título das partes
+_PART_SUFFIX_TOKENS = 8
+
+# Início de um novo bloco lógico: quebra de linha seguida de um cabeçalho "# "
+_BLOCK_BOUNDARY = re.compile(r'(?=\n#\s)')
+
+
+def iter_logical_blocks(texts: Iterable[str]) -> Iterator[str]:
+    """
+    Equivalente incremental de `re.split(r'(?=\\n#\\s)', "\\n\\n".join(texts))`: produz cada
+    bloco assim que o próximo cabeçalho aparece, sem montar o texto completo do documento.
+    (Pode produzir strings vazias nas fronteiras, que são descartadas pelo chamador.)
+    """
+    pending = None
+    for text in texts:
+        if pending is None:
+            pending, scan_from = text, 0
+        else:
+            # Uma nova fronteira pode começar nos 2 últimos caracteres já vistos
+            scan_from = max(0, len(pending) - 2)
+            pending += "\n\n" + text
+
+        start = 0
+        for match in _BLOCK_BOUNDARY.finditer(pending, scan_from):
+            if match.start() > start:
+                yield pending[start:match.start()]
+                start = match.start()
+        pending = pending[start:]
+
+    if pending is not None:
+        yield pending
+
+
+def _resolve_fields(request_data: DocumentProcessRequest, clean_chunk: str) -> Tuple[str, str, str, str]:
+    """Campos finais do chunk: os extraídos do texto ou, na falta deles, os metadados do documento."""
+    fields = parse_chunk(clean_chunk)
+    titulo_final = fields.titulo or request_data.titulo
+    descricao_final = fields.descricao or request_data.descricao
+    solucao_final = fields.solucao or clean_chunk.lstrip('#').strip()
+
+    # Prioriza as palavras-chave extraídas do documento. Se não houver, usa as do fallback que vem do front.
+    palavras_chave_finais = fields.palavras_chave or ", ".join(request_data.palavras_chave)
+    return titulo_final, descricao_final, solucao_final, palavras_chave_finais
+
+
+def _build_chunk(titulo: str, descricao: str, solucao: str, palavras_chave: str) -> Tuple[dict, str]:
+    """Monta os dados do chunk e o texto que será enviado para embedding."""
+    parts = [f"Título: {titulo}", f"Descrição: {descricao}", f"Solução: {solucao}"]
+    if palavras_chave:
+        parts.append(f"Palavras-chave: {palavras_chave.strip().rstrip('.')}")
+    texto_para_embedding = "\n".join(parts)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"  - Título do chunk: '{titulo}'")
+        logger.debug(f"  - Texto preparado para embedding (primeiros 100 chars): '{texto_para_embedding[:100]}...'")
+
+    chunk_data = {
+        "titulo": titulo,
+        "descricao": descricao,
+        "solucao": solucao,
+        "palavras_chave": [p.strip().rstrip('.') for p in palavras_chave.split(',') if p.strip()]
+    }
+    return chunk_data, texto_para_embedding
+
+
+def prepare_chunk(request_data: DocumentProcessRequest, clean_chunk: str) -> Tuple[dict, str]:
+    """ETAPA 2: extrai os campos de um chunk e monta o texto que será enviado para embedding."""
+    return _build_chunk(*_resolve_fields(request_data, clean_chunk))
+
+
+def iter_prepared_chunks(request_data: DocumentProcessRequest, logical_blocks: Iterable[str],
+                         max_tokens: int = settings.CHUNK_MAX_TOKENS,
+                         overlap_tokens: int = settings.CHUNK_OVERLAP_TOKENS) -> Iterator[Tuple[dict, str]]:
+    """
+    Um chunk por bloco lógico (cabeçalho "#"), respeitando o orçamento de `max_tokens`: a solução
+    de um bloco que excede o limite é dividida em fronteiras de sentença, com `overlap_tokens` de
+    sobreposição entre as partes. Cada parte repete título, descrição e palavras-chave do bloco.
+    """
+    for i, chunk_text in enumerate(logical_blocks):
+        clean_chunk = chunk_text.strip()
+        if not clean_chunk:
+            continue
+
+        logger.debug(f"Processando chunk #{i+1}...")
+        titulo, descricao, solucao, palavras_chave = _resolve_fields(request_data, clean_chunk)
+        chunk_data, texto_para_embedding = _build_chunk(titulo, descricao, solucao, palavras_chave)
+        total_tokens = estimate_tokens(texto_para_embedding)
+        if max_tokens <= 0 or total_tokens <= max_tokens:
+            yield chunk_data, texto_para_embedding
+            continue
+
+        # Orçamento da solução: o limite menos o que se repete em toda parte (e o sufixo "(parte i/n)")
+        header_tokens = total_tokens - estimate_tokens(solucao) + _PART_SUFFIX_TOKENS
+        parts = split_by_token_budget(solucao, max(max_tokens - header_tokens, max_tokens // 4), overlap_tokens)
+        logger.debug(f"Chunk #{i+1} com ~{total_tokens} tokens dividido em {len(parts)} partes.")
+        for index, part in enumerate(parts, start=1):
+            yield _build_chunk(f"{titulo} (parte {index}/{len(parts)})", descricao, part, palavras_chave)
+
+
+def spool_chunks(prepared_chunks: Iterable[Tuple[dict, str]], spool_path: str) -> int:
+    """Grava os chunks, um registro msgpack por chunk, à medida que são produzidos. Retorna quantos."""
+    count = 0
+    with open(spool_path, "wb") as spool:
+        for chunk_data, texto_para_embedding in prepared_chunks:
+            spool.write(msgpack.packb([chunk_data, texto_para_embedding], use_bin_type=True))
+            count += 1
+    return count
+
+
+def iter_spooled_chunks(spool: BinaryIO) -> Iterator[Tuple[dict, str]]:
+    """Lê de volta os chunks gravados por `spool_chunks`, um de cada vez."""
+    for chunk_data, texto_para_embedding in msgpack.Unpacker(spool, raw=False):
+        yield chunk_data, texto_para_embedding
+
+
+def spool_chunks_from_file(file_path: str, file_name: Optional[str], request_data: DocumentProcessRequest, spool_path: str) -> int:
+    """
+    Particiona o arquivo com o Unstructured e grava os chunks (campos + texto para embedding) em
+    `spool_path`. Parte CPU-bound da ingestão: é executada nos processos do partition_pool.
+    Os chunks não voltam pelo pool (o retorno é só a contagem): o processo da API os lê do
+    arquivo aos poucos, um lote de embeddings por vez.
+    """
+    # Já importado no aquecimento dos processos do pool; aqui o import só consulta sys.modules
+    from unstructured.partition.auto import partition
+
+    logger.debug("Particionando o arquivo com Unstructured...")
+    # O partition não tem API incremental: a lista de elementos do arquivo existe inteira aqui
+    elements = partition(filename=file_path, metadata_filename=file_name, strategy="fast")
+    if not elements:
+        raise ValueError("Unstructured não retornou elementos do arquivo.")
+    logical_blocks = iter_logical_blocks(el.text for el in elements if el.text.strip())
+    return spool_chunks(iter_prepared_chunks(request_data, logical_blocks), spool_path)
@@ -0,0 +1,118 @@
+import re
+import unicodedata
+from typing import Iterator, List, Tuple
+
+# Palavras (letras/dígitos) e sinais de pontuação isolados
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+# Fim de sentença: pontuação final seguida de espaço, ou quebra de linha
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;])\s+|\s*\n\s*')
+_WORD = re.compile(r'\S+')
+
+# Palavras muito frequentes em português, ignoradas na comparação de termos
+STOPWORDS = frozenset("""
+    a ao aos as com como da das de do dos e ela ele em entre era essa esse esta este eu isso
+    isto ja mais mas me meu na nao nas no nos o os ou para pela pelas pelo pelos por qual
+    quando que quem se sem ser seu sua sao tem um uma umas uns voce
+""".split())
+
+# Caracteres por token usados na estimativa de palavras longas (média dos tokenizadores BPE em português)
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa do número de tokens de `text`, sem depender do tokenizador de cada modelo:
+    cada pontuação conta 1 e cada palavra conta 1 a cada 4 caracteres. Tende a superestimar
+    levemente, o que é o lado seguro para orçamentos de contexto.
+    """
+    return sum(-(-len(token) // _CHARS_PER_TOKEN) for token in _TOKEN.findall(text))
+
+
+def normalize_terms(text: str) -> List[str]:
+    """Termos para comparação léxica: minúsculos, sem acentos e sem stopwords."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return [term for term in re.findall(r'\w+', plain) if term not in STOPWORDS]
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """Posições (início, fim) de cada sentença de `text`, sem os espaços entre elas."""
+    spans = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def split_sentences(text: str) -> List[str]:
+    return [text[start:end] for start, end in sentence_spans(text)]
+
+
+def _word_windows(text: str, start: int, end: int, max_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    """Quebra uma sentença longa demais em trechos de palavras com até `max_tokens`."""
+    window_start = window_end = None
+    total = 0
+    for match in _WORD.finditer(text, start, end):
+        tokens = estimate_tokens(match.group())
+        if window_start is not None and total + tokens > max_tokens:
+            yield window_start, window_end, total
+            window_start, total = None, 0
+        if window_start is None:
+            window_start = match.start()
+        window_end = match.end()
+        total += tokens
+    if window_start is not None:
+        yield window_start, window_end, total
+
+
+def budget_units(text: str, max_tokens: int) -> List[Tuple[int, int, int]]:
+    """
+    Unidades (início, fim, tokens) de `text` com até `max_tokens` cada: as sentenças e, para
+    sentenças maiores que o limite, trechos de palavras.
+    """
+    units = []
+    for start, end in sentence_spans(text):
+        tokens = estimate_tokens(text[start:end])
+        if tokens > max_tokens:
+            units.extend(_word_windows(text, start, end, max_tokens))
+        else:
+            units.append((start, end, tokens))
+    return units
+
+
+def split_by_token_budget(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Divide `text` em trechos de até `max_tokens`, quebrando em fronteiras de sentença (e, para
+    sentenças maiores que o limite, entre palavras). Cada trecho começa repetindo as últimas
+    sentenças do anterior, até `overlap_tokens`, para não perder o contexto na fronteira.
+    Trechos preservam a formatação original do texto (quebras de linha, listas).
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    units = budget_units(text, max_tokens)
+
+    pieces = []
+    i = 0
+    while i < len(units):
+        j, total = i, 0
+        while j < len(units) and (j == i or total + units[j][2] <= max_tokens):
+            total += units[j][2]
+            j += 1
+        pieces.append(text[units[i][0]:units[j - 1][1]])
+        if j >= len(units):
+            break
+
+        # Sobreposição: recua sentenças do fim do trecho, sempre avançando ao menos uma
+        # e deixando espaço para a próxima sentença nova
+        k, overlap = j, 0
+        while (k - 1 > i and overlap + units[k - 1][2] <= overlap_tokens
+               and overlap + units[k - 1][2] + units[j][2] <= max_tokens):
+            k -= 1
+            overlap += units[k][2]
+        i = k
+    return pieces
@@ -0,0 +1,74 @@
+import base64
+import json
+from typing import Callable, List, Literal, Optional
+import msgpack
+import numpy as np
+from fastapi import Response
+
+# Formatos binários de vetor aceitos (sempre little-endian)
+VECTOR_DTYPES = {"float32": "<f4", "float16": "<f2"}
+VectorDtype = Literal["float32", "float16"]
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+OCTET_MEDIA_TYPE = "application/octet-stream"
+
+
+class VectorFormat:
+    """
+    Resultado da negociação de conteúdo para respostas com vetores:
+    - container "json" sem dtype: lista de floats (padrão, compatível com os clientes atuais);
+    - container "json" com dtype: cada vetor vira uma string base64 dos bytes little-endian;
+    - container "msgpack": resposta inteira em msgpack, com vetores como bytes (bin);
+    - container "octet": bytes crus de um único vetor (apenas para endpoints de vetor único).
+    """
+    def __init__(self, container: str, dtype: Optional[str] = None):
+        self.container = container
+        self.dtype = dtype
+
+    @property
+    def encoding(self) -> str:
+        return f"{self.dtype}-le" if self.dtype else "json-float"
+
+    def convert(self) -> Callable[[Optional[List[float]]], object]:
+        """Função que converte um vetor para a representação deste formato (None é mantido)."""
+        if self.dtype is None:
+            return lambda vector: vector
+        if self.container == "json":
+            return lambda vector: None if vector is None else base64.b64encode(encode_vector(vector, self.dtype)).decode("ascii")
+        return lambda vector: None if vector is None else encode_vector(vector, self.dtype)
+
+
+def encode_vector(vector, dtype: str = "float32") -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPES[dtype]).tobytes()
+
+
+def decode_vector(data: bytes, dtype: str = "float32") -> List[float]:
+    return np.frombuffer(data, dtype=VECTOR_DTYPES[dtype]).tolist()
+
+
+def negotiate_vector_format(accept: Optional[str], vector_dtype: Optional[str], allow_octet: bool = False) -> VectorFormat:
+    """Escolhe o formato a partir do cabeçalho Accept e do parâmetro `vector_dtype`."""
+    accept = (accept or "").lower()
+    if any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return VectorFormat("msgpack", vector_dtype or "float32")
+    if allow_octet and OCTET_MEDIA_TYPE in accept:
+        return VectorFormat("octet", vector_dtype or "float32")
+    return VectorFormat("json", vector_dtype)
+
+
+def render(payload, vector_format: VectorFormat, dimension: Optional[int] = None):
+    """
+    Serializa o payload (com os vetores já convertidos por `vector_format.convert()`).
+    No formato JSON padrão retorna o próprio payload, mantendo o comportamento do FastAPI.
+    """
+    headers = {"X-Vector-Encoding": vector_format.encoding}
+    if dimension is not None:
+        headers["X-Vector-Dimension"] = str(dimension)
+
+    if vector_format.container == "msgpack":
+        return Response(content=msgpack.packb(payload, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPES[0], headers=headers)
+    if vector_format.container == "octet":
+        return Response(content=payload, media_type=OCTET_MEDIA_TYPE, headers=headers)
+    if vector_format.dtype is None:
+        return payload
+    return Response(content=json.dumps(payload, ensure_ascii=False), media_type="application/json", headers=headers)
@@ -0,0 +1,150 @@
+import logging
+import re
+from typing import Optional
+from pgvector import Vector
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Operador de distância usado nas consultas de similaridade (cosseno).
+# O índice ANN só é aproveitado pelo planner se a classe de operadores for a correspondente.
+DISTANCE_OPERATOR = "<=>"
+
+OPCLASS_BY_OPERATOR = {
+    "<=>": "vector_cosine_ops",
+    "<->": "vector_l2_ops",
+    "<#>": "vector_ip_ops",
+}
+
+# Índices vetoriais de responsabilidade do serviço: (tabela, coluna)
+VECTOR_INDEXES = [
+    ("documentos", "embedding"),
+    ("chat_consultas", "embedding"),
+]
+
+
+def query_vector(embedding) -> Vector:
+    """
+    Embedding pronto para ser passado como parâmetro `(:q_vector)::vector`: já convertido para
+    float32 big-endian, que o codec binário do pgvector envia sem copiar nem formatar.
+    """
+    return embedding if isinstance(embedding, Vector) else Vector(embedding)
+
+
+def version_tuple(version: Optional[str]) -> tuple:
+    """Versão da extensão (ex: '0.8.0') comparável como tupla; (0,) se não instalada."""
+    if not version:
+        return (0,)
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+
+def index_name(table: str, column: str, method: str) -> str:
+    return f"{table}_{column}_{method}_cosine_idx"
+
+
+def build_index_ddl(table: str, column: str, method: str, opclass: str, name: str, where: str | None = None) -> str:
+    """
+    Monta o CREATE INDEX (CONCURRENTLY, para não bloquear escritas) do índice ANN.
+    Com `where`, cria um índice parcial (ex: só os documentos de uma subcategoria).
+    """
+    if method == "hnsw":
+        options = f"WITH (m = {settings.HNSW_M}, ef_construction = {settings.HNSW_EF_CONSTRUCTION})"
+    elif method == "ivfflat":
+        options = f"WITH (lists = {settings.IVFFLAT_LISTS})"
+    else:
+        raise ValueError(f"Tipo de índice vetorial não suportado: {method}")
+    predicate = f" WHERE {where}" if where else ""
+    return f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON {table} USING {method} ({column} {opclass}) {options}{predicate}'
+
+
+async def _existing_indexes(connection: AsyncConnection, table: str, column: str) -> list:
+    """
+    Índices globais da coluna: os parciais (indpred, ex: por subcategoria, ver
+    core/filtered_search.py) e os de expressão (indexprs) não atendem as buscas sem filtro.
+    """
+    query = text("""
+        SELECT i.relname AS index_name, am.amname AS method, opc.opcname AS opclass, ix.indisvalid AS valid
+        FROM pg_index ix
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_am am ON am.oid = i.relam
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ix.indkey[0]
+        JOIN pg_opclass opc ON opc.oid = ix.indclass[0]
+        WHERE t.relname = :table AND a.attname = :column AND ix.indpred IS NULL AND ix.indexprs IS NULL
+    """)
+    return (await connection.execute(query, {"table": table, "column": column})).mappings().all()
+
+
+async def ensure_vector_indexes(engine: AsyncEngine):
+    """
+    Verifica (e, se configurado, cria) os índices ANN das colunas de embedding com a
+    classe de operadores compatível com DISTANCE_OPERATOR. Índices existentes com outra
+    classe (ex: vector_l2_ops) são ignorados pelo planner e apenas reportados no log.
+    """
+    method = settings.VECTOR_INDEX_TYPE
+    if method == "none":
+        logger.info("Gerenciamento de índices vetoriais desativado (VECTOR_INDEX_TYPE=none).")
+        return
+    if settings.VECTOR_QUANTIZATION != "none":
+        # O ANN roda sobre a cópia quantizada (core/quantization.py); um índice de precisão
+        # completa já existente não é removido, mas deixa de ser usado
+        logger.info(f"VECTOR_QUANTIZATION={settings.VECTOR_QUANTIZATION}: índices de precisão completa não serão criados.")
+        return
+
+    opclass = OPCLASS_BY_OPERATOR[DISTANCE_OPERATOR]
+    async with engine.connect() as connection:
+        # CREATE/DROP INDEX CONCURRENTLY não pode rodar dentro de uma transação
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        # Vários workers iniciando ao mesmo tempo: apenas um verifica/cria por vez
+        await connection.execute(text("SELECT pg_advisory_lock(hashtext('ai_service_vector_indexes'))"))
+        try:
+            await _ensure_indexes(connection, method, opclass)
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(hashtext('ai_service_vector_indexes'))"))
+
+
+async def _ensure_indexes(connection: AsyncConnection, method: str, opclass: str):
+    for table, column in VECTOR_INDEXES:
+        indexes = await _existing_indexes(connection, table, column)
+        name = index_name(table, column, method)
+
+        for idx in indexes:
+            if idx["method"] in ("hnsw", "ivfflat") and idx["opclass"] != opclass:
+                logger.warning(f"Índice '{idx['index_name']}' em {table}.{column} usa '{idx['opclass']}', "
+                               f"incompatível com o operador '{DISTANCE_OPERATOR}'. Ele não será usado pelas consultas.")
+
+        usable = [idx for idx in indexes if idx["method"] in ("hnsw", "ivfflat") and idx["opclass"] == opclass]
+        if any(idx["valid"] for idx in usable):
+            logger.info(f"Índice vetorial compatível encontrado em {table}.{column}: {[idx['index_name'] for idx in usable]}")
+            continue
+
+        if not settings.VECTOR_INDEX_AUTO_CREATE:
+            logger.warning(f"Nenhum índice vetorial compatível em {table}.{column} e a criação automática está desativada. "
+                           f"As buscas farão varredura sequencial.")
+            continue
+
+        # Um CREATE INDEX CONCURRENTLY interrompido deixa o índice inválido: recria.
+        if any(idx["index_name"] == name and not idx["valid"] for idx in usable):
+            logger.warning(f"Índice '{name}' está inválido. Recriando...")
+            await connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+        logger.info(f"Criando índice {method} ({opclass}) em {table}.{column}...")
+        await connection.execute(text(build_index_ddl(table, column, method, opclass, name)))
+        logger.info(f"Índice '{name}' criado com sucesso.")
+
+
+async def apply_search_settings(connection: AsyncConnection):
+    """
+    Ajusta os parâmetros de busca ANN para a transação corrente (equivalente a SET LOCAL).
+    Deve ser chamada antes das consultas de similaridade da requisição.
+    """
+    ef_search = settings.HNSW_EF_SEARCH
+    if settings.VECTOR_QUANTIZATION != "none":
+        # O HNSW devolve no máximo ef_search resultados: precisa cobrir os candidatos da re-pontuação
+        ef_search = max(ef_search, settings.QUANTIZED_CANDIDATES)
+    await connection.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"),
+        {"ef_search": str(ef_search), "probes": str(settings.IVFFLAT_PROBES)}
+    )
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from typing import List, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Campos devolvidos em cada resultado, iguais às colunas da consulta ao pgvector
+_METADATA_FIELDS = ("titulo", "descricao", "solucao", "urlArquivo", "updatedAt", "palavras_chave")
+
+_SELECT_DOCUMENTS = """
+    SELECT d.id, d.titulo, d.descricao, d.solucao, d."urlArquivo", d.subcategoria_id, d.ativo,
+           d.embedding, d."updatedAt",
+           (SELECT string_agg(pc.palavra, ', ') FROM documentos_palavras_chave dpc
+            JOIN palavras_chave pc ON pc.id = dpc.palavra_chave_id
+            WHERE dpc.documento_id = d.id) AS palavras_chave
+    FROM {table} d
+"""
+
+
+class _Snapshot(NamedTuple):
+    """Estado imutável da réplica: trocado por inteiro a cada atualização, nunca alterado no lugar."""
+    ids: np.ndarray
+    matrix: np.ndarray          # (n, dimensão) float32, linhas normalizadas
+    metadata: List[tuple]       # na ordem de _METADATA_FIELDS, alinhado com `ids`
+    by_subcategory: dict        # subcategoria -> posições (np.ndarray) das suas linhas
+
+
+_EMPTY = _Snapshot(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), [], {})
+
+
+def _normalize(vector) -> Optional[np.ndarray]:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
+
+
+class VectorReplica:
+    """
+    Réplica em memória dos embeddings dos documentos ativos, para responder à busca por
+    similaridade sem ir ao banco: uma matriz float32 contígua e pré-normalizada, com os ids e
+    metadados alinhados. O top-k é um produto matriz-vetor seguido de `argpartition` (busca
+    exata, sem a aproximação do índice ANN), com o filtro de subcategoria pré-computado.
+
+    A réplica é atualizada por polling de "updatedAt" (mudanças desde a última leitura). Como
+    exclusões não aparecem nesse polling, a contagem de documentos ativos é conferida a cada
+    atualização e, se divergir, a réplica é recarregada por inteiro.
+    """
+
+    def __init__(self, table: str = "documentos"):
+        self.table = table
+        self._snapshot = _EMPTY
+        self._rows: dict = {}
+        self._high_water = None
+        self.loaded = False
+        self.full_loads = 0
+        self.incremental_updates = 0
+        self.changed_rows = 0
+        self.searches = 0
+        self.last_refresh_ms = 0.0
+        self.refresh_errors = 0
+
+    async def load(self, connection: AsyncConnection):
+        """Carrega todos os documentos ativos com embedding."""
+        rows = (await connection.execute(text(_SELECT_DOCUMENTS.format(table=self.table) + " WHERE d.ativo = true"))).mappings().all()
+        self._rows = {}
+        self._high_water = None
+        self._apply(rows)
+        self._publish()
+        self.full_loads += 1
+        self.loaded = True
+
+    async def refresh(self, connection: AsyncConnection):
+        """Aplica as mudanças desde a última leitura (ou carrega tudo, na primeira vez)."""
+        start = time.perf_counter()
+        if not self.loaded:
+            await self.load(connection)
+        else:
+            # ">=" e não ">": documentos gravados no mesmo instante da última leitura não se perdem
+            # (reaplicar uma linha já conhecida não tem efeito)
+            query = _SELECT_DOCUMENTS.format(table=self.table) + ' WHERE d."updatedAt" >= :since'
+            changes = (await connection.execute(text(query), {"since": self._high_water})).mappings().all() if self._high_water else []
+            changed = self._apply(changes)
+            if changed:
+                self._publish()
+                self.incremental_updates += 1
+                self.changed_rows += changed
+
+            active = (await connection.execute(text(f"SELECT count(*) FROM {self.table} WHERE ativo = true AND embedding IS NOT NULL"))).scalar()
+            if active != len(self._rows):
+                logger.info(f"Réplica vetorial divergente do banco ({len(self._rows)} x {active} documentos). Recarregando...")
+                await self.load(connection)
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+
+    def _apply(self, rows) -> int:
+        """Atualiza as linhas conhecidas (sem publicar o snapshot). Retorna quantas mudaram."""
+        changed = 0
+        for row in rows:
+            if self._high_water is None or row["updatedAt"] > self._high_water:
+                self._high_water = row["updatedAt"]
+            vector = _normalize(row["embedding"]) if row["ativo"] and row["embedding"] is not None else None
+            if vector is None:
+                changed += self._rows.pop(row["id"], None) is not None
+                continue
+            entry = (vector, row["subcategoria_id"], tuple(row[field] for field in _METADATA_FIELDS), row["updatedAt"])
+            previous = self._rows.get(row["id"])
+            if previous is not None and previous[3] == entry[3]:
+                continue
+            self._rows[row["id"]] = entry
+            changed += 1
+        return changed
+
+    def _publish(self):
+        if not self._rows:
+            self._snapshot = _EMPTY
+            return
+        ids = np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+        entries = list(self._rows.values())
+        matrix = np.ascontiguousarray(np.stack([entry[0] for entry in entries]), dtype=np.float32)
+        subcategories = np.array([entry[1] if entry[1] is not None else -1 for entry in entries], dtype=np.int64)
+        by_subcategory = {int(value): np.flatnonzero(subcategories == value) for value in np.unique(subcategories) if value >= 0}
+        self._snapshot = _Snapshot(ids, matrix, [entry[2] for entry in entries], by_subcategory)
+
+    def search(self, embedding, top_k: int, subcategoria_id: Optional[int] = None) -> List[dict]:
+        """Top-k por similaridade de cosseno, no mesmo formato dos resultados do pgvector."""
+        snapshot = self._snapshot
+        query = _normalize(embedding)
+        self.searches += 1
+        if query is None or not len(snapshot.ids) or top_k <= 0:
+            return []
+
+        if subcategoria_id:
+            positions = snapshot.by_subcategory.get(int(subcategoria_id))
+            if positions is None:
+                return []
+            scores = snapshot.matrix[positions] @ query
+        else:
+            positions = None
+            scores = snapshot.matrix @ query
+
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+
+        results = []
+        for index in best:
+            row = positions[index] if positions is not None else index
+            results.append({"id": int(snapshot.ids[row]), **dict(zip(_METADATA_FIELDS, snapshot.metadata[row])),
+                            "similarity": float(scores[index])})
+        return results
+
+    async def run(self, engine: AsyncEngine, stop: asyncio.Event, interval: float):
+        """Mantém a réplica atualizada até `stop` ser sinalizado. Falhas mantêm o último snapshot."""
+        while not stop.is_set():
+            try:
+                async with engine.connect() as connection:
+                    await self.refresh(connection)
+            except Exception:
+                self.refresh_errors += 1
+                logger.exception("Falha ao atualizar a réplica vetorial em memória.")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "enabled": settings.VECTOR_REPLICA_ENABLED,
+            "loaded": self.loaded,
+            "rows": len(snapshot.ids),
+            "subcategories": len(snapshot.by_subcategory),
+            "matrix_mb": round(snapshot.matrix.nbytes / 1024 / 1024, 2),
+            "searches": self.searches,
+            "full_loads": self.full_loads,
+            "incremental_updates": self.incremental_updates,
+            "changed_rows": self.changed_rows,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+            "refresh_errors": self.refresh_errors
+        }
+
+
+vector_replica = VectorReplica()
@@ -1,16 +1,105 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from api.router import api_router 
 from config.logging_config import setup_logging
+from config.database import async_engine
+from config.settings import settings
+from models.loader import embeddings_model
+from core.vector_index import ensure_vector_indexes
+from core.filtered_search import ensure_partial_indexes
+from core.quantization import ensure_quantized_indexes
+from core.jobs import InMemoryJobBackend, job_backend, worker_loop
+from core.partition_pool import partition_pool
+from core.vector_replica import vector_replica
+from core.semantic_cache import semantic_cache
+from core.pendencies import pendency_processor
+import asyncio
 import logging
 
 setup_logging(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepara os índices vetoriais, a réplica vetorial, o cache semântico, o pool de particionamento, a fila de assuntos pendentes e os workers locais na inicialização e libera os recursos no encerramento."""
+    try:
+        await ensure_vector_indexes(async_engine)
+        await ensure_quantized_indexes(async_engine)
+        await ensure_partial_indexes(async_engine)
+    except Exception:
+        # O serviço continua funcional sem o índice (varredura sequencial), apenas mais lento
+        logger.exception("Falha ao verificar/criar os índices vetoriais.")
+
+    # Aquece os processos de particionamento (import do Unstructured) antes do primeiro documento
+    await partition_pool.start()
+
+    # Réplica vetorial em memória: a primeira carga é feita antes de aceitar requisições
+    stop_replica = asyncio.Event()
+    replica_task = None
+    if settings.VECTOR_REPLICA_ENABLED:
+        try:
+            async with async_engine.connect() as connection:
+                await vector_replica.refresh(connection)
+            logger.info(f"Réplica vetorial carregada: {vector_replica.stats()['rows']} documentos.")
+        except Exception:
+            # Sem a réplica, as buscas continuam indo ao pgvector
+            logger.exception("Falha ao carregar a réplica vetorial em memória.")
+        replica_task = asyncio.create_task(vector_replica.run(async_engine, stop_replica, settings.VECTOR_REPLICA_REFRESH_SECONDS))
+
+    # Cache semântico de respostas: pré-carga a partir do histórico e validação periódica das fontes
+    stop_cache = asyncio.Event()
+    cache_task = invalidation_task = None
+    if settings.SEMANTIC_CACHE_BACKEND == "memory":
+        if settings.SEMANTIC_CACHE_WARM_ENTRIES > 0:
+            try:
+                async with async_engine.connect() as connection:
+                    await semantic_cache.warm_up(connection, settings.SEMANTIC_CACHE_WARM_ENTRIES)
+            except Exception:
+                logger.exception("Falha ao pré-carregar o cache semântico.")
+        cache_task = asyncio.create_task(semantic_cache.run(async_engine, stop_cache, settings.SEMANTIC_CACHE_VALIDATE_SECONDS))
+        # Invalidações por avaliação negativa feitas nos outros workers (Redis pub/sub)
+        if semantic_cache.redis is not None:
+            invalidation_task = asyncio.create_task(semantic_cache.listen(stop_cache))
+
+    # Com a fila em memória, os jobs de ingestão são consumidos dentro do próprio processo
+    # da API; com o Redis, pelos processos de worker.py.
+    stop_workers = asyncio.Event()
+    local_workers = []
+    if isinstance(job_backend, InMemoryJobBackend):
+        local_workers = [
+            asyncio.create_task(worker_loop(job_backend, stop_workers, name=f"local-worker-{i}"))
+            for i in range(settings.JOB_LOCAL_WORKERS)
+        ]
+
+    # Assuntos pendentes: o endpoint só enfileira; o worker categoriza e grava em lotes
+    # (sem fila durável configurada, o endpoint grava na hora e o worker retorna logo)
+    stop_pendencies = asyncio.Event()
+    pendency_task = asyncio.create_task(pendency_processor.run(stop_pendencies))
+
+    yield
+
+    stop_workers.set()
+    stop_replica.set()
+    stop_cache.set()
+    stop_pendencies.set()
+    background = [task for task in (replica_task, cache_task, invalidation_task, pendency_task) if task]
+    await asyncio.gather(*local_workers, *background, return_exceptions=True)
+    await job_backend.aclose()
+    await pendency_processor.aclose()
+    await semantic_cache.aclose()
+    partition_pool.shutdown()
+    await embeddings_model.aclose()
+    await async_engine.dispose()
+
 
 # Cria a instância principal da aplicação FastAPI
 app = FastAPI(
     title="Serviço de IA para Bot de Atendimento",
     description="API para processamento de documentos e busca semântica (RAG).",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
@@ -1,14 +1,258 @@
 from config.settings import settings
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from collections import Counter, OrderedDict
 import google.generativeai as genai
+import httpx
+import numpy as np
 from langchain_groq import ChatGroq
-from typing import List
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 print("A carregar os modelos de IA...")
 
+CacheKey = Tuple[str, str, str]
+
+# Limite de itens por chamada ao endpoint batchEmbedContents da API Gemini
+API_MAX_BATCH_SIZE = 100
+# Resposta da API ao limite de taxa: a chamada espera e é repetida
+RATE_LIMITED = 429
+
+class EmbeddingCache:
+    """
+    Cache de embeddings em duas camadas: um LRU limitado em memória e, opcionalmente,
+    uma camada compartilhada no Redis (com TTL). As chaves são (modelo, task_type, texto
+    normalizado) e os vetores são armazenados como bytes float32 little-endian.
+
+    `redis_client` aceita qualquer cliente assíncrono compatível com redis.asyncio
+    (get/mget/set/pipeline/aclose), como o FakeRedis do pacote fakeredis.
+    """
+    def __init__(self, max_entries: int, redis_client=None, ttl_seconds: int = 7 * 24 * 3600, key_prefix: str = "ai_embedding:"):
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(model_name: str, task_type: str, text: str) -> CacheKey:
+        normalized = " ".join(unicodedata.normalize("NFC", text).split()).lower()
+        return (model_name, task_type, normalized)
+
+    @staticmethod
+    def encode(vector: List[float]) -> bytes:
+        return np.asarray(vector, dtype="<f4").tobytes()
+
+    @staticmethod
+    def decode(data: bytes) -> List[float]:
+        return np.frombuffer(data, dtype="<f4").tolist()
+
+    def _redis_key(self, key: CacheKey) -> str:
+        return self.key_prefix + hashlib.sha256("\x1f".join(key).encode("utf-8")).hexdigest()
+
+    def _remember(self, key: CacheKey, data: bytes):
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: CacheKey) -> Optional[List[float]]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return self.decode(data)
+
+        if self.redis is not None:
+            try:
+                data = await self.redis.get(self._redis_key(key))
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Falha ao consultar o cache de embeddings no Redis: {e}")
+                data = None
+            if data is not None:
+                self.redis_hits += 1
+                self._remember(key, data)
+                return self.decode(data)
+
+        self.misses += 1
+        return None
+
+    async def get_many(self, keys: List[CacheKey]) -> List[Optional[List[float]]]:
+        """Como `get`, para vários textos: os ausentes da memória são buscados com um único MGET."""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        remote = []
+        for i, key in enumerate(keys):
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                results[i] = self.decode(data)
+            else:
+                remote.append(i)
+
+        if remote and self.redis is not None:
+            try:
+                values = await self.redis.mget([self._redis_key(keys[i]) for i in remote])
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Falha ao consultar o cache de embeddings no Redis: {e}")
+                values = [None] * len(remote)
+            for i, data in zip(remote, values):
+                if data is not None:
+                    self.redis_hits += 1
+                    self._remember(keys[i], data)
+                    results[i] = self.decode(data)
+
+        self.misses += sum(results[i] is None for i in remote)
+        return results
+
+    async def set(self, key: CacheKey, vector: List[float]):
+        data = self.encode(vector)
+        self._remember(key, data)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._redis_key(key), data, ex=self.ttl_seconds)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Falha ao gravar o cache de embeddings no Redis: {e}")
+
+    async def set_many(self, items: List[Tuple[CacheKey, List[float]]]):
+        """Como `set`, para vários textos: as gravações no Redis vão num único pipeline."""
+        encoded = [(key, self.encode(vector)) for key, vector in items]
+        for key, data in encoded:
+            self._remember(key, data)
+        if self.redis is not None and encoded:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key, data in encoded:
+                        pipe.set(self._redis_key(key), data, ex=self.ttl_seconds)
+                    await pipe.execute()
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Falha ao gravar o cache de embeddings no Redis: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "redis_errors": self.redis_errors,
+            "hit_rate": (self.memory_hits + self.redis_hits) / lookups if lookups else 0.0,
+            "redis_enabled": self.redis is not None
+        }
+
+    async def aclose(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher: agrupa requisições concorrentes de texto único que chegam dentro de
+    `max_wait_ms` em uma única chamada de lote à API (até `max_batch_size` textos).
+    Textos repetidos dentro de um mesmo lote são enviados uma única vez.
+    """
+    def __init__(self, embed_many: Callable[[List[str]], Awaitable[List[List[float]]]], max_batch_size: int, max_wait_ms: float):
+        self._embed_many = embed_many
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatches: set = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._dispatch(batch))
+            # Mantém a referência até o fim, para a task não ser coletada pelo GC
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            vectors = dict(zip(unique_texts, await self._embed_many(unique_texts)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future in batch:
+            # Quem aguardava pode ter sido cancelado nesse meio tempo
+            if not future.done():
+                future.set_result(vectors[text])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms
+        }
+
 class GoogleEmbeddingWrapper:
-    def __init__(self, api_key: str, model_name: str):
+    def __init__(self, api_key: str, model_name: str, base_url: str = settings.GOOGLE_API_BASE_URL, timeout: float = settings.EMBEDDING_HTTP_TIMEOUT,
+                 cache: Optional[EmbeddingCache] = None, batch_max_size: Optional[int] = None, batch_max_wait_ms: float = 5.0,
+                 max_concurrent_requests: int = settings.EMBEDDING_MAX_CONCURRENT_REQUESTS,
+                 retry_attempts: int = settings.EMBEDDING_RETRY_ATTEMPTS, retry_base_seconds: float = settings.EMBEDDING_RETRY_BASE_SECONDS):
         genai.configure(api_key=api_key)
+        self.api_key = api_key
         self.model_name = model_name
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+        # A API REST espera o recurso no formato "models/<nome>"
+        self._model_path = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self._async_client: Optional[httpx.AsyncClient] = None
+        # Limite de chamadas simultâneas à API, compartilhado por perguntas e lotes de ingestão
+        self.max_concurrent_requests = max_concurrent_requests
+        self._requests = asyncio.Semaphore(max_concurrent_requests)
+        self.retry_attempts = retry_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.throttled = 0
+        # Coalescência de perguntas avulsas concorrentes (desativada se batch_max_size for None)
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if batch_max_size:
+            self.batcher = EmbeddingBatcher(
+                partial(self._remote_embed_batch, task_type="RETRIEVAL_QUERY"),
+                max_batch_size=min(batch_max_size, API_MAX_BATCH_SIZE),
+                max_wait_ms=batch_max_wait_ms
+            )
 
     def embed_query(self, text: str) -> List[float]:
         """Gera embedding para uma única string (pergunta)."""
@@ -28,27 +272,207 @@ class GoogleEmbeddingWrapper:
         )
         return result['embedding']
 
+    # --- Cliente assíncrono (REST da API Gemini via httpx, com pool de conexões) ---
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Cria sob demanda o cliente HTTP assíncrono compartilhado."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-goog-api-key": self.api_key},
+                timeout=self.timeout
+            )
+        return self._async_client
+
+    def _build_request(self, text: str, task_type: str) -> dict:
+        return {
+            "model": self._model_path,
+            "content": {"parts": [{"text": text}]},
+            "taskType": task_type
+        }
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After", "")
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            return self.retry_base_seconds * 2 ** attempt
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        """
+        POST na API com no máximo `max_concurrent_requests` chamadas simultâneas. Limite de taxa
+        (429) não derruba a chamada: ela espera e é repetida, até `retry_attempts` vezes,
+        sem ocupar um slot durante a espera.
+        """
+        for attempt in range(self.retry_attempts + 1):
+            async with self._requests:
+                response = await self._get_async_client().post(path, json=payload)
+            if response.status_code != RATE_LIMITED or attempt == self.retry_attempts:
+                break
+            self.throttled += 1
+            delay = self._retry_delay(response, attempt)
+            logger.warning(f"API de embeddings respondeu {response.status_code}. Nova tentativa em {delay:.1f}s.")
+            await asyncio.sleep(delay)
+        response.raise_for_status()
+        return response.json()
+
+    async def _remote_embed_query(self, text: str) -> List[float]:
+        data = await self._post(f"/{self._model_path}:embedContent", self._build_request(text, "RETRIEVAL_QUERY"))
+        return data['embedding']['values']
+
+    async def _remote_embed_chunk(self, texts: List[str], task_type: str) -> List[List[float]]:
+        data = await self._post(
+            f"/{self._model_path}:batchEmbedContents",
+            {"requests": [self._build_request(text, task_type) for text in texts]}
+        )
+        return [item['values'] for item in data['embeddings']]
+
+    async def _remote_embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """
+        Embeddings em lote, divididos em chamadas de até API_MAX_BATCH_SIZE textos. As chamadas
+        saem juntas, mas `_post` limita quantas ficam em andamento ao mesmo tempo.
+        """
+        if len(texts) <= API_MAX_BATCH_SIZE:
+            return await self._remote_embed_chunk(texts, task_type)
+        chunks = await asyncio.gather(*(
+            self._remote_embed_chunk(texts[i:i + API_MAX_BATCH_SIZE], task_type)
+            for i in range(0, len(texts), API_MAX_BATCH_SIZE)
+        ))
+        return [embedding for chunk in chunks for embedding in chunk]
+
+    async def _embed_many(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embeddings de vários textos: só envia à API (em lote) os textos ausentes do cache."""
+        if self.cache is None:
+            return await self._remote_embed_batch(texts, task_type)
+
+        keys = [EmbeddingCache.make_key(self.model_name, task_type, text) for text in texts]
+        embeddings = await self.cache.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = await self._remote_embed_batch([texts[i] for i in missing], task_type)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+            await self.cache.set_many([(keys[i], embeddings[i]) for i in missing])
+        return embeddings
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Versão assíncrona de embed_query: não bloqueia o event loop, consulta o cache antes
+        da API e, com o micro-batcher ativo, agrupa perguntas concorrentes em uma só chamada.
+        """
+        key = EmbeddingCache.make_key(self.model_name, "RETRIEVAL_QUERY", text)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        if self.batcher is not None:
+            embedding = await self.batcher.embed(text)
+        else:
+            embedding = await self._remote_embed_query(text)
+
+        if self.cache is not None:
+            await self.cache.set(key, embedding)
+        return embedding
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de várias perguntas (task_type RETRIEVAL_QUERY), na mesma ordem da entrada."""
+        return await self._embed_many(texts, "RETRIEVAL_QUERY")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Versão assíncrona de embed_documents: só envia à API (em lote) os textos ausentes do cache."""
+        return await self._embed_many(texts, "RETRIEVAL_DOCUMENT")
+
+    def api_stats(self) -> dict:
+        return {"max_concurrent_requests": self.max_concurrent_requests, "throttled": self.throttled}
+
+    def request_context(self) -> "EmbeddingContext":
+        """Cria um contexto de embeddings com escopo de uma única requisição."""
+        return EmbeddingContext(self)
+
+    async def aclose(self):
+        """Fecha o cliente HTTP assíncrono e o cache (chamado no shutdown da aplicação)."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self.cache is not None:
+            await self.cache.aclose()
+
+class EmbeddingContext:
+    """
+    Memoiza os embeddings de pergunta durante uma requisição: cada texto distinto
+    gera no máximo uma chamada remota, mesmo que seja usado pela busca no cache
+    semântico e depois pela recuperação RAG (ou que a reescrita devolva a mesma pergunta).
+    Chamadas concorrentes para o mesmo texto compartilham a mesma chamada em andamento.
+    """
+    def __init__(self, wrapper: GoogleEmbeddingWrapper):
+        self._wrapper = wrapper
+        self._vectors: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.reused = 0
+        self.calls_by_text: Counter = Counter()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = text.strip()
+        future = self._vectors.get(key)
+        if future is None:
+            self.calls += 1
+            self.calls_by_text[key] += 1
+            future = asyncio.ensure_future(self._wrapper.aembed_query(text))
+            self._vectors[key] = future
+        else:
+            self.reused += 1
+
+        try:
+            # shield: o cancelamento de quem aguarda não cancela a chamada compartilhada
+            return await asyncio.shield(future)
+        except Exception:
+            # Falhas não ficam memoizadas, permitindo nova tentativa na mesma requisição
+            if self._vectors.get(key) is future and future.done():
+                del self._vectors[key]
+            raise
+
+    def stats(self) -> dict:
+        """Contadores da requisição (chamadas remotas e reaproveitamentos)."""
+        return {"calls": self.calls, "reused": self.reused, "distinct_texts": len(self.calls_by_text)}
+
+def _create_redis_client():
+    """Cliente Redis da camada compartilhada do cache; None se REDIS_URL não estiver configurada."""
+    if not settings.REDIS_URL:
+        return None
+    import redis.asyncio as redis
+    return redis.from_url(settings.REDIS_URL)
+
 # Carrega e inicializa o wrapper do modelo de embeddings do Google
 embeddings_model = GoogleEmbeddingWrapper(
     api_key=settings.GOOGLE_API_KEY,
-    model_name=settings.EMBEDDINGS_MODEL_NAME
+    model_name=settings.EMBEDDINGS_MODEL_NAME,
+    cache=EmbeddingCache(
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        redis_client=_create_redis_client(),
+        ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS
+    ),
+    batch_max_size=settings.EMBEDDING_BATCH_MAX_SIZE if settings.EMBEDDING_BATCH_ENABLED else None,
+    batch_max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
 )
 
 # LLM Principal: Usado para responder em cima dos documentos de maior similaridade vindos do banco.
 llm_principal = ChatGroq(
-    api_key=settings.GROQ_API_KEY, 
+    api_key=settings.GROQ_API_KEY,
     model_name=settings.LLM_MODEL_NAME,
+    base_url=settings.GROQ_API_BASE_URL,
     temperature=0.7, #para as respostas soarem mais naturais
 )
 
 
-# LLM Categorizador: este vai criar novas categorias > subcategorias 
+# LLM Categorizador: este vai criar novas categorias > subcategorias
 llm_categorizador = ChatGroq(
-    api_key=settings.GROQ_API_KEY, 
-    model_name=settings.REASONING_LLM_MODEL_NAME, 
+    api_key=settings.GROQ_API_KEY,
+    model_name=settings.REASONING_LLM_MODEL_NAME,
+    base_url=settings.GROQ_API_BASE_URL,
     temperature=0.1,
     max_tokens=2048,
     model_kwargs={"response_format": {"type": "json_object"}}
 )
 
-print("Modelos de IA carregados com sucesso (Embeddings via Google Gemini).")
\ No newline at end of file
+print("Modelos de IA carregados com sucesso (Embeddings via Google Gemini).")
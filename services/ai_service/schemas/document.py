@@ -14,6 +14,12 @@ class AskRequest(BaseModel):
     subcategoria_id: Optional[int] = None,
     chat_history: Optional[List[ChatHistoryTurn]] = None
 
+# Avaliação de uma resposta pelo operador (negativa = remover do cache semântico)
+class AnswerFeedbackRequest(BaseModel):
+    question: str
+    subcategoria_id: Optional[int] = None
+    util: bool
+
 # --- Schema para o Processamento de documentos
 class DocumentProcessRequest(BaseModel):
     titulo: str
@@ -22,6 +28,12 @@ class DocumentProcessRequest(BaseModel):
     palavras_chave: Optional[List[str]] = []
     solucao: Optional[str] = None
     url_arquivo: Optional[str] = None 
+    # Re-ingestão incremental: hashes de conteúdo dos chunks já cadastrados. Chunks com hash
+    # conhecido não são reenviados ao modelo de embeddings: voltam com status "unchanged" e o
+    # embedding já salvo no banco para aquele hash.
+    known_hashes: Optional[List[str]] = None
+    # Busca os hashes conhecidos no banco (documentos com a mesma url_arquivo) quando `known_hashes` não é enviado
+    lookup_known_hashes: bool = False
 
     @field_validator('url_arquivo', mode='after')
     def check_solution_or_url(cls, v, info: ValidationInfo):
@@ -45,10 +57,23 @@ class SugestaoIA(BaseModel):
     subcategoria_sugerida: str = Field(description="O nome da nova e específica subcategoria.")
 
 
+# --- Schemas da categorização em lote (várias perguntas num único prompt)
+class SugestaoIAIndexada(SugestaoIA):
+    indice: int = Field(description="O número da pergunta na lista, exatamente como informado.")
+
+
+class SugestoesIALote(BaseModel):
+    sugestoes: List[SugestaoIAIndexada] = Field(description="Uma sugestão para cada pergunta da lista.")
+
+
 # --- Schema para a Requisição de askembedding ---
 class AskEmbeddingRequest(BaseModel):
     text: str
 
+# --- Schema para a Requisição de askembedding em lote ---
+class AskEmbeddingBatchRequest(BaseModel):
+    texts: List[str] = Field(min_length=1, max_length=1000)
+
 # --- Schema para a Resposta para o chatbot ---
 class RespostaFormatada(BaseModel):
     """A estrutura de dados para a resposta final do assistente."""
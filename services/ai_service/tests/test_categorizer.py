@@ -0,0 +1,68 @@
+import asyncio
+from core.categorizer import AI_DESCRIPTION_PREFIX, PendencyCategorizer, label_text
+
+CATEGORIAS = [{"id": 1, "nome": "Fiscal"}, {"id": 2, "nome": "Financeiro"}]
+SUBCATEGORIAS = [
+    {"id": 10, "categoria_id": 1, "nome": "NF-e", "descricao": None},
+    {"id": 20, "categoria_id": 2, "nome": "Sangria", "descricao": f"{AI_DESCRIPTION_PREFIX}Como fazer a sangria?"},
+    {"id": 30, "categoria_id": 9, "nome": "Sem categoria", "descricao": None},
+]
+VECTORS = {
+    "Fiscal: NF-e": [1.0, 0.0, 0.0],
+    "Financeiro: Sangria. Como fazer a sangria?": [0.0, 1.0, 0.0],
+    "Financeiro: Suprimento": [0.0, 0.6, 0.8],
+}
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [VECTORS[text] for text in texts]
+
+
+def _categorizer(embeddings=None, subcategorias=SUBCATEGORIAS):
+    categorizer = PendencyCategorizer(match_threshold=0.9, dedup_threshold=0.7)
+    asyncio.run(categorizer.update(CATEGORIAS, subcategorias, embeddings or FakeEmbeddings()))
+    return categorizer
+
+
+def test_label_text():
+    assert label_text("Fiscal", "NF-e") == "Fiscal: NF-e"
+    assert label_text("Financeiro", "Sangria", f"{AI_DESCRIPTION_PREFIX}Retirada") == "Financeiro: Sangria. Retirada"
+    assert label_text("Financeiro", "Sangria", AI_DESCRIPTION_PREFIX) == "Financeiro: Sangria"
+
+
+def test_match_reuses_the_nearest_subcategory_above_the_threshold():
+    categorizer = _categorizer()
+    match = categorizer.match([0.1, 2.0, 0.0])
+    assert (match.categoria_id, match.categoria_nome, match.subcategoria_id, match.subcategoria_nome) == (2, "Financeiro", 20, "Sangria")
+    assert match.similarity > 0.99
+
+    assert categorizer.match([1.0, 1.0, 1.0]) is None
+    assert (categorizer.stats()["llm_calls_avoided"], categorizer.stats()["llm_fallbacks"]) == (1, 1)
+    # Subcategoria cuja categoria não existe fica fora do índice
+    assert categorizer.stats()["subcategories"] == 2
+
+
+def test_duplicate_of_looks_only_inside_the_category():
+    categorizer = _categorizer()
+    assert categorizer.duplicate_of(" sangria ", [0.0, 0.0, 1.0], categoria_id=2).subcategoria_id == 20
+    assert categorizer.duplicate_of("Retirada do caixa", [0.0, 0.8, 0.6], categoria_id=2).subcategoria_id == 20
+    assert categorizer.duplicate_of("Retirada do caixa", [0.0, 0.8, 0.6], categoria_id=1) is None
+    assert categorizer.duplicate_of("Suprimento", [0.0, 0.0, 1.0], categoria_id=2) is None
+    assert categorizer.category_id(" FISCAL ") == 1
+    assert categorizer.category_id("Estoque") is None
+
+
+def test_update_embeds_only_new_labels():
+    embeddings = FakeEmbeddings()
+    categorizer = _categorizer(embeddings)
+    novas = SUBCATEGORIAS + [{"id": 21, "categoria_id": 2, "nome": "Suprimento", "descricao": None}]
+    asyncio.run(categorizer.update(CATEGORIAS, novas, embeddings))
+
+    assert embeddings.calls[-1] == ["Financeiro: Suprimento"]
+    assert categorizer.match([0.0, 0.6, 0.8]).subcategoria_id == 21
+    assert categorizer.stats()["embedded_labels"] == 3
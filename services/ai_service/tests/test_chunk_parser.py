@@ -0,0 +1,28 @@
+import pytest
+from benchmarks.chunk_parser import GOLDEN_REQUEST, _legacy_prepare_chunk, check_golden
+from core.chunk_parser import ChunkFields, parse_chunk
+from core.text_extraction import prepare_chunk
+
+
+def test_golden_corpus_matches_the_previous_implementation():
+    assert check_golden()
+
+
+@pytest.mark.parametrize("chunk, expected", [
+    # Sem marcadores: só o título
+    ("# Sangria do caixa\nAbra o caixa e escolha Sangria.", ChunkFields("Sangria do caixa", "", "", "")),
+    ("Texto livre sem título nem marcadores", ChunkFields("", "", "", "")),
+    # Marcadores repetidos: vale o primeiro de cada campo
+    ("# NF-e\nDescrição: primeira\nDescrição: segunda\nSolução: emitir\nSolução: de novo",
+     ChunkFields("NF-e", "primeira\nDescrição: segunda", "emitir\nSolução: de novo", "")),
+    # Marcador no início e no fim do texto
+    ("Descrição: sem título\nSolução: reinstalar o driver", ChunkFields("", "sem título", "reinstalar o driver", "")),
+    ("# Fechamento\nSolução: confira os valores\nPalavras-chave:", ChunkFields("Fechamento", "", "confira os valores", "")),
+    # Marcadores sem acento ou com outra caixa não são os mesmos literais (só a caixa é ignorada)
+    ("# Troca\nDESCRIÇÃO: devolução\nsolução: gerar crédito\nPALAVRAS-CHAVE: troca, crédito",
+     ChunkFields("Troca", "devolução", "gerar crédito", "troca, crédito")),
+    ("# Troca\nDescricao: sem acento\nSolucao: também sem acento", ChunkFields("Troca", "", "", "")),
+])
+def test_parse_chunk(chunk, expected):
+    assert parse_chunk(chunk) == expected
+    assert prepare_chunk(GOLDEN_REQUEST, chunk) == _legacy_prepare_chunk(GOLDEN_REQUEST, chunk)
@@ -0,0 +1,64 @@
+from core import context_packer as packer_module
+from core.context_packer import ContextPacker, build_context, trim_passage
+from core.tokenization import estimate_tokens, normalize_terms
+
+FILLER = " ".join(f"Passo {i}: confira o cadastro do cliente." for i in range(1, 30))
+
+
+def _doc(id, solucao, similarity=0.5, **extra):
+    return {"id": id, "titulo": f"Doc {id}", "solucao": solucao, "similarity": similarity, **extra}
+
+
+def _packer(token_budget=400, max_passage_tokens=150, dedup_threshold=0.8):
+    return ContextPacker(token_budget=token_budget, max_passage_tokens=max_passage_tokens, dedup_threshold=dedup_threshold)
+
+
+def test_trim_passage_keeps_the_window_with_the_question_terms():
+    passage = FILLER + " Para a sangria, abra o caixa e informe o valor da sangria. " + FILLER
+    text, trimmed = trim_passage(passage, set(normalize_terms("Como fazer a sangria do caixa?")), 60)
+
+    assert trimmed
+    assert "sangria" in text
+    assert text.startswith("[...] ") and text.endswith(" [...]")
+    assert estimate_tokens(text) <= 60
+    assert trim_passage("Texto curto.", set(), 60) == ("Texto curto.", False)
+
+
+def test_passages_are_ordered_by_similarity_and_near_duplicates_dropped():
+    results = [
+        _doc(1, "Emita a nota pelo menu Fiscal.", similarity=0.6),
+        _doc(2, "Abra o caixa e escolha Sangria no menu Financeiro.", similarity=0.9),
+        _doc(3, "Abra o caixa e escolha Sangria no menu Financeiro.", similarity=0.8),
+    ]
+    packed = _packer().pack(results, "Como fazer a sangria?")
+
+    assert [passage["id"] for passage in packed.passages] == [2, 1]
+    assert packed.text.splitlines()[0].startswith("Contexto (ID: 2)")
+    assert packed.report()["dropped_duplicates"] == 1
+
+
+def test_reranked_results_keep_their_order():
+    results = [_doc(1, "Emita a nota.", similarity=0.2, rerank_score=2.0), _doc(2, "Abra o caixa.", similarity=0.9, rerank_score=1.0)]
+    assert [passage["id"] for passage in _packer().pack(results, "nota").passages] == [1, 2]
+
+
+def test_budget_always_includes_the_best_passage_and_drops_the_rest():
+    results = [_doc(i, f"{FILLER} Variação {i}.", similarity=1 - i / 10) for i in range(1, 5)]
+    packer = _packer(token_budget=200, max_passage_tokens=150, dedup_threshold=1.1)
+    packed = packer.pack(results, "cadastro do cliente")
+
+    assert packed.passages[0] == {"id": 1, "tokens": packed.passages[0]["tokens"], "trimmed": True}
+    assert packed.tokens <= 200
+    assert packed.dropped_budget == len(results) - len(packed.passages)
+    assert packed.original_tokens > packed.tokens
+    assert packer.stats()["requests"] == 1
+
+
+def test_packing_disabled_keeps_every_passage(monkeypatch):
+    monkeypatch.setattr(packer_module.settings, "CONTEXT_PACKING_ENABLED", False)
+    results = [_doc(1, FILLER, similarity=0.1), _doc(2, FILLER, similarity=0.9)]
+    packed = build_context(results, "cadastro", packer=_packer(token_budget=10))
+
+    assert [passage["id"] for passage in packed.passages] == [1, 2]
+    assert packed.tokens == packed.original_tokens
+    assert not any(passage["trimmed"] for passage in packed.passages)
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import tempfile
+from core import document_analyzer
+from core.document_analyzer import ADDED, UNCHANGED, ChunkDiff, chunk_content_hash
+from core.text_extraction import iter_spooled_chunks, spool_chunks
+from schemas.document import DocumentProcessRequest
+
+REQUEST = DocumentProcessRequest(titulo="Manual do PDV", subcategoria_id=1, url_arquivo="http://arquivos/pdv.pdf")
+
+
+def _chunk(texto: str):
+    return {"titulo": texto, "descricao": None, "solucao": texto, "palavras_chave": []}, texto
+
+
+def test_unchanged_chunks_reuse_the_stored_embedding(monkeypatch):
+    stored = {chunk_content_hash("Sangria do caixa"): [0.1, 0.2]}
+    sent = []
+
+    async def load_known_embeddings(content_hashes):
+        return {content_hash: stored[content_hash] for content_hash in content_hashes if content_hash in stored}
+
+    async def aembed_documents(texts):
+        sent.extend(texts)
+        return [[float(len(texto)), 0.0] for texto in texts]
+
+    monkeypatch.setattr(document_analyzer, "_load_known_embeddings", load_known_embeddings)
+    monkeypatch.setattr(document_analyzer.embeddings_model, "aembed_documents", aembed_documents)
+
+    # "Fechamento" tem hash conhecido, mas o embedding não está no banco: é gerado de novo
+    diff = ChunkDiff([chunk_content_hash("Sangria do caixa"), chunk_content_hash("Fechamento")])
+    batch = [_chunk("Sangria do caixa"), _chunk("Fechamento"), _chunk("Abertura do caixa")]
+    documents = asyncio.run(document_analyzer._embed_chunk_batch(REQUEST, batch, diff))
+
+    assert sent == ["Fechamento", "Abertura do caixa"]
+    assert [document["status"] for document in documents] == [UNCHANGED, UNCHANGED, ADDED]
+    assert [document["embedding"] for document in documents] == [[0.1, 0.2], [10.0, 0.0], [17.0, 0.0]]
+
+
+def test_long_manual_entry_is_a_single_chunk():
+    solucao = " ".join(f"Passo {i}: confira o cadastro do operador e salve a alteração." for i in range(400))
+    request = DocumentProcessRequest(titulo="Cadastro de operador", subcategoria_id=1, descricao="Passo a passo", solucao=solucao)
+    async def collect():
+        return [chunk async for chunk in document_analyzer._iter_prepared_chunks(request)]
+
+    chunks = asyncio.run(collect())
+
+    assert len(chunks) == 1
+    chunk_data, _ = chunks[0]
+    assert chunk_data["titulo"] == "Cadastro de operador"
+    assert chunk_data["solucao"] == solucao
+
+
+def test_file_chunks_are_read_one_batch_at_a_time(monkeypatch):
+    read, embedded_before_last_read, spools = [], [], []
+
+    async def download(url):
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            return file.name
+
+    async def run(func, file_path, file_name, request_data, spool_path):
+        # No lugar do Unstructured: seis seções gravadas pelo mesmo caminho do pool
+        spools.append(spool_path)
+        return spool_chunks((_chunk(f"Seção {i}") for i in range(6)), spool_path)
+
+    def counted(spool):
+        for chunk in iter_spooled_chunks(spool):
+            read.append(chunk[1])
+            yield chunk
+
+    async def aembed_documents(texts):
+        embedded_before_last_read.append(len(read))
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(document_analyzer, "_download_to_temp_file", download)
+    monkeypatch.setattr(document_analyzer.partition_pool, "run", run)
+    monkeypatch.setattr(document_analyzer, "iter_spooled_chunks", counted)
+    monkeypatch.setattr(document_analyzer.embeddings_model, "aembed_documents", aembed_documents)
+
+    async def consume():
+        documents = document_analyzer.iter_processed_documents(REQUEST, batch_size=2)
+        first = await documents.__anext__()
+        read_at_first = len(read)
+        return first, read_at_first, [first] + [document async for document in documents]
+
+    first, read_at_first, documents = asyncio.run(consume())
+    assert first["titulo"] == "Seção 0"
+    # O primeiro documento sai depois de ler só o primeiro lote do arquivo de chunks
+    assert read_at_first == 2
+    assert embedded_before_last_read == [2, 4, 6]
+    assert [document["titulo"] for document in documents] == [f"Seção {i}" for i in range(6)]
+    assert not os.path.exists(spools[0])
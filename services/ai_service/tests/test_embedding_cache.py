@@ -0,0 +1,146 @@
+import asyncio
+import json
+import fakeredis
+import httpx
+import numpy as np
+from models.loader import EmbeddingCache, GoogleEmbeddingWrapper
+
+MODEL = "models/embedding-001"
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    """FakeAsyncRedis que conta as idas ao servidor por comando."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+
+    async def execute_command(self, *args, **options):
+        self.commands.append(args[0])
+        return await super().execute_command(*args, **options)
+
+
+def _key(text: str, task_type: str = "RETRIEVAL_QUERY"):
+    return EmbeddingCache.make_key(MODEL, task_type, text)
+
+
+def test_shared_tier_stores_float32_bytes_with_ttl():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        writer = EmbeddingCache(max_entries=10, redis_client=fakeredis.FakeAsyncRedis(server=server), ttl_seconds=60)
+        await writer.set(_key("Como emitir a nota?"), [0.5, -1.25, 3.0])
+
+        redis = fakeredis.FakeAsyncRedis(server=server)
+        stored = await redis.get(writer._redis_key(_key("Como emitir a nota?")))
+        ttl = await redis.ttl(writer._redis_key(_key("Como emitir a nota?")))
+
+        # Outro processo (memória vazia) encontra o vetor na camada compartilhada
+        reader = EmbeddingCache(max_entries=10, redis_client=redis, ttl_seconds=60)
+        vector = await reader.get(_key("  como EMITIR a nota? "))
+        return stored, ttl, vector, reader.stats()
+
+    stored, ttl, vector, stats = asyncio.run(scenario())
+    assert stored == np.asarray([0.5, -1.25, 3.0], dtype="<f4").tobytes()
+    assert 0 < ttl <= 60
+    assert vector == [0.5, -1.25, 3.0]
+    assert (stats["redis_hits"], stats["memory_hits"], stats["misses"]) == (1, 0, 0)
+
+
+def test_memory_tier_is_a_bounded_lru():
+    async def scenario():
+        cache = EmbeddingCache(max_entries=2)
+        await cache.set(_key("a"), [1.0])
+        await cache.set(_key("b"), [2.0])
+        await cache.get(_key("a"))
+        await cache.set(_key("c"), [3.0])
+        return [await cache.get(_key(text)) for text in "abc"], cache.stats()
+
+    vectors, stats = asyncio.run(scenario())
+    assert vectors == [[1.0], None, [3.0]]
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_batch_lookup_uses_a_single_mget():
+    async def scenario():
+        redis = CountingRedis()
+        seeded = EmbeddingCache(max_entries=10, redis_client=redis)
+        await seeded.set(_key("em cache 1", "RETRIEVAL_DOCUMENT"), [1.0, 1.0])
+        await seeded.set(_key("em cache 2", "RETRIEVAL_DOCUMENT"), [2.0, 2.0])
+        redis.commands.clear()
+
+        requested = []
+
+        def gemini(request: httpx.Request) -> httpx.Response:
+            texts = [item["content"]["parts"][0]["text"] for item in json.loads(request.read())["requests"]]
+            requested.extend(texts)
+            return httpx.Response(200, json={"embeddings": [{"values": [9.0, float(i)]} for i in range(len(texts))]})
+
+        cache = EmbeddingCache(max_entries=10, redis_client=redis)
+        wrapper = GoogleEmbeddingWrapper(api_key="test", model_name=MODEL, base_url="http://gemini.test", cache=cache)
+        wrapper._async_client = httpx.AsyncClient(base_url="http://gemini.test", transport=httpx.MockTransport(gemini))
+        texts = ["em cache 1", "novo 1", "em cache 2", "novo 2"]
+        vectors = await wrapper.aembed_documents(texts)
+        reads = list(redis.commands)
+        stored = [await redis.get(cache._redis_key(_key(text, "RETRIEVAL_DOCUMENT"))) for text in ("novo 1", "novo 2")]
+        return reads, stored, requested, vectors, cache.stats()
+
+    reads, stored, requested, vectors, stats = asyncio.run(scenario())
+    # Uma única ida ao Redis para a leitura; as gravações vão por pipeline
+    assert reads == ["MGET"]
+    assert all(stored)
+    assert requested == ["novo 1", "novo 2"]
+    assert vectors == [[1.0, 1.0], [9.0, 0.0], [2.0, 2.0], [9.0, 1.0]]
+    assert (stats["redis_hits"], stats["misses"]) == (2, 2)
+
+
+def test_redis_failures_degrade_to_misses():
+    class BrokenRedis:
+        async def get(self, key):
+            raise ConnectionError("redis fora do ar")
+
+        async def mget(self, keys):
+            raise ConnectionError("redis fora do ar")
+
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis fora do ar")
+
+    async def scenario():
+        cache = EmbeddingCache(max_entries=10, redis_client=BrokenRedis())
+        missing = await cache.get_many([_key("a"), _key("b")])
+        await cache.set(_key("a"), [1.0])
+        return missing, await cache.get(_key("a")), cache.stats()
+
+    missing, vector, stats = asyncio.run(scenario())
+    assert missing == [None, None]
+    assert vector == [1.0]
+    assert stats["redis_errors"] == 2
+    assert stats["misses"] == 2
+
+
+def test_large_batch_is_throttled_and_retries_rate_limits():
+    async def scenario():
+        in_flight, peak, calls = [0], [0], []
+
+        async def gemini(request: httpx.Request) -> httpx.Response:
+            texts = [item["content"]["parts"][0]["text"] for item in json.loads(request.read())["requests"]]
+            calls.append(len(texts))
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return httpx.Response(200, json={"embeddings": [{"values": [float(text)]} for text in texts]})
+
+        wrapper = GoogleEmbeddingWrapper(api_key="test", model_name=MODEL, base_url="http://gemini.test", max_concurrent_requests=2)
+        wrapper._async_client = httpx.AsyncClient(base_url="http://gemini.test", transport=httpx.MockTransport(gemini))
+        vectors = await wrapper.aembed_documents([str(i) for i in range(450)])
+        return vectors, peak[0], calls, wrapper.api_stats()
+
+    vectors, peak, calls, stats = asyncio.run(scenario())
+    # Cinco chamadas de até 100 textos, no máximo duas ao mesmo tempo; a que levou 429 foi repetida
+    assert vectors == [[float(i)] for i in range(450)]
+    assert peak == 2
+    assert len(calls) == 6
+    assert stats["throttled"] == 1
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import httpx
+from config.settings import settings
+from models.loader import API_MAX_BATCH_SIZE, GoogleEmbeddingWrapper
+
+MODEL = "models/embedding-001"
+
+
+class RecordingGemini:
+    """API REST do Gemini: guarda cada requisição e devolve vetores que identificam o texto."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.read())
+        self.requests.append((request.url.path, request.headers.get("x-goog-api-key"), body))
+        if request.url.path.endswith(":embedContent"):
+            return httpx.Response(200, json={"embedding": {"values": [float(len(body["content"]["parts"][0]["text"]))]}})
+        return httpx.Response(200, json={"embeddings": [{"values": [float(item["content"]["parts"][0]["text"])]} for item in body["requests"]]})
+
+
+def _wrapper(api: RecordingGemini) -> GoogleEmbeddingWrapper:
+    wrapper = GoogleEmbeddingWrapper(api_key="chave", model_name="embedding-001", base_url="http://gemini.test")
+    wrapper._async_client = httpx.AsyncClient(base_url="http://gemini.test", headers={"x-goog-api-key": "chave"},
+                                              transport=httpx.MockTransport(api))
+    return wrapper
+
+
+def test_query_embedding_uses_the_async_rest_client():
+    api = RecordingGemini()
+    vector = asyncio.run(_wrapper(api).aembed_query("Como emitir a nota?"))
+
+    assert vector == [19.0]
+    [(path, api_key, body)] = api.requests
+    assert path == f"/{MODEL}:embedContent"
+    assert api_key == "chave"
+    assert body == {"model": MODEL, "content": {"parts": [{"text": "Como emitir a nota?"}]}, "taskType": "RETRIEVAL_QUERY"}
+
+
+def test_document_embeddings_are_split_into_api_batches_in_order():
+    api = RecordingGemini()
+    texts = [str(i) for i in range(2 * API_MAX_BATCH_SIZE + 50)]
+    vectors = asyncio.run(_wrapper(api).aembed_documents(texts))
+
+    assert vectors == [[float(i)] for i in range(len(texts))]
+    assert [path for path, _, _ in api.requests] == [f"/{MODEL}:batchEmbedContents"] * 3
+    assert sorted(len(body["requests"]) for _, _, body in api.requests) == [50, API_MAX_BATCH_SIZE, API_MAX_BATCH_SIZE]
+    assert {item["taskType"] for _, _, body in api.requests for item in body["requests"]} == {"RETRIEVAL_DOCUMENT"}
+
+
+def test_async_engine_url_uses_asyncpg_with_the_same_credentials():
+    assert settings.ASYNC_DATABASE_URL == settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
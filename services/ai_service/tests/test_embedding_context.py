@@ -0,0 +1,87 @@
+import asyncio
+import httpx
+import pytest
+from models.loader import GoogleEmbeddingWrapper
+
+
+class FakeGemini:
+    """Endpoint embedContent da API Gemini: conta as chamadas por texto e pode falhar as primeiras."""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.calls = []
+        self.failures = failures
+        self.delay = delay
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        text = request.read().decode()
+        self.calls.append(text)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            return httpx.Response(503, json={"error": "indisponível"})
+        return httpx.Response(200, json={"embedding": {"values": [float(len(self.calls)), 0.0, 1.0]}})
+
+
+def _wrapper(api: FakeGemini) -> GoogleEmbeddingWrapper:
+    wrapper = GoogleEmbeddingWrapper(api_key="test", model_name="models/embedding-001", base_url="http://gemini.test")
+    wrapper._async_client = httpx.AsyncClient(base_url="http://gemini.test", transport=httpx.MockTransport(api))
+    return wrapper
+
+
+def test_cache_lookup_and_retrieval_share_one_call():
+    async def scenario():
+        api = FakeGemini()
+        context = _wrapper(api).request_context()
+        first = await context.aembed_query("Como emitir a nota fiscal?")
+        # A reescrita devolve a mesma pergunta (com outro espaçamento) para a recuperação
+        second = await context.aembed_query("  Como emitir a nota fiscal? ")
+        return api, context, first, second
+
+    api, context, first, second = asyncio.run(scenario())
+    assert first == second
+    assert len(api.calls) == 1
+    assert context.calls_by_text == {"Como emitir a nota fiscal?": 1}
+    assert context.stats() == {"calls": 1, "reused": 1, "distinct_texts": 1}
+
+
+def test_one_call_per_distinct_text():
+    async def scenario():
+        api = FakeGemini()
+        context = _wrapper(api).request_context()
+        for text in ("pergunta original", "pergunta reescrita", "pergunta original", "pergunta reescrita"):
+            await context.aembed_query(text)
+        return api, context
+
+    api, context = asyncio.run(scenario())
+    assert len(api.calls) == 2
+    assert set(context.calls_by_text.values()) == {1}
+    assert context.stats() == {"calls": 2, "reused": 2, "distinct_texts": 2}
+
+
+def test_concurrent_stages_share_the_call_in_flight():
+    async def scenario():
+        api = FakeGemini(delay=0.05)
+        context = _wrapper(api).request_context()
+        results = await asyncio.gather(*(context.aembed_query("pergunta") for _ in range(3)))
+        return api, context, results
+
+    api, context, results = asyncio.run(scenario())
+    assert len(api.calls) == 1
+    assert results[0] == results[1] == results[2]
+    assert context.stats()["calls"] == 1
+
+
+def test_failures_are_not_memoized():
+    async def scenario():
+        api = FakeGemini(failures=1)
+        context = _wrapper(api).request_context()
+        with pytest.raises(httpx.HTTPStatusError):
+            await context.aembed_query("pergunta")
+        vector = await context.aembed_query("pergunta")
+        return api, context, vector
+
+    api, context, vector = asyncio.run(scenario())
+    assert len(api.calls) == 2
+    assert vector == [2.0, 0.0, 1.0]
+    assert context.calls_by_text == {"pergunta": 2}
@@ -0,0 +1,121 @@
+import asyncio
+import contextlib
+import os
+import random
+import uuid
+import pytest
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from api.endpoints import rag
+from core import vector_index
+from core.filtered_search import EXACT_SCAN, PARTIAL_INDEX, FilteredSearchPlanner, partial_index_name, partial_index_predicate
+from core.vector_index import build_index_ddl, index_name
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL não configurada")
+
+DIMENSION = 8
+# Subcategorias de tamanhos bem diferentes: a grande tem índice parcial, as pequenas não
+SUBCATEGORY_SIZES = {1: 1500, 2: 40, 3: 3}
+
+
+def _vector(rng: random.Random) -> list:
+    return [rng.uniform(-1.0, 1.0) for _ in range(DIMENSION)]
+
+
+class FakeEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    async def aembed_query(self, text):
+        return self.vector
+
+
+@contextlib.asynccontextmanager
+async def _database():
+    """Tabela `documentos` mínima num schema descartável, com o codec do pgvector registrado."""
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(DATABASE_URL)
+    async with admin.begin() as connection:
+        await connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await connection.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_async_engine(DATABASE_URL, connect_args={"server_settings": {"search_path": f"{schema},public"}})
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_vector_codec(dbapi_connection, connection_record):
+        dbapi_connection.run_async(register_vector)
+
+    try:
+        rng = random.Random(7)
+        async with engine.begin() as connection:
+            await connection.execute(text(f"""
+                CREATE TABLE documentos (
+                    id serial PRIMARY KEY, titulo text, descricao text, solucao text, "urlArquivo" text,
+                    subcategoria_id integer, ativo boolean DEFAULT true, embedding vector({DIMENSION}),
+                    "updatedAt" timestamptz DEFAULT now()
+                )
+            """))
+            rows = [{"titulo": f"sub{sub}", "sub": sub, "embedding": _vector(rng)}
+                    for sub, size in SUBCATEGORY_SIZES.items() for _ in range(size)]
+            await connection.execute(text("""
+                INSERT INTO documentos (titulo, descricao, solucao, subcategoria_id, embedding)
+                VALUES (:titulo, '', '', :sub, :embedding)
+            """), rows)
+        yield engine
+    finally:
+        await engine.dispose()
+        async with admin.begin() as connection:
+            await connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+
+async def _create_index(engine, name: str, where: str | None = None):
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text(build_index_ddl("documentos", "embedding", "hnsw", "vector_cosine_ops", name, where=where)))
+
+
+def test_partial_index_does_not_count_as_the_global_index(monkeypatch):
+    monkeypatch.setattr(vector_index, "VECTOR_INDEXES", [("documentos", "embedding")])
+
+    async def scenario():
+        async with _database() as engine:
+            await _create_index(engine, partial_index_name("documentos", "hnsw", 1), partial_index_predicate(1))
+            async with engine.connect() as connection:
+                connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+                await vector_index._ensure_indexes(connection, "hnsw", "vector_cosine_ops")
+                return await vector_index._existing_indexes(connection, "documentos", "embedding")
+
+    indexes = asyncio.run(scenario())
+    assert [idx["index_name"] for idx in indexes] == [index_name("documentos", "embedding", "hnsw")]
+
+
+def test_filtered_search_returns_top_k_for_every_subcategory_size(monkeypatch):
+    planner = FilteredSearchPlanner(exact_max_rows=50, refresh_seconds=0)
+    monkeypatch.setattr(rag, "filtered_search_planner", planner)
+    monkeypatch.setattr(rag.settings, "RETRIEVAL_MODE", "vector")
+    monkeypatch.setattr(rag.settings, "RERANK_ENABLED", False)
+    monkeypatch.setattr(rag.settings, "VECTOR_REPLICA_ENABLED", False)
+    monkeypatch.setattr(rag.settings, "VECTOR_QUANTIZATION", "none")
+    top_k = 5
+
+    async def scenario():
+        async with _database() as engine:
+            await _create_index(engine, index_name("documentos", "embedding", "hnsw"))
+            await _create_index(engine, partial_index_name("documentos", "hnsw", 1), partial_index_predicate(1))
+            embeddings = FakeEmbeddings(_vector(random.Random(11)))
+            found = {}
+            for sub in SUBCATEGORY_SIZES:
+                async with engine.begin() as connection:
+                    results = await rag._perform_rag_retrieval("Como emitir a nota?", top_k, sub, embeddings, connection)
+                # "updatedAt" vem com cada resultado: é a versão da fonte guardada no cache semântico
+                assert all(row["updatedAt"] is not None for row in results or [])
+                found[sub] = [row["titulo"] for row in results or []]
+            return found
+
+    found = asyncio.run(scenario())
+    for sub, size in SUBCATEGORY_SIZES.items():
+        assert found[sub] == [f"sub{sub}"] * min(top_k, size)
+    assert planner.choose(1).strategy == PARTIAL_INDEX
+    assert planner.choose(2).strategy == EXACT_SCAN
@@ -0,0 +1,48 @@
+import re
+import pytest
+from core import hybrid_search
+from core.hybrid_search import build_search_query, search_params
+
+
+def _placeholders(sql: str) -> set:
+    # ":name" que não faz parte de um cast "::tipo"
+    return set(re.findall(r"(?<!:):([a-z_]+)", sql))
+
+
+def test_vector_query():
+    sql = build_search_query("vector", filtered=True)
+    assert "ORDER BY d.embedding <=> (:q_vector)::vector" in sql
+    assert "WHERE d.ativo = true AND d.subcategoria_id = :sub_id" in sql
+    assert _placeholders(sql) == {"q_vector", "sub_id", "top_k"}
+    assert "palavras_chave" in build_search_query("vector", filtered=False, with_keywords=True)
+
+
+def test_hybrid_query_filters_both_branches():
+    sql = build_search_query("hybrid", filtered=True)
+    assert sql.count("d.subcategoria_id = :sub_id") == 2
+    assert "plainto_tsquery('portuguese'" in sql
+    assert 'd."textoBusca" @@ consulta' in sql
+    assert "f.hybrid_score" in sql
+    assert _placeholders(sql) == {"q_vector", "q_text", "sub_id", "top_k", "candidates", "vector_weight", "text_weight", "rrf_k"}
+
+
+def test_inline_subcategory_replaces_the_parameter():
+    sql = build_search_query("hybrid", filtered=True, inline_subcategory=7)
+    assert sql.count("d.subcategoria_id = 7") == 2
+    assert "sub_id" not in _placeholders(sql)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        build_search_query("bm25", filtered=False)
+
+
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+def test_params_cover_the_query_placeholders(monkeypatch, mode):
+    monkeypatch.setattr(hybrid_search.settings, "HYBRID_CANDIDATES", 40)
+    params = search_params(mode, [0.1, 0.2], "Como emitir a NF-e?", 5, subcategoria_id=3)
+    assert set(params) == _placeholders(build_search_query(mode, filtered=True))
+    assert params["top_k"] == 5
+    if mode == "hybrid":
+        assert (params["q_text"], params["candidates"]) == ("Como emitir a NF-e?", 40)
+    assert "sub_id" not in search_params(mode, [0.1], "", 5, subcategoria_id=None)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import fakeredis
+from core import jobs
+from core.jobs import QUEUED, RUNNING, SUCCEEDED, RedisJobBackend, recover_stale_jobs, submit_job
+from schemas.document import DocumentProcessRequest
+
+FILE_REQUEST = DocumentProcessRequest(titulo="Manual do PDV", subcategoria_id=1, url_arquivo="http://arquivos/pdv.pdf")
+MANUAL_REQUEST = DocumentProcessRequest(titulo="Sangria", subcategoria_id=1, solucao="Abra o caixa e escolha Sangria.")
+
+
+def _backend(server):
+    return RedisJobBackend(fakeredis.FakeAsyncRedis(server=server), lease_seconds=60)
+
+
+def test_dead_worker_job_goes_back_to_the_queue():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        api, dead_worker, live_worker = _backend(server), _backend(server), _backend(server)
+        job = await submit_job(api, FILE_REQUEST)
+
+        # O worker pega o job e morre sem ack; o lease expira
+        job_id, _ = await dead_worker.dequeue(timeout=1)
+        await api.save(job_id, {**job, "status": RUNNING})
+        await api.redis.delete(api._lease_key(job_id))
+
+        # Reenviar o documento recupera o job órfão em vez de devolver um RUNNING eterno
+        resubmitted = await submit_job(api, FILE_REQUEST)
+        item = await live_worker.dequeue(timeout=1)
+        await live_worker.ack(job_id)
+        return job_id, resubmitted, item, await api.redis.llen(api._processing), await recover_stale_jobs(api)
+
+    job_id, resubmitted, item, processing, requeued_again = asyncio.run(scenario())
+    assert resubmitted["status"] == QUEUED
+    assert item[0] == job_id
+    assert processing == 0
+    assert requeued_again == []
+
+
+def test_live_job_is_not_requeued():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        api, worker = _backend(server), _backend(server)
+        await submit_job(api, FILE_REQUEST)
+        await worker.dequeue(timeout=1)
+        return await recover_stale_jobs(api), await api.redis.llen(api._queue)
+
+    assert asyncio.run(scenario()) == ([], 0)
+
+
+def test_finished_file_job_is_processed_again():
+    async def scenario():
+        backend = _backend(fakeredis.FakeServer())
+        results = {}
+        for label, request in (("file", FILE_REQUEST), ("manual", MANUAL_REQUEST)):
+            job = await submit_job(backend, request)
+            await backend.save(job["job_id"], {**job, "status": SUCCEEDED})
+            results[label] = await submit_job(backend, request)
+        return results, await backend.redis.llen(backend._queue)
+
+    results, queued = asyncio.run(scenario())
+    # O arquivo pode ter mudado no mesmo url_arquivo; a entrada manual está inteira na requisição
+    assert results["file"]["status"] == QUEUED
+    assert results["manual"]["status"] == SUCCEEDED
+    assert queued == 3
+
+
+def test_job_interrupted_too_many_times_fails(monkeypatch):
+    monkeypatch.setattr(jobs.settings, "JOB_MAX_ATTEMPTS", 2)
+
+    async def scenario():
+        backend = _backend(fakeredis.FakeServer())
+        job = await submit_job(backend, FILE_REQUEST)
+        await backend.save(job["job_id"], {**job, "attempts": 2})
+        await jobs.run_job(backend, job["job_id"], FILE_REQUEST.model_dump())
+        return await backend.get(job["job_id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == jobs.FAILED
+    assert job["error_status_code"] == 500
+
+
+def test_job_moved_but_not_yet_leased_is_not_requeued():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        api, worker = _backend(server), _backend(server)
+        job = await submit_job(api, FILE_REQUEST)
+
+        # Estado entre o BLMOVE e o primeiro heartbeat do worker
+        await worker.redis.blmove(worker._queue, worker._processing, 1, "RIGHT", "LEFT")
+        during_move = await recover_stale_jobs(api)
+
+        # Sem lease por mais de lease_seconds: o worker morreu antes de começar
+        await api.redis.set(api._unleased_key(job["job_id"]), time.time() - api.lease_seconds - 1)
+        return job["job_id"], during_move, await recover_stale_jobs(api), await api.redis.llen(api._queue)
+
+    job_id, during_move, after_grace, queued = asyncio.run(scenario())
+    assert during_move == []
+    assert after_grace == [job_id]
+    assert queued == 1
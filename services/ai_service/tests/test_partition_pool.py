@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from core.partition_pool import PartitionPool
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def _crash():
+    os._exit(1)
+
+
+class LightPartitionPool(PartitionPool):
+    """Sem o aquecimento do Unstructured: os testes só executam funções deste módulo."""
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def _gather(pool: PartitionPool, culprit, *culprit_args):
+    await pool.start()
+    try:
+        # Um processo só: os documentos inocentes ficam na fila do pool atrás do problemático
+        culprit_run = asyncio.ensure_future(pool.run(culprit, *culprit_args))
+        await asyncio.sleep(0.2)
+        innocents = [pool.run(_sleep, 0.01) for _ in range(3)]
+        return await asyncio.gather(culprit_run, *innocents, return_exceptions=True)
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_recycles_once_and_resubmits_the_other_documents():
+    pool = LightPartitionPool(workers=1, max_concurrency=4, timeout=1.5)
+    results = asyncio.run(_gather(pool, _sleep, 30))
+
+    assert isinstance(results[0], TimeoutError)
+    assert results[1:] == [0.01, 0.01, 0.01]
+    assert pool.restarts == 1
+    assert pool.resubmitted == 3
+    assert (pool.timeouts, pool.failed, pool.completed) == (1, 0, 3)
+
+
+def test_crashing_document_fails_alone_after_its_retries():
+    pool = LightPartitionPool(workers=1, max_concurrency=4, timeout=30)
+    results = asyncio.run(_gather(pool, _crash))
+
+    assert isinstance(results[0], BrokenProcessPool)
+    assert results[1:] == [0.01, 0.01, 0.01]
+    assert pool.restarts == 3
+    assert pool.failed == 1
+    assert pool.completed == 3
+
+
+def test_thread_mode_runs_inline():
+    pool = PartitionPool(workers=0, max_concurrency=2, timeout=5)
+    assert asyncio.run(pool.run(_sleep, 0.01)) == 0.01
@@ -0,0 +1,94 @@
+import asyncio
+import time
+import fakeredis
+from core import pendencies
+from core.pendencies import InMemoryPendencyQueue, PendencyProcessor, RedisPendencyQueue, create_pendency_queue
+
+BAD_CONSULTA = 3
+
+
+def _processor(queue, monkeypatch, written):
+    processor = PendencyProcessor(queue, batch_size=16, flush_seconds=0.05, max_attempts=3)
+
+    async def process_batch(items):
+        # Simula uma violação de FK: o lote inteiro é uma transação e não grava nada
+        if any(item["consulta_id"] == BAD_CONSULTA for item in items):
+            raise RuntimeError("violates foreign key constraint")
+        written.extend(item["consulta_id"] for item in items)
+        return len(items)
+
+    monkeypatch.setattr(processor, "process_batch", process_batch)
+    return processor
+
+
+def test_bad_item_does_not_drop_the_rest_of_the_batch(monkeypatch):
+    written = []
+    processor = _processor(InMemoryPendencyQueue(), monkeypatch, written)
+
+    async def scenario():
+        for consulta_id in range(1, 6):
+            assert await processor.submit(f"Pergunta {consulta_id}", consulta_id)
+        stop = asyncio.Event()
+        worker = asyncio.create_task(processor.run(stop))
+        for _ in range(100):
+            if processor.dropped:
+                break
+            await asyncio.sleep(0.02)
+        stop.set()
+        await worker
+
+    asyncio.run(scenario())
+    assert sorted(written) == [1, 2, 4, 5]
+    stats = processor.stats()
+    assert stats["backend"] == "memory"
+    assert stats["queue_depth"] == 0
+    assert stats["retried"] == 2
+    assert stats["dropped"] == 1
+
+
+def test_without_durable_queue_submit_writes_synchronously(monkeypatch):
+    monkeypatch.setattr(pendencies.settings, "PENDENCY_QUEUE_BACKEND", "auto")
+    monkeypatch.setattr(pendencies.settings, "REDIS_URL", None)
+    written = []
+    processor = _processor(create_pendency_queue(), monkeypatch, written)
+
+    assert asyncio.run(processor.submit("Como emitir a NFC-e?", 1)) is False
+    assert written == [1]
+    assert processor.stats()["backend"] == "sync"
+
+
+def test_redis_is_the_default_when_configured(monkeypatch):
+    monkeypatch.setattr(pendencies.settings, "PENDENCY_QUEUE_BACKEND", "auto")
+    monkeypatch.setattr(pendencies.settings, "REDIS_URL", "redis://localhost:6379/0")
+    assert isinstance(create_pendency_queue(), RedisPendencyQueue)
+
+
+def test_batch_of_a_dead_worker_goes_back_to_the_queue(monkeypatch):
+    async def scenario():
+        server = fakeredis.FakeServer()
+        dead, live = (RedisPendencyQueue(fakeredis.FakeAsyncRedis(server=server), lease_seconds=60) for _ in range(2))
+        for consulta_id in (1, 2):
+            await dead.put({"question": f"Pergunta {consulta_id}", "consulta_id": consulta_id, "attempts": 0})
+
+        # O worker pega o lote e morre antes de gravar (sem ack); o lease expira
+        batch = await dead.take_batch(16, 0)
+        for item in batch:
+            await dead.redis.delete(dead._lease_key(item["message_id"]))
+        during_grace = await live.requeue_stale()
+        for item in batch:
+            await dead.redis.set(dead._unleased_key(item["message_id"]), time.time() - 61)
+
+        written = []
+        processor = _processor(live, monkeypatch, written)
+        recovered = await processor.recover_stale()
+        stop = asyncio.Event()
+        stop.set()
+        await processor.run(stop)
+        return batch, during_grace, recovered, written, await live.redis.llen(live._processing)
+
+    batch, during_grace, recovered, written, processing = asyncio.run(scenario())
+    assert [item["consulta_id"] for item in batch] == [1, 2]
+    assert during_grace == []
+    assert recovered == 2
+    assert sorted(written) == [1, 2]
+    assert processing == 0
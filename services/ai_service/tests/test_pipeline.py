@@ -0,0 +1,80 @@
+import asyncio
+import time
+import pytest
+from api.endpoints import rag
+from core.pipeline import StagedExecutor
+from schemas.document import AskRequest, ChatHistoryTurn
+
+
+async def _stage(value, seconds: float = 0.05):
+    await asyncio.sleep(seconds)
+    return value
+
+
+def test_started_stages_run_concurrently():
+    async def scenario():
+        async with StagedExecutor() as executor:
+            start = time.perf_counter()
+            executor.start("a", _stage("a"))
+            executor.start("b", _stage("b"))
+            results = [await executor.result("a"), await executor.result("b")]
+            return results, time.perf_counter() - start, executor
+
+    results, elapsed, executor = asyncio.run(scenario())
+    assert results == ["a", "b"]
+    assert elapsed < 0.09
+    assert set(executor.timings) == {"a", "b"}
+    assert executor.server_timing().startswith("a;dur=")
+
+
+def test_close_cancels_pending_stages_and_swallows_unread_failures():
+    async def failing():
+        raise RuntimeError("falha não lida")
+
+    async def scenario():
+        async with StagedExecutor() as executor:
+            slow = executor.start("slow", _stage("slow", 10))
+            executor.start("failing", failing())
+            await asyncio.sleep(0)
+        return slow, executor
+
+    slow, executor = asyncio.run(scenario())
+    assert slow.cancelled()
+    assert executor.breakdown()["cancelled"] == ["slow"]
+
+
+@pytest.mark.parametrize("rewritten, stages", [
+    # A reescrita devolveu a própria pergunta: a busca especulativa é aproveitada
+    ("E para cancelar?", {"cache", "rewrite", "retrieval_speculative"}),
+    ("Como cancelar a nota fiscal eletrônica?", {"cache", "rewrite", "retrieval_speculative", "retrieval"}),
+])
+def test_speculative_retrieval_is_reused_only_for_the_same_question(monkeypatch, rewritten, stages):
+    async def search_cache(*args):
+        return None
+
+    async def rewrite(request):
+        return rewritten
+
+    async def retrieval(question, *args):
+        await asyncio.sleep(0.01)
+        return [{"id": 1, "question": question}]
+
+    monkeypatch.setattr(rag.settings, "SPECULATIVE_RETRIEVAL", True)
+    monkeypatch.setattr(rag.settings, "SEMANTIC_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(rag, "_search_semantic_cache", search_cache)
+    monkeypatch.setattr(rag, "_rewrite_question_with_history", rewrite)
+    monkeypatch.setattr(rag, "_with_connection", lambda stage, *args: retrieval(*args))
+    request = AskRequest(question="E para cancelar?", subcategoria_id=None, chat_history=[
+        ChatHistoryTurn(pergunta="Como emitir a nota fiscal eletrônica?", texto_resposta="Acesse Fiscal > NF-e.")
+    ])
+
+    async def scenario():
+        async with StagedExecutor() as executor:
+            result = await rag._run_retrieval_stages(request, None, executor)
+        return result, executor
+
+    (cached, final_question, results), executor = asyncio.run(scenario())
+    assert cached is None
+    assert final_question == rewritten
+    assert results == [{"id": 1, "question": rewritten}]
+    assert set(executor.timings) | set(executor.cancelled) == stages
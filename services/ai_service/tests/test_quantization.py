@@ -0,0 +1,41 @@
+import pytest
+from core import hybrid_search, quantization
+from core.hybrid_search import build_search_query, search_params
+from core.quantization import candidate_source, quantized_expression, quantized_opclass, rescore_limit
+from core.vector_index import build_index_ddl
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    monkeypatch.setattr(quantization.settings, "EMBEDDING_DIMENSION", 768)
+    monkeypatch.setattr(quantization.settings, "QUANTIZED_CANDIDATES", 100)
+    monkeypatch.setattr(hybrid_search.settings, "HYBRID_CANDIDATES", 40)
+
+
+def test_without_quantization_the_table_is_searched_directly():
+    assert candidate_source("documentos", "d.ativo = true", "none") == ("documentos d", "d.ativo = true")
+    assert ":rescore_limit" not in build_search_query("hybrid", filtered=True)
+    assert "rescore_limit" not in search_params("hybrid", [0.1], "nota", 5, None)
+
+
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+@pytest.mark.parametrize("method, operator", [("halfvec", "<=>"), ("bit", "<~>")])
+def test_quantized_query_prefilters_by_the_indexed_expression(mode, method, operator):
+    sql = build_search_query(mode, filtered=True, quantization=method)
+    ddl = build_index_ddl("documentos", quantized_expression("embedding", method), "hnsw", quantized_opclass(method), "idx")
+
+    # O ORDER BY da pré-seleção usa exatamente a expressão do índice (senão o planner não o usa)
+    expression = quantized_expression("d.embedding", method)
+    assert f"ORDER BY {expression} {operator}" in sql
+    assert f"({expression.replace('d.embedding', 'embedding')} {quantized_opclass(method)})" in ddl
+    assert "LIMIT :rescore_limit" in sql
+    assert "JOIN documentos d ON d.id = candidatos.id" in sql
+    # O filtro vai para dentro da pré-seleção; a ordem final é a distância exata
+    assert "WHERE d.ativo = true AND d.subcategoria_id = :sub_id\n" in sql
+    assert "(1 - (d.embedding <=> (:q_vector)::vector)) AS similarity" in sql
+
+
+@pytest.mark.parametrize("mode, limit, expected", [("vector", 5, 100), ("vector", 150, 150), ("hybrid", 5, 100)])
+def test_rescore_limit_covers_the_requested_candidates(mode, limit, expected):
+    params = search_params(mode, [0.1], "nota", limit, None, quantization="halfvec")
+    assert params["rescore_limit"] == expected == rescore_limit(limit if mode == "vector" else params["candidates"])
@@ -0,0 +1,22 @@
+import pytest
+from core.query_rewrite import classify
+
+PREVIOUS = "Como emitir a nota fiscal eletrônica?"
+
+
+@pytest.mark.parametrize("question", [
+    "Como faço o mesmo para NFC-e?",
+    "Como faço a mesma coisa no PDV novo?",
+    "Qual o procedimento no caso de rejeição?",
+])
+def test_anaphoric_follow_up_is_rewritten(question):
+    assert classify(question, PREVIOUS, min_terms=3, overlap_threshold=0.6) == (True, "deixis")
+
+
+@pytest.mark.parametrize("question", [
+    "Como alterar o preço de venda de vários produtos ao mesmo tempo?",
+    "Em caso de erro na emissão, como reenviar a nota fiscal?",
+    "Caso o boleto vença, como gerar a segunda via?",
+])
+def test_idioms_are_not_anaphors(question):
+    assert classify(question, PREVIOUS, min_terms=3, overlap_threshold=0.6) == (False, "self_contained")
@@ -0,0 +1,25 @@
+import struct
+import numpy as np
+from pgvector import Vector
+from config import database
+from config.settings import settings
+from core.vector_index import query_vector
+
+
+def test_query_vector_is_sent_in_the_binary_format():
+    vector = query_vector([1.0, 2.5])
+    assert isinstance(vector, Vector)
+    # Formato binário do pgvector: dimensão (int16), reservado (int16) e float32 big-endian
+    assert vector.to_binary() == struct.pack(">HH2f", 2, 0, 1.0, 2.5)
+    assert query_vector(np.array([1.0, 2.5], dtype=np.float64)).to_binary() == vector.to_binary()
+    assert query_vector(vector) is vector
+
+
+def test_both_engines_share_the_pool_settings():
+    for engine in (database.engine, database.async_engine):
+        pool = engine.pool
+        assert pool.size() == settings.DB_POOL_SIZE
+        assert pool._max_overflow == settings.DB_MAX_OVERFLOW
+        assert pool._timeout == settings.DB_POOL_TIMEOUT
+        assert pool._recycle == settings.DB_POOL_RECYCLE_SECONDS
+        assert pool._pre_ping == settings.DB_POOL_PRE_PING
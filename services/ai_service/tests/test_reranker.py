@@ -0,0 +1,46 @@
+import pytest
+from core.reranker import Reranker, bm25_scores, reciprocal_rank_fusion, _document_terms
+
+CANDIDATES = [
+    {"id": 1, "titulo": "Emissão de NF-e", "descricao": "", "solucao": "Menu Fiscal.", "palavras_chave": ["nota"], "similarity": 0.9},
+    {"id": 2, "titulo": "Cadastro de cliente", "descricao": "", "solucao": "Menu Clientes.", "palavras_chave": [], "similarity": 0.8},
+    {"id": 3, "titulo": "Sangria do caixa", "descricao": "Retirada de valores", "solucao": "Abra o caixa e escolha Sangria.",
+     "palavras_chave": ["sangria", "caixa"], "similarity": 0.7},
+]
+
+
+def test_bm25_prefers_documents_with_more_query_terms():
+    documents = [_document_terms(doc) for doc in CANDIDATES]
+    scores = bm25_scores(["sangria", "caixa"], documents)
+    assert scores[2] > 0 and scores[0] == scores[1] == 0
+    assert bm25_scores(["sangria"], []) == []
+
+
+def test_title_weighs_more_than_solution():
+    documents = [_document_terms({"titulo": "sangria"}), _document_terms({"solucao": "sangria"}),
+                 _document_terms({"solucao": "outro"})]
+    scores = bm25_scores(["sangria"], documents)
+    assert scores[0] > scores[1] > scores[2]
+
+
+def test_reciprocal_rank_fusion():
+    assert reciprocal_rank_fusion([0, 1], [1, 0], k=1) == [1 / 2 + 1 / 3, 1 / 3 + 1 / 2]
+    assert reciprocal_rank_fusion([2, 0, 1], k=0) == [1 / 2, 1 / 3, 1.0]
+
+
+# Com RRF o candidato mais similar ainda fica à frente; o match léxico sobe para o top_k
+@pytest.mark.parametrize("fusion, expected", [("bm25", [3, 1]), ("rrf", [1, 3])])
+def test_lexical_match_is_promoted_from_the_overfetch(fusion, expected):
+    reranker = Reranker(fusion=fusion, rrf_k=1)
+    reranked = reranker.rerank("Como fazer a sangria do caixa?", CANDIDATES, top_k=2)
+
+    assert [doc["id"] for doc in reranked] == expected
+    assert all("rerank_score" in doc for doc in reranked)
+    assert "rerank_score" not in CANDIDATES[2]
+    assert reranker.stats()["promoted_from_overfetch"] == 1
+
+
+def test_rrf_falls_back_to_vector_order_without_lexical_matches():
+    reranked = Reranker(fusion="rrf", rrf_k=60).rerank("impressora térmica", CANDIDATES, top_k=3)
+    assert [doc["id"] for doc in reranked] == [1, 2, 3]
+    assert Reranker(fusion="rrf", rrf_k=60).rerank("impressora", [], top_k=3) == []
@@ -0,0 +1,170 @@
+import asyncio
+import contextlib
+import datetime
+import hashlib
+from types import SimpleNamespace
+import fakeredis
+import numpy as np
+from fastapi import Response
+from api.endpoints import pendencies, rag
+from core.semantic_cache import NEGATIVE_FEEDBACK, SOURCE_CHANGED, SemanticAnswerCache
+from models.loader import EmbeddingContext
+from schemas.document import AskRequest, ChatHistoryTurn, PendenciaRequest, RespostaFormatada
+
+ANSWER = {"texto_resposta": "Abra o caixa e escolha Sangria.", "source_document_id": 7,
+          "source_document_url": None, "source_document_title": "Sangria"}
+
+
+def _cache(server):
+    return SemanticAnswerCache(max_entries=100, ttl_seconds=0, threshold=0.95,
+                               redis_client=fakeredis.FakeAsyncRedis(server=server))
+
+
+def test_negative_feedback_invalidates_every_worker():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        this_worker, other_worker = _cache(server), _cache(server)
+        embedding = np.random.default_rng(3).standard_normal(16)
+        for cache in (this_worker, other_worker):
+            cache.store(embedding, 2, ANSWER)
+
+        stop = asyncio.Event()
+        listener = asyncio.create_task(other_worker.listen(stop))
+        await asyncio.sleep(0.1)  # tempo para a assinatura do canal
+        removed = await this_worker.invalidate_everywhere(embedding, 2)
+        for _ in range(50):
+            if not len(other_worker):
+                break
+            await asyncio.sleep(0.02)
+        stop.set()
+        await listener
+        return removed, other_worker.lookup(embedding, 2), other_worker.stats()
+
+    removed, cached, stats = asyncio.run(scenario())
+    assert removed == 1
+    assert cached is None
+    assert stats["remote_invalidations"] == 1
+    assert stats["removed"] == {NEGATIVE_FEEDBACK: 1}
+
+
+def test_invalidation_without_redis_is_local():
+    cache = SemanticAnswerCache(max_entries=100, ttl_seconds=0, threshold=0.95)
+    embedding = np.random.default_rng(5).standard_normal(16)
+    cache.store(embedding, None, ANSWER)
+    assert asyncio.run(cache.invalidate_everywhere(embedding)) == 1
+    assert cache.lookup(embedding) is None
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Responde à consulta de `validate` com o "updatedAt" atual de cada documento fonte."""
+
+    def __init__(self, versions: dict):
+        self.versions = versions
+
+    async def execute(self, query, params):
+        return _Rows([SimpleNamespace(id=id, updatedAt=self.versions[id]) for id in params["ids"] if id in self.versions])
+
+
+def test_source_edited_right_after_the_answer_invalidates_it():
+    read_with_answer = datetime.datetime(2026, 10, 1, 12, 0, 0)
+    edited = read_with_answer + datetime.timedelta(seconds=5)
+    cache = SemanticAnswerCache(max_entries=100, ttl_seconds=0, threshold=0.95)
+    embedding = np.random.default_rng(9).standard_normal(16)
+    cache.store(embedding, None, ANSWER, source_version=read_with_answer)
+
+    # A fonte foi editada antes da primeira validação: a resposta não sobrevive a ela
+    removed = asyncio.run(cache.validate(FakeConnection({7: edited})))
+    assert removed == 1
+    assert cache.lookup(embedding) is None
+    assert cache.stats()["removed"] == {SOURCE_CHANGED: 1}
+
+
+def _text_vector(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha1(text.strip().encode("utf-8")).digest()[:4], "big")
+    return list(np.random.default_rng(seed).standard_normal(16))
+
+
+class FakeEmbeddingModel:
+    async def aembed_query(self, text):
+        return _text_vector(text)
+
+    def request_context(self):
+        return EmbeddingContext(self)
+
+
+class FakeConsultaConnection:
+    """`chat_consultas` com o embedding que o backend salva: o da pergunta original."""
+
+    def __init__(self, question: str, subcategoria_id: int):
+        self.row = SimpleNamespace(embedding=_text_vector(question), subcategoria_id=subcategoria_id)
+
+    async def execute(self, query, params):
+        return SimpleNamespace(first=lambda: self.row)
+
+
+def test_rewritten_follow_up_is_invalidated_by_the_pendencies_path(monkeypatch):
+    question, rewritten = "E para cancelar?", "Como cancelar a nota fiscal eletrônica?"
+    cache = SemanticAnswerCache(max_entries=100, ttl_seconds=0, threshold=0.95)
+    source = {"id": 7, "titulo": "Cancelamento", "urlArquivo": None, "updatedAt": datetime.datetime(2026, 10, 1)}
+
+    async def rewrite(request):
+        return rewritten
+
+    async def retrieval(*args):
+        return [source]
+
+    async def generate(context, final_question):
+        assert final_question == rewritten
+        return RespostaFormatada(resposta_texto="Use a opção Cancelar NF-e.", id_fonte=7)
+
+    @contextlib.asynccontextmanager
+    async def connect():
+        yield FakeConsultaConnection(question, 2)
+
+    monkeypatch.setattr(rag, "semantic_cache", cache)
+    monkeypatch.setattr(pendencies, "semantic_cache", cache)
+    monkeypatch.setattr(rag, "embeddings_model", FakeEmbeddingModel())
+    monkeypatch.setattr(rag, "_rewrite_question_with_history", rewrite)
+    monkeypatch.setattr(rag, "_perform_rag_retrieval", retrieval)
+    monkeypatch.setattr(rag, "_pack_context", lambda rag_results, final_question: SimpleNamespace(text="", tokens=0))
+    monkeypatch.setattr(rag, "_generate_final_answer", generate)
+    monkeypatch.setattr(rag, "_with_connection", lambda stage, *args: stage(*args, None))
+    monkeypatch.setattr(pendencies, "async_engine", SimpleNamespace(connect=connect))
+    monkeypatch.setattr(rag.settings, "SEMANTIC_CACHE_BACKEND", "memory")
+
+    request = AskRequest(question=question, subcategoria_id=2, chat_history=[
+        ChatHistoryTurn(pergunta="Como emitir a nota fiscal eletrônica?", texto_resposta="Acesse Fiscal > NF-e.")
+    ])
+    answer = asyncio.run(rag.ask_question(request, Response()))
+    assert answer["source_document_id"] == 7
+    assert cache.lookup(_text_vector(question), 2) is not None
+
+    removed = asyncio.run(pendencies._invalidate_cached_answer(PendenciaRequest(question=question, consulta_id=1)))
+    assert removed == 1
+    assert len(cache) == 0
+
+
+def test_memory_cache_hit_does_not_check_out_a_connection(monkeypatch):
+    cache = SemanticAnswerCache(max_entries=100, ttl_seconds=0, threshold=0.95)
+    question = "Como fazer a sangria do caixa?"
+    cache.store(_text_vector(question), None, ANSWER)
+
+    def connect():
+        raise AssertionError("a busca no cache em memória não deve abrir conexão")
+
+    monkeypatch.setattr(rag, "semantic_cache", cache)
+    monkeypatch.setattr(rag, "embeddings_model", FakeEmbeddingModel())
+    monkeypatch.setattr(rag, "async_engine", SimpleNamespace(connect=connect))
+    monkeypatch.setattr(rag.settings, "SEMANTIC_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(rag.settings, "SPECULATIVE_RETRIEVAL", False)
+
+    answer = asyncio.run(rag.ask_question(AskRequest(question=question, subcategoria_id=None), Response()))
+    assert answer["answer"] == ANSWER["texto_resposta"]
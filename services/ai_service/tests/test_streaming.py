@@ -0,0 +1,34 @@
+import json
+import pytest
+from api.endpoints.rag import _SourceMarkerParser, _sse_event
+
+
+def _stream(chunks):
+    parser = _SourceMarkerParser()
+    emitted = [parser.feed(chunk) for chunk in chunks]
+    rest, answer, source_id = parser.finish()
+    return emitted, rest, answer, source_id
+
+
+@pytest.mark.parametrize("chunks", [
+    ["Abra o caixa e escolha Sangria.\n[[FONTE: 7]]"],
+    ["Abra o caixa ", "e escolha Sangria.\n[", "[FON", "TE: ", "7]", "]"],
+    ["Abra o caixa e escolha Sangria.\n[[FONTE:7]]", "\n"],
+])
+def test_source_marker_is_never_streamed(chunks):
+    emitted, rest, answer, source_id = _stream(chunks)
+    assert "[" not in "".join(emitted) + rest
+    assert answer == "Abra o caixa e escolha Sangria."
+    assert source_id == 7
+
+
+def test_text_that_only_looks_like_the_marker_is_released():
+    # "[" retido enquanto podia ser o início do marcador; liberado quando deixa de ser
+    emitted, rest, answer, source_id = _stream(["Veja o item [", "2] do manual."])
+    assert emitted == ["Veja o item ", "[2] do manual."]
+    assert (rest, answer, source_id) == ("", "Veja o item [2] do manual.", 0)
+
+
+def test_sse_event_format():
+    assert _sse_event("token", {"text": "Olá, operação"}) == 'event: token\ndata: {"text": "Olá, operação"}\n\n'
+    assert json.loads(_sse_event("final", {"source_document_id": 7}).split("data: ")[1]) == {"source_document_id": 7}
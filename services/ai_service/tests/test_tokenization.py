@@ -0,0 +1,65 @@
+import pytest
+from core.text_extraction import iter_prepared_chunks
+from core.tokenization import estimate_tokens, split_by_token_budget, split_sentences
+from schemas.document import DocumentProcessRequest
+
+SENTENCES = [f"Passo {i}: confira o valor do campo." for i in range(1, 13)]
+TEXT = " ".join(SENTENCES)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    # "emissão"(2) + "da"(1) + "NF"(1) + "-"(1) + "e"(1) + "."(1)
+    assert estimate_tokens("emissão da NF-e.") == 7
+
+
+def test_short_text_is_a_single_piece():
+    assert split_by_token_budget(TEXT, estimate_tokens(TEXT)) == [TEXT]
+    assert split_by_token_budget(TEXT, 0) == [TEXT]
+
+
+@pytest.mark.parametrize("overlap_tokens", [0, 10, 25])
+def test_pieces_respect_the_budget_and_cover_every_sentence(overlap_tokens):
+    max_tokens = 3 * estimate_tokens(SENTENCES[0])
+    pieces = split_by_token_budget(TEXT, max_tokens, overlap_tokens)
+
+    assert len(pieces) > 1
+    assert all(estimate_tokens(piece) <= max_tokens for piece in pieces)
+    assert all(split_sentences(piece)[0] in SENTENCES for piece in pieces)
+    # Sem repetições fora da sobreposição: as sentenças aparecem em ordem, do início ao fim
+    seen = [sentence for piece in pieces for sentence in split_sentences(piece)]
+    assert list(dict.fromkeys(seen)) == SENTENCES
+
+
+def test_overlap_repeats_the_last_sentences_of_the_previous_piece():
+    sentence_tokens = estimate_tokens(SENTENCES[0])
+    without = split_by_token_budget(TEXT, 3 * sentence_tokens)
+    with_overlap = split_by_token_budget(TEXT, 3 * sentence_tokens, overlap_tokens=sentence_tokens)
+
+    assert not any(set(split_sentences(a)) & set(split_sentences(b)) for a, b in zip(without, without[1:]))
+    for previous, piece in zip(with_overlap, with_overlap[1:]):
+        assert split_sentences(piece)[0] == split_sentences(previous)[-1]
+    assert len(with_overlap) > len(without)
+
+
+def test_sentence_longer_than_the_budget_is_split_between_words():
+    long_sentence = " ".join(["parâmetro"] * 40) + "."
+    pieces = split_by_token_budget(long_sentence, 12)
+    assert all(estimate_tokens(piece) <= 12 for piece in pieces)
+    assert " ".join(pieces) == long_sentence
+
+
+def test_oversized_block_becomes_labelled_parts():
+    request = DocumentProcessRequest(titulo="Manual", subcategoria_id=1, palavras_chave=["caixa"])
+    block = f"# Fechamento do caixa\nDescrição: conferência diária\nSolução: {TEXT}\nPalavras-chave: caixa, sangria"
+    chunks = list(iter_prepared_chunks(request, ["", block, "# Curto\nSolução: ok"], max_tokens=80, overlap_tokens=10))
+
+    *parts, (short, _) = chunks
+    total = len(parts)
+    assert total > 1
+    for index, (chunk_data, texto_para_embedding) in enumerate(parts, start=1):
+        assert chunk_data["titulo"] == f"Fechamento do caixa (parte {index}/{total})"
+        assert chunk_data["descricao"] == "conferência diária"
+        assert chunk_data["palavras_chave"] == ["caixa", "sangria"]
+        assert estimate_tokens(texto_para_embedding) <= 80
+    assert short["titulo"] == "Curto"
@@ -0,0 +1,51 @@
+import base64
+import json
+import msgpack
+import pytest
+from core.vector_codec import decode_vector, encode_vector, negotiate_vector_format, render
+
+
+@pytest.mark.parametrize("accept, vector_dtype, allow_octet, expected", [
+    (None, None, False, ("json", None, "json-float")),
+    ("application/json", "float16", False, ("json", "float16", "float16-le")),
+    ("application/msgpack", None, False, ("msgpack", "float32", "float32-le")),
+    ("Application/X-Msgpack;q=0.9, application/json", "float16", False, ("msgpack", "float16", "float16-le")),
+    ("application/octet-stream", None, True, ("octet", "float32", "float32-le")),
+    # Endpoints de vários vetores não aceitam bytes crus: volta ao JSON
+    ("application/octet-stream", None, False, ("json", None, "json-float")),
+])
+def test_accept_matrix(accept, vector_dtype, allow_octet, expected):
+    vector_format = negotiate_vector_format(accept, vector_dtype, allow_octet=allow_octet)
+    assert (vector_format.container, vector_format.dtype, vector_format.encoding) == expected
+
+
+@pytest.mark.parametrize("dtype, size", [("float32", 12), ("float16", 6)])
+def test_round_trip_is_little_endian(dtype, size):
+    data = encode_vector([0.5, -1.0, 2.0], dtype)
+    assert len(data) == size
+    assert decode_vector(data, dtype) == [0.5, -1.0, 2.0]
+    assert encode_vector([1.0], "float32") == b"\x00\x00\x80\x3f"
+
+
+def test_convert_keeps_missing_vectors():
+    assert negotiate_vector_format(None, None).convert()([0.5]) == [0.5]
+    as_base64 = negotiate_vector_format(None, "float32").convert()
+    assert as_base64(None) is None
+    assert base64.b64decode(as_base64([0.5])) == encode_vector([0.5])
+    assert negotiate_vector_format("application/msgpack", None).convert()([0.5]) == encode_vector([0.5])
+
+
+def test_render_sets_media_type_and_encoding_headers():
+    payload = {"embedding": [0.5]}
+    assert render(payload, negotiate_vector_format(None, None)) is payload
+
+    vector_format = negotiate_vector_format("application/msgpack", None)
+    response = render({"embedding": vector_format.convert()([0.5])}, vector_format, dimension=1)
+    assert response.media_type == "application/msgpack"
+    assert response.headers["X-Vector-Encoding"] == "float32-le"
+    assert response.headers["X-Vector-Dimension"] == "1"
+    assert decode_vector(msgpack.unpackb(response.body)["embedding"]) == [0.5]
+
+    vector_format = negotiate_vector_format(None, "float16")
+    response = render({"embedding": vector_format.convert()([0.5])}, vector_format)
+    assert decode_vector(base64.b64decode(json.loads(response.body)["embedding"]), "float16") == [0.5]
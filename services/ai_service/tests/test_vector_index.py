@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from core import vector_index
+from core.vector_index import apply_search_settings, build_index_ddl, index_name, version_tuple
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Responde à consulta do catálogo com os índices informados e guarda os demais comandos."""
+
+    def __init__(self, indexes: list):
+        self.indexes = indexes
+        self.statements = []
+
+    async def execute(self, query, params=None):
+        sql = str(query)
+        if "FROM pg_index" in sql:
+            return _Result(self.indexes)
+        self.statements.append((sql, params))
+        return _Result([])
+
+
+def _index(name, method="hnsw", opclass="vector_cosine_ops", valid=True):
+    return {"index_name": name, "method": method, "opclass": opclass, "valid": valid}
+
+
+def test_index_ddl(monkeypatch):
+    monkeypatch.setattr(vector_index.settings, "HNSW_M", 16)
+    monkeypatch.setattr(vector_index.settings, "HNSW_EF_CONSTRUCTION", 64)
+    monkeypatch.setattr(vector_index.settings, "IVFFLAT_LISTS", 100)
+
+    assert build_index_ddl("documentos", "embedding", "hnsw", "vector_cosine_ops", "idx") == (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx" ON documentos USING hnsw (embedding vector_cosine_ops) '
+        'WITH (m = 16, ef_construction = 64)')
+    assert build_index_ddl("documentos", "embedding", "ivfflat", "vector_cosine_ops", "idx", where="subcategoria_id = 3").endswith(
+        "WITH (lists = 100) WHERE subcategoria_id = 3")
+    with pytest.raises(ValueError):
+        build_index_ddl("documentos", "embedding", "btree", "vector_cosine_ops", "idx")
+
+
+def test_version_tuple():
+    assert version_tuple("0.8.0") == (0, 8, 0)
+    assert version_tuple("0.5.1-dev") == (0, 5, 1)
+    assert version_tuple(None) == (0,)
+
+
+@pytest.mark.parametrize("existing, expected", [
+    # Só um índice com a classe de operadores do L2: o planner não o usa para "<=>", cria o de cosseno
+    ([_index("emb_l2", opclass="vector_l2_ops")], ["CREATE"]),
+    # CREATE INDEX CONCURRENTLY interrompido: o índice inválido é recriado
+    ([_index(index_name("documentos", "embedding", "hnsw"), valid=False)], ["DROP", "CREATE"]),
+    ([_index("emb_cos")], []),
+])
+def test_ensure_indexes(monkeypatch, existing, expected):
+    monkeypatch.setattr(vector_index, "VECTOR_INDEXES", [("documentos", "embedding")])
+    monkeypatch.setattr(vector_index.settings, "VECTOR_INDEX_AUTO_CREATE", True)
+    connection = FakeConnection(existing)
+    asyncio.run(vector_index._ensure_indexes(connection, "hnsw", "vector_cosine_ops"))
+    assert [sql.split()[0] for sql, _ in connection.statements] == expected
+
+
+def test_search_settings_cover_the_quantized_candidates(monkeypatch):
+    monkeypatch.setattr(vector_index.settings, "HNSW_EF_SEARCH", 40)
+    monkeypatch.setattr(vector_index.settings, "IVFFLAT_PROBES", 10)
+    monkeypatch.setattr(vector_index.settings, "QUANTIZED_CANDIDATES", 200)
+
+    params = []
+    for quantization in ("none", "halfvec"):
+        monkeypatch.setattr(vector_index.settings, "VECTOR_QUANTIZATION", quantization)
+        connection = FakeConnection([])
+        asyncio.run(apply_search_settings(connection))
+        params.append(connection.statements[0][1])
+
+    assert params == [{"ef_search": "40", "probes": "10"}, {"ef_search": "200", "probes": "10"}]
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+import numpy as np
+from core.vector_replica import VectorReplica
+
+T0 = datetime(2026, 1, 1)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def scalar(self):
+        return self.rows
+
+
+class FakeTable:
+    """Tabela `documentos` em memória que responde às três consultas da réplica."""
+
+    def __init__(self, rows):
+        self.rows = {row["id"]: row for row in rows}
+        self.queries = []
+
+    async def execute(self, query, params=None):
+        sql = str(query)
+        if "count(*)" in sql:
+            self.queries.append("count")
+            return _Result(sum(1 for row in self.rows.values() if row["ativo"] and row["embedding"] is not None))
+        if ':since' in sql:
+            self.queries.append("changes")
+            return _Result([row for row in self.rows.values() if row["updatedAt"] >= params["since"]])
+        self.queries.append("load")
+        return _Result([row for row in self.rows.values() if row["ativo"]])
+
+
+def _row(id, embedding, subcategoria_id=1, ativo=True, minutes=0):
+    return {"id": id, "titulo": f"Doc {id}", "descricao": "", "solucao": "", "urlArquivo": None, "palavras_chave": None,
+            "subcategoria_id": subcategoria_id, "ativo": ativo, "embedding": embedding, "updatedAt": T0 + timedelta(minutes=minutes)}
+
+
+def _ids(replica, embedding, top_k=10, subcategoria_id=None):
+    return [result["id"] for result in replica.search(embedding, top_k, subcategoria_id)]
+
+
+def test_apply_removes_inactive_rows_and_skips_unchanged_ones():
+    replica = VectorReplica()
+    assert replica._apply([_row(1, [1.0, 0.0]), _row(2, [0.0, 1.0]), _row(3, None)]) == 2
+    assert replica._apply([_row(1, [1.0, 0.0])]) == 0
+    assert replica._apply([_row(1, [1.0, 0.0], ativo=False, minutes=1), _row(4, None, minutes=1)]) == 1
+    assert set(replica._rows) == {2}
+    assert replica._high_water == T0 + timedelta(minutes=1)
+
+
+def test_search_ranks_by_cosine_and_filters_by_subcategory():
+    replica = VectorReplica()
+    replica._apply([_row(1, [1.0, 0.0]), _row(2, [3.0, 1.0], subcategoria_id=2), _row(3, [0.0, 5.0], subcategoria_id=None)])
+    replica._publish()
+
+    results = replica.search([2.0, 0.0], top_k=2)
+    assert [result["id"] for result in results] == [1, 2]
+    assert np.isclose(results[0]["similarity"], 1.0)
+    assert set(results[0]) == {"id", "titulo", "descricao", "solucao", "urlArquivo", "updatedAt", "palavras_chave", "similarity"}
+    assert _ids(replica, [1.0, 0.0], subcategoria_id=2) == [2]
+    assert _ids(replica, [1.0, 0.0], subcategoria_id=9) == []
+    assert _ids(replica, [0.0, 0.0]) == []
+
+
+def test_refresh_applies_changes_incrementally():
+    table = FakeTable([_row(1, [1.0, 0.0]), _row(2, [0.0, 1.0])])
+    replica = VectorReplica()
+    asyncio.run(replica.refresh(table))
+    assert _ids(replica, [1.0, 0.0]) == [1, 2]
+
+    # Documento novo e outro que mudou de embedding; um terceiro desativado pelo updatedAt
+    table.rows[3] = _row(3, [1.0, 0.1], minutes=2)
+    table.rows[2] = _row(2, [1.0, 0.0], minutes=2)
+    table.rows[1] = _row(1, [1.0, 0.0], ativo=False, minutes=2)
+    table.queries.clear()
+    asyncio.run(replica.refresh(table))
+
+    assert table.queries == ["changes", "count"]
+    assert _ids(replica, [1.0, 0.0]) == [2, 3]
+    assert (replica.full_loads, replica.incremental_updates, replica.changed_rows) == (1, 1, 3)
+
+
+def test_deleted_rows_force_a_full_reload():
+    table = FakeTable([_row(1, [1.0, 0.0]), _row(2, [0.0, 1.0])])
+    replica = VectorReplica()
+    asyncio.run(replica.refresh(table))
+
+    # Exclusão física: não aparece no polling por updatedAt, só na contagem
+    del table.rows[1]
+    table.queries.clear()
+    asyncio.run(replica.refresh(table))
+
+    assert table.queries == ["changes", "count", "load"]
+    assert _ids(replica, [1.0, 0.0]) == [2]
+    assert replica.full_loads == 2
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from config.logging_config import setup_logging
+from config.settings import settings
+
+
+def _run_worker_process(index: int):
+    """Processo worker: consome a fila de jobs de ingestão no Redis."""
+    setup_logging(level=logging.INFO)
+    # Importado dentro do processo filho (contexto 'spawn'): cada worker tem seus próprios clientes
+    from core.jobs import job_backend, worker_loop
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await worker_loop(job_backend, stop, name=f"worker-{index}")
+        finally:
+            await job_backend.aclose()
+
+    asyncio.run(main())
+
+
+# Bloco para executar os workers de ingestão: `python worker.py`
+if __name__ == "__main__":
+    if settings.JOB_BACKEND != "redis":
+        raise SystemExit("worker.py exige JOB_BACKEND=redis (com a fila em memória os jobs rodam no processo da API).")
+
+    # Processos separados: o particionamento (unstructured) é CPU-bound e não escala com threads
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_run_worker_process, args=(i,), name=f"worker-{i}") for i in range(settings.JOB_WORKER_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()